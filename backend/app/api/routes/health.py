@@ -1,8 +1,18 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core import metrics
 
 router = APIRouter(tags=["health"])
 
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
 
 @router.get("/health")
 def health() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE)
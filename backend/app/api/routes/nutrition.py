@@ -1,4 +1,3 @@
-import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
@@ -27,9 +26,10 @@ async def generate_plan(profile: UserProfile) -> PlanResponse:
         grocery_list = aggregate_grocery_list(weekly_plan)
         ingredient_names = [g.ingredient for g in grocery_list]
         try:
-            # External API calls should not block plan generation.
-            ingredient_brand_map = await asyncio.wait_for(
-                recommend_brands_by_ingredient(profile.country_code, ingredient_names), timeout=6.0
+            # External API calls should not block plan generation; lookups that miss the budget are
+            # dropped from this response but still land in the product cache.
+            ingredient_brand_map = await recommend_brands_by_ingredient(
+                profile.country_code, ingredient_names, timeout_s=6.0
             )
         except Exception:
             ingredient_brand_map = {}
@@ -47,9 +47,7 @@ async def generate_plan(profile: UserProfile) -> PlanResponse:
         brands = list(ingredient_brand_map.values())
         if not brands:
             try:
-                brands = await asyncio.wait_for(
-                    recommend_brands(profile.country_code, ["chicken breast", "oats"]), timeout=5.0
-                )
+                brands = await recommend_brands(profile.country_code, ["chicken breast", "oats"], timeout_s=5.0)
             except Exception:
                 brands = []
 
@@ -1,23 +1,52 @@
-from fastapi import APIRouter, Query
+import asyncio
+import functools
+from typing import AsyncIterator, Iterator
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 
 from app.domain.recomp_models import (
     ACTIVITY_MULTIPLIERS,
+    CalculatePlanBatchRequest,
+    CalculatePlanBatchResponse,
     CalculatePlanResponse,
+    GenerateMealsBatchRequest,
     GenerateMealsRequest,
     GenerateMealsResponse,
     PlanInput,
+    ReplanRequest,
+    ReplanResponse,
+    RetailEnrichmentStatus,
+    RetailProduct,
     WeeklyCheckinRequest,
     WeeklyCheckinResponse,
 )
-from app.services.adaptive import apply_weekly_adjustment
+from app.core import metrics
+from app.core.config import settings
+from app.core.executors import run_cpu, run_io
+from app.core.responses import ModelResponse, dumps, encoded_response, select_format
+from app.services.adaptive import adjust_calories, apply_weekly_adjustment
+from app.services.compact_plan import compact_generate_meals
 from app.services.grocery_engine import build_grocery_list
-from app.services.meal_engine import generate_weekly_meal_plan
+from app.services.meal_engine import generate_weekly_meal_plan, rescale_weekly_meal_plan
 from app.services.physiology import body_composition, calories_plan, macro_plan
+from app.services.physiology_batch import batch_responses
+from app.services.plan_cache import offload_memoized
+from app.services.plan_store import plan_key, recall_plan, remember_plan
 from app.services.projection import projection
-from app.services.retail_enricher import enrich_with_retail_products
+from app.services.enrichment_registry import get_job
+from app.services.retail_enricher import SharedRetailLookups, enrich_within_deadline
 
 router = APIRouter(tags=["recomposition"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _ndjson_line(index: int, result: CalculatePlanResponse | GenerateMealsResponse | None, error: str | None = None) -> str:
+    if error is not None:
+        return dumps({"index": index, "error": error}).decode("utf-8") + "\n"
+    return f'{{"index":{index},"result":{result.model_dump_json()}}}\n'
+
 
 @router.post("/calculate-plan", response_model=CalculatePlanResponse)
 def calculate_plan(payload: PlanInput) -> CalculatePlanResponse:
@@ -28,36 +57,217 @@ def calculate_plan(payload: PlanInput) -> CalculatePlanResponse:
     return CalculatePlanResponse(body_composition=comp, calories=kcal, macros=macros, projection=proj)
 
 
-@router.post("/generate-meals", response_model=GenerateMealsResponse)
-async def generate_meals(payload: GenerateMealsRequest) -> GenerateMealsResponse:
-    plan = payload.plan
-    comp = body_composition(plan)
-    kcal = calories_plan(plan)
-    macros = macro_plan(plan, comp, kcal)
-    proj = projection(plan, comp)
+def _stream_calculated(plans: list[PlanInput]) -> Iterator[str]:
+    chunk = max(1, settings.calculate_batch_chunk_size)
+    for start in range(0, len(plans), chunk):
+        for offset, result in enumerate(batch_responses(plans[start : start + chunk])):
+            yield _ndjson_line(start + offset, result)
+
+
+@router.post("/calculate-plan/batch", response_model=CalculatePlanBatchResponse)
+def calculate_plan_batch(
+    payload: CalculatePlanBatchRequest, request: Request
+) -> ModelResponse | StreamingResponse:
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(_stream_calculated(payload.plans), media_type=NDJSON_MEDIA_TYPE)
+    return ModelResponse(CalculatePlanBatchResponse(results=batch_responses(payload.plans)))
 
-    weekly_meals = generate_weekly_meal_plan(plan, macros)
-    grocery = build_grocery_list(weekly_meals)
-    weekly_meals, grocery = await enrich_with_retail_products(
-        weekly_plan=weekly_meals,
+
+async def _generate_meals_for(plan: PlanInput, lookups: SharedRetailLookups | None = None) -> GenerateMealsResponse:
+    deadline = asyncio.get_running_loop().time() + settings.generate_meals_deadline_s
+    with metrics.stage("physiology"):
+        comp = body_composition(plan)
+        kcal = calories_plan(plan)
+        macros = macro_plan(plan, comp, kcal)
+    with metrics.stage("projection"):
+        proj = projection(plan, comp)
+
+    with metrics.stage("meal_generation"):
+        # Batch plans are already bounded by batch_concurrency, so they wait for the pool instead of
+        # being rejected; single requests get a 503 when it is saturated.
+        submit = run_cpu if lookups is None else functools.partial(run_cpu, bounded=False)
+        weekly_meals = await offload_memoized(generate_weekly_meal_plan, submit, plan, macros)
+    with metrics.stage("grocery"):
+        grocery = build_grocery_list(weekly_meals)
+    with metrics.stage("retail_enrichment"):
+        weekly_meals, grocery, enrichment_id = await enrich_within_deadline(
+            weekly_plan=weekly_meals,
+            grocery_list=grocery,
+            country_code=plan.country_code,
+            preferred_retailers=plan.preferred_retailers,
+            deadline=deadline,
+            lookups=lookups,
+        )
+    key = plan_key(plan, kcal)
+    response = GenerateMealsResponse(
+        body_composition=comp,
+        calories=kcal,
+        macros=macros,
+        projection=proj,
+        meal_plan=weekly_meals,
         grocery_list=grocery,
-        country_code=plan.country_code,
-        preferred_retailers=plan.preferred_retailers,
+        enrichment_id=enrichment_id,
+        plan_key=key,
     )
+    await run_io(remember_plan, key, plan, response, bounded=False)
+    return response
+
+
+@router.post("/generate-meals", response_model=GenerateMealsResponse)
+async def generate_meals(
+    payload: GenerateMealsRequest,
+    request: Request,
+    format: str | None = Query(default=None, description="json, compact, msgpack or cbor"),
+) -> Response:
+    # Negotiate before generating so an unsupported format fails fast with 406.
+    fmt = select_format(format, request.headers.get("accept", ""))
+    result = await _generate_meals_for(payload.plan)
+    if fmt == "json":
+        # The representation depends on Accept, so caches must key on it.
+        return ModelResponse(result, headers={"Vary": "Accept"})
+    return encoded_response(compact_generate_meals(result), fmt)
+
+
+@router.get("/generate-meals/enrichment/{enrichment_id}", response_model=RetailEnrichmentStatus)
+async def get_enrichment(
+    enrichment_id: str,
+    wait_s: float = Query(default=0, ge=0, le=10),
+) -> ModelResponse:
+    job = get_job(enrichment_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired enrichment id")
+    await job.wait(wait_s)
+    return ModelResponse(
+        RetailEnrichmentStatus(
+            enrichment_id=enrichment_id,
+            complete=job.complete,
+            products=job.products,
+            pending=sorted(job.pending),
+        )
+    )
+
+
+async def _stream_generated(plans: list[PlanInput]) -> AsyncIterator[str]:
+    # Only batch_concurrency plans run at once and each result is yielded as soon as it completes,
+    # so the server never holds more than that window of results in memory.
+    lookups = SharedRetailLookups()
+    pending: dict[asyncio.Task, int] = {}
+    queue = iter(enumerate(plans))
+
+    def start_next() -> None:
+        for index, plan in queue:
+            pending[asyncio.create_task(_generate_meals_for(plan, lookups))] = index
+            return
+
+    finished = False
+    try:
+        for _ in range(max(1, settings.batch_concurrency)):
+            start_next()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                start_next()
+                if task.exception() is not None:
+                    yield _ndjson_line(index, None, error=f"Unable to generate meals: {task.exception()}")
+                else:
+                    yield _ndjson_line(index, task.result())
+        finished = True
+    finally:
+        for task in pending:
+            task.cancel()
+        # Lookups past their plan's deadline finish in the background unless the client went away.
+        if not finished:
+            lookups.cancel()
+
+
+@router.post("/generate-meals/batch")
+async def generate_meals_batch(payload: GenerateMealsBatchRequest) -> StreamingResponse:
+    return StreamingResponse(_stream_generated(payload.plans), media_type=NDJSON_MEDIA_TYPE)
+
+
+def _previous_products(previous: GenerateMealsResponse) -> dict[str, RetailProduct | None]:
+    # Resolved matches from the previous plan, including late ones picked up by its enrichment job.
+    # Ingredients still pending are left out so the re-plan looks them up again.
+    known: dict[str, RetailProduct | None] = {}
+    for day in previous.meal_plan.days:
+        for meal in day.meals:
+            for ing in meal.ingredients:
+                if not ing.retail_pending:
+                    known[ing.ingredient] = ing.retail_product
+    for item in previous.grocery_list:
+        if not item.retail_pending:
+            known[item.ingredient] = item.retail_product
+    job = get_job(previous.enrichment_id) if previous.enrichment_id else None
+    if job is not None:
+        job.poll()
+        known.update(job.products)
+    return known
+
+
+@router.post("/replan", response_model=ReplanResponse)
+async def replan(payload: ReplanRequest) -> ModelResponse:
+    if payload.plan_key is not None:
+        stored = await run_io(recall_plan, payload.plan_key, bounded=False)
+        if stored is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired plan_key; send plan and previous instead")
+        plan, previous = stored
+    else:
+        plan, previous = payload.plan, payload.previous
+
+    deadline = asyncio.get_running_loop().time() + settings.generate_meals_deadline_s
+    # The check-in adjusts the target the previous plan actually had, not the one the client echoes back.
+    checkin = apply_weekly_adjustment(
+        payload.checkin.model_copy(update={"previous_calorie_target": previous.calories.target})
+    )
+    with metrics.stage("physiology"):
+        plan = plan.model_copy(update={"weight_kg": payload.checkin.current_weight_kg})
+        comp = body_composition(plan)
+        kcal = adjust_calories(previous.calories, checkin.adjustment_kcal)
+        # The BMR floor may cap the shift; report what was applied.
+        checkin = checkin.model_copy(
+            update={"adjustment_kcal": kcal.target - previous.calories.target, "new_calorie_target": kcal.target}
+        )
+        macros = macro_plan(plan, comp, kcal)
+    with metrics.stage("projection"):
+        proj = projection(plan, comp)
+
+    with metrics.stage("meal_rescale"):
+        weekly_meals = await run_cpu(rescale_weekly_meal_plan, previous.meal_plan, macros)
+    if weekly_meals is None:
+        with metrics.stage("meal_generation"):
+            weekly_meals = await offload_memoized(generate_weekly_meal_plan, run_cpu, plan, macros)
+    with metrics.stage("grocery"):
+        grocery = build_grocery_list(weekly_meals)
+    with metrics.stage("retail_enrichment"):
+        weekly_meals, grocery, enrichment_id = await enrich_within_deadline(
+            weekly_plan=weekly_meals,
+            grocery_list=grocery,
+            country_code=plan.country_code,
+            preferred_retailers=plan.preferred_retailers,
+            deadline=deadline,
+            known=_previous_products(previous),
+        )
 
-    return GenerateMealsResponse(
+    key = plan_key(plan, kcal)
+    response = ReplanResponse(
         body_composition=comp,
         calories=kcal,
         macros=macros,
         projection=proj,
         meal_plan=weekly_meals,
         grocery_list=grocery,
+        enrichment_id=enrichment_id,
+        plan_key=key,
+        checkin=checkin,
     )
+    await run_io(remember_plan, key, plan, response, bounded=False)
+    return ModelResponse(response)
 
 
 @router.post("/weekly-checkin", response_model=WeeklyCheckinResponse)
-def weekly_checkin(payload: WeeklyCheckinRequest) -> WeeklyCheckinResponse:
-    return apply_weekly_adjustment(payload)
+def weekly_checkin(payload: WeeklyCheckinRequest) -> ModelResponse:
+    return ModelResponse(apply_weekly_adjustment(payload))
 
 
 @router.get("/projection")
@@ -72,7 +282,7 @@ def get_projection(
     training_days_per_week: int = Query(ge=0, le=7),
     timeline_weeks: int = Query(default=16, ge=4, le=52),
     goal_mode: str = Query(pattern="^(fat_loss|recomposition)$"),
-) -> dict:
+) -> ModelResponse:
     plan = PlanInput(
         height_cm=height_cm,
         weight_kg=weight_kg,
@@ -87,4 +297,5 @@ def get_projection(
     )
     comp = body_composition(plan)
     proj = projection(plan, comp)
-    return {"projection": proj.model_dump(), "activity_multipliers": {k.value: v for k, v in ACTIVITY_MULTIPLIERS.items()}}
+    multipliers = {k.value: v for k, v in ACTIVITY_MULTIPLIERS.items()}
+    return ModelResponse({"projection": proj.model_dump(mode="json"), "activity_multipliers": multipliers})
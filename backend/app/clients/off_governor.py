@@ -0,0 +1,258 @@
+import asyncio
+import collections
+import time
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+
+from app.core import metrics
+from app.core.config import settings
+
+T = TypeVar("T")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class CircuitOpen(Exception):
+    # Raised instead of calling a host that is failing; callers treat it like any failed lookup.
+    def __init__(self, host: str) -> None:
+        super().__init__(f"OpenFoodFacts circuit open for {host}")
+        self.host = host
+
+
+class AIMDLimit:
+    # Concurrency limit that grows by one per window of successful requests and is multiplied by
+    # `backoff` on congestion (timeouts, 429/5xx, responses slower than the latency threshold). Only
+    # requests started after the last decrease can lower it again, so one burst of failures halves
+    # the limit once instead of collapsing it to the floor.
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        backoff: float,
+        latency_threshold_s: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self.backoff = backoff
+        self.latency_threshold_s = latency_threshold_s
+        self.in_flight = 0
+        self._clock = clock
+        self._last_decrease = float("-inf")
+        self._waiters: collections.deque[asyncio.Future] = collections.deque()
+
+    async def acquire(self) -> float:
+        # Returns the start time to pass back to release().
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return self._clock()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation landed; pass it on.
+                self.in_flight -= 1
+                self._wake()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        return self._clock()
+
+    def release(self, started: float, latency_s: float, congested: bool | None) -> None:
+        # congested None: the call was abandoned early and says nothing about the host; only free the slot.
+        self.in_flight -= 1
+        if congested is None:
+            pass
+        elif congested or latency_s > self.latency_threshold_s:
+            if started >= self._last_decrease:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = self._clock()
+                metrics.inc("off_concurrency_decreases_total")
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+class TokenBucket:
+    # Callers reserve a token up front and sleep off any deficit, so waiting callers are served in
+    # arrival order without polling. A rate of 0 disables the bucket.
+    def __init__(self, rate_per_s: float, burst: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate_per_s = rate_per_s
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        if self.rate_per_s <= 0:
+            return
+        self._refill()
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return
+        try:
+            await asyncio.sleep(-self.tokens / self.rate_per_s)
+        except asyncio.CancelledError:
+            self.tokens += 1
+            raise
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive upstream failures. After `cooldown_s` one probe is let
+    # through (half-open): success closes the circuit, failure re-opens it for another cooldown.
+    def __init__(self, failure_threshold: int, cooldown_s: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_s = cooldown_s
+        self.state = CLOSED
+        self.failures = 0
+        self._clock = clock
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if self._clock() - self._opened_at < self.cooldown_s:
+                return False
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record(self, success: bool | None) -> None:
+        # None: the call ended without an answer either way (cancelled), so the probe slot is just freed.
+        self._probing = False
+        if success is None:
+            return
+        if success:
+            self.failures = 0
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        metrics.inc("off_circuit_transitions_total", state=state)
+
+
+def _is_overload(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    # Timeouts, refused connections and resets: the host is not answering.
+    return isinstance(exc, httpx.TransportError)
+
+
+class Governor:
+    # Process-wide gate in front of one upstream host, shared by every request, batch and refresh.
+    def __init__(self, host: str, clock: Callable[[], float] = time.monotonic) -> None:
+        self.host = host
+        self.limit = AIMDLimit(
+            settings.openfoodfacts_max_concurrency_per_host,
+            settings.openfoodfacts_min_concurrency_per_host,
+            settings.openfoodfacts_max_concurrency_limit,
+            settings.openfoodfacts_concurrency_backoff,
+            settings.openfoodfacts_latency_threshold_s,
+            clock,
+        )
+        self.bucket = TokenBucket(settings.openfoodfacts_rate_limit_per_s, settings.openfoodfacts_rate_burst, clock)
+        self.breaker = CircuitBreaker(
+            settings.openfoodfacts_breaker_failure_threshold, settings.openfoodfacts_breaker_cooldown_s, clock
+        )
+
+    async def call(self, send: Callable[[], Awaitable[T]]) -> T:
+        if not self.breaker.allow():
+            metrics.inc("off_requests_total", outcome="circuit_open")
+            raise CircuitOpen(self.host)
+        success: bool | None = None
+        waited = time.perf_counter()
+        try:
+            await self.bucket.acquire()
+            started = await self.limit.acquire()
+        except asyncio.CancelledError:
+            self.breaker.record(None)
+            raise
+        sent = time.perf_counter()
+        metrics.observe("off_host_limit_wait_seconds", sent - waited)
+        congested: bool | None = False
+        try:
+            result = await send()
+            success = True
+            metrics.inc("off_requests_total", outcome="ok")
+            return result
+        except asyncio.CancelledError:
+            # Lookups give up through cancellation (a caller's wait_for) well before the httpx timeout.
+            # One that ran past the latency threshold is a hung host: count it like a timeout. An earlier
+            # cancellation (shutdown, a caller going away) says nothing about the host.
+            if time.perf_counter() - sent >= self.limit.latency_threshold_s:
+                congested, success = True, False
+                metrics.inc("off_requests_total", outcome="timeout")
+            else:
+                congested = None
+                metrics.inc("off_requests_total", outcome="cancelled")
+            raise
+        except Exception as exc:
+            congested = _is_overload(exc)
+            # Other errors (404, bad JSON) still mean the host answered.
+            success = not congested
+            outcome = "timeout" if isinstance(exc, httpx.TimeoutException) else "error"
+            metrics.inc("off_requests_total", outcome=outcome)
+            raise
+        finally:
+            elapsed = time.perf_counter() - sent
+            metrics.observe("off_request_seconds", elapsed)
+            self.limit.release(started, elapsed, congested)
+            self.breaker.record(success)
+
+
+_governors: dict[str, Governor] = {}
+
+
+def get_governor(host: str) -> Governor:
+    governor = _governors.get(host)
+    if governor is None:
+        governor = _governors[host] = Governor(host)
+    return governor
+
+
+def reset_governors() -> None:
+    # Waiter futures belong to one event loop, so governors are rebuilt with the pooled client.
+    _governors.clear()
+
+
+def governor_gauges() -> dict[str, dict[tuple[tuple[str, str], ...], float]]:
+    gauges: dict[str, dict[tuple[tuple[str, str], ...], float]] = {
+        "off_concurrency_limit": {},
+        "off_in_flight": {},
+        "off_rate_tokens": {},
+        "off_circuit_state": {},
+    }
+    for host, governor in list(_governors.items()):
+        labels = (("host", host),)
+        governor.bucket._refill()
+        gauges["off_concurrency_limit"][labels] = int(governor.limit.limit)
+        gauges["off_in_flight"][labels] = governor.limit.in_flight
+        gauges["off_rate_tokens"][labels] = round(governor.bucket.tokens, 3)
+        gauges["off_circuit_state"][labels] = (CLOSED, HALF_OPEN, OPEN).index(governor.breaker.state)
+    return gauges
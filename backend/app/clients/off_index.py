@@ -0,0 +1,220 @@
+import argparse
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from app.core.config import settings
+
+# Only what _build_retail_product and retail candidate scoring read survives ingestion.
+NUTRIMENT_FIELDS = ("proteins_100g", "carbohydrates_100g", "fat_100g", "energy-kcal_100g")
+
+# OFF tags countries by English name; the planner speaks ISO 3166-1 alpha-2.
+COUNTRY_TAGS = {
+    "at": "en:austria",
+    "au": "en:australia",
+    "be": "en:belgium",
+    "br": "en:brazil",
+    "ca": "en:canada",
+    "ch": "en:switzerland",
+    "cz": "en:czech-republic",
+    "de": "en:germany",
+    "dk": "en:denmark",
+    "es": "en:spain",
+    "fi": "en:finland",
+    "fr": "en:france",
+    "gb": "en:united-kingdom",
+    "ie": "en:ireland",
+    "in": "en:india",
+    "it": "en:italy",
+    "jp": "en:japan",
+    "lu": "en:luxembourg",
+    "mx": "en:mexico",
+    "nl": "en:netherlands",
+    "no": "en:norway",
+    "nz": "en:new-zealand",
+    "pl": "en:poland",
+    "pt": "en:portugal",
+    "ro": "en:romania",
+    "se": "en:sweden",
+    "us": "en:united-states",
+}
+_CODE_BY_TAG = {tag: code for code, tag in COUNTRY_TAGS.items()}
+_CODE_BY_TAG["en:uk"] = "gb"
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA = (
+    "CREATE VIRTUAL TABLE products USING fts5("
+    "product_name, brands, stores, countries, doc UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+)
+
+
+def slim_product(raw: dict[str, Any]) -> dict[str, Any] | None:
+    name = raw.get("product_name")
+    if not name:
+        return None
+    nutriments = raw.get("nutriments") or {}
+    return {
+        "product_name": name,
+        "brands": raw.get("brands") or None,
+        "stores": raw.get("stores") or "",
+        "stores_tags": raw.get("stores_tags") or [],
+        "nutriscore_grade": raw.get("nutriscore_grade") or None,
+        "countries_tags": raw.get("countries_tags") or [],
+        "nutriments": {k: nutriments[k] for k in NUTRIMENT_FIELDS if nutriments.get(k) is not None},
+    }
+
+
+def _country_codes(countries_tags: Iterable[str]) -> str:
+    codes = []
+    for tag in countries_tags:
+        code = _CODE_BY_TAG.get(tag)
+        if code:
+            codes.append(code)
+    return " ".join(codes)
+
+
+def iter_dump(path: str | Path) -> Iterator[dict[str, Any]]:
+    # Line-at-a-time so memory stays flat on the multi-GB export.
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def build_index(dump_path: str | Path, index_path: str | Path, batch_size: int = 5000) -> int:
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(index_path.suffix + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    db = sqlite3.connect(str(tmp_path))
+    db.execute("PRAGMA journal_mode=OFF")
+    db.execute("PRAGMA synchronous=OFF")
+    db.execute(_SCHEMA)
+
+    count = 0
+    batch: list[tuple[str, str, str, str, str]] = []
+    for raw in iter_dump(dump_path):
+        product = slim_product(raw)
+        if product is None:
+            continue
+        batch.append(
+            (
+                product["product_name"],
+                product["brands"] or "",
+                f"{product['stores']} {' '.join(product['stores_tags'])}",
+                _country_codes(product["countries_tags"]),
+                json.dumps(product, separators=(",", ":")),
+            )
+        )
+        if len(batch) >= batch_size:
+            db.executemany("INSERT INTO products VALUES (?, ?, ?, ?, ?)", batch)
+            db.commit()
+            count += len(batch)
+            batch.clear()
+    if batch:
+        db.executemany("INSERT INTO products VALUES (?, ?, ?, ?, ?)", batch)
+        count += len(batch)
+    db.execute("INSERT INTO products(products) VALUES ('optimize')")
+    db.commit()
+    db.close()
+
+    os.replace(tmp_path, index_path)
+    return count
+
+
+def _match_expression(query: str, country_code: str, store: str | None) -> str | None:
+    words = _WORD.findall(query.lower())
+    code = country_code.lower()
+    # Only mapped countries are indexed, so an unmapped one can't be filtered on. Matching without the
+    # filter would hand out products sold anywhere; answer nothing, like the live API for an empty country.
+    if not words or code not in COUNTRY_TAGS:
+        return None
+    terms = " ".join(f'"{w}"' for w in words)
+    expression = f"{{product_name brands}} : ({terms})" + f' AND countries : "{code}"'
+    store_words = _WORD.findall((store or "").lower())
+    if store_words:
+        expression += " AND stores : (" + " ".join(f'"{w}"' for w in store_words) + ")"
+    return expression
+
+
+class ProductIndex:
+    def __init__(self, path: str | Path) -> None:
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"OpenFoodFacts index not found at {path}; build it with `python -m app.clients.off_index`")
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._db.execute("PRAGMA mmap_size=1073741824")
+        self._lock = threading.Lock()
+
+    def search(self, query: str, country_code: str, page_size: int = 10, store: str | None = None) -> list[dict[str, Any]]:
+        expression = _match_expression(query, country_code, store)
+        if expression is None:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT doc FROM products WHERE products MATCH ? ORDER BY rank LIMIT ?",
+                (expression, page_size),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def search_many(
+        self,
+        queries: Iterable[str],
+        country_code: str,
+        page_size: int = 10,
+        store: str | None = None,
+    ) -> dict[str, list[dict[str, Any]]]:
+        return {q: self.search(q, country_code, page_size, store) for q in queries}
+
+    def close(self) -> None:
+        self._db.close()
+
+
+_index: ProductIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_product_index() -> ProductIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ProductIndex(settings.openfoodfacts_index_path)
+    return _index
+
+
+def set_product_index(index: ProductIndex | None) -> None:
+    global _index
+    with _index_lock:
+        if _index is not None and _index is not index:
+            _index.close()
+        _index = index
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build the offline OpenFoodFacts product index from the JSONL export.")
+    parser.add_argument("dump", help="Path to openfoodfacts-products.jsonl or .jsonl.gz")
+    parser.add_argument("--output", default=settings.openfoodfacts_index_path, help="SQLite FTS5 index to write")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    count = build_index(args.dump, args.output, batch_size=args.batch_size)
+    print(f"Indexed {count} products into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
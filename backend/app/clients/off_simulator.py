@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from app.core.config import settings
+
+CATALOG_PATH = Path(__file__).resolve().parent.parent / "data" / "food_catalog.json"
+SEARCH_PATH = "/cgi/search.pl"
+SIMULATED_STORES = ["Aldi", "Lidl", "Tesco", "Rewe", "Edeka", "Carrefour"]
+
+# Standard normal quantile of the 95th percentile, used to turn (median, p95) into a lognormal sigma.
+Z_95 = 1.6448536269514722
+
+
+@dataclass(frozen=True)
+class SimulatorConfig:
+    latency_median_ms: float = 120.0
+    latency_p95_ms: float = 450.0
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    empty_rate: float = 0.0
+    # Extra bytes per product; real search results are several KB each once all fields are included.
+    padding_bytes: int = 0
+    # How long a "timed out" request hangs before the simulator gives up on it.
+    hang_s: float = 30.0
+    fixtures_path: str | None = None
+    seed: int | None = None
+
+    @classmethod
+    def from_settings(cls) -> "SimulatorConfig":
+        return cls(
+            latency_median_ms=settings.openfoodfacts_simulator_latency_median_ms,
+            latency_p95_ms=settings.openfoodfacts_simulator_latency_p95_ms,
+            error_rate=settings.openfoodfacts_simulator_error_rate,
+            timeout_rate=settings.openfoodfacts_simulator_timeout_rate,
+            empty_rate=settings.openfoodfacts_simulator_empty_rate,
+            padding_bytes=settings.openfoodfacts_simulator_padding_bytes,
+            hang_s=settings.openfoodfacts_timeout_s * 2,
+            fixtures_path=settings.openfoodfacts_simulator_fixtures_path,
+            seed=settings.openfoodfacts_simulator_seed,
+        )
+
+
+def _synthetic_product(name: str, i: int, food: dict | None) -> dict[str, Any]:
+    brands = (food or {}).get("brands") or [f"{name} Co"]
+    grades = "abcde"
+    first = i % len(SIMULATED_STORES)
+    stores = SIMULATED_STORES[first : first + 1 + i % 2]
+    return {
+        "code": f"{zlib.crc32(name.encode('utf-8')):010d}{i:03d}",
+        "product_name": name if i == 0 else f"{name} {i + 1}",
+        "brands": brands[i % len(brands)],
+        "stores": ", ".join(stores),
+        "countries_tags": ["en:germany", "en:france", "en:united-kingdom", "en:united-states"],
+        "nutriscore_grade": grades[i % len(grades)],
+        "price": f"{1.49 + (i % 7) * 0.5:.2f}" if i % 3 else None,
+        "nutriments": {
+            "energy-kcal_100g": (food or {}).get("kcal", 120 + 15 * i),
+            "proteins_100g": (food or {}).get("protein_g", 5 + i),
+            "carbohydrates_100g": (food or {}).get("carbs_g", 12 + i),
+            "fat_100g": (food or {}).get("fat_g", 3 + i % 5),
+            "fiber_100g": (food or {}).get("fiber_g", 2),
+        },
+    }
+
+
+def synthetic_fixtures(products_per_query: int = 12) -> dict[str, list[dict[str, Any]]]:
+    # Stand-in for recorded responses: every catalog ingredient gets a page of plausible products.
+    with CATALOG_PATH.open("r", encoding="utf-8") as f:
+        foods = json.load(f)
+    return {
+        food["name"].lower(): [_synthetic_product(food["name"], i, food) for i in range(products_per_query)]
+        for food in foods
+    }
+
+
+def load_fixtures(path: str | Path | None) -> dict[str, list[dict[str, Any]]]:
+    if path is None:
+        return synthetic_fixtures()
+    with Path(path).open("r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return {query.lower(): products for query, products in raw.items()}
+
+
+class OpenFoodFactsSimulator:
+    def __init__(self, config: SimulatorConfig, fixtures: dict[str, list[dict[str, Any]]] | None = None) -> None:
+        self.config = config
+        self.fixtures = fixtures if fixtures is not None else load_fixtures(config.fixtures_path)
+        self._random = random.Random(config.seed)
+        median = max(config.latency_median_ms, 0.0)
+        self._mu = math.log(median) if median > 0 else None
+        self._sigma = math.log(config.latency_p95_ms / median) / Z_95 if 0 < median < config.latency_p95_ms else 0.0
+
+    def latency_s(self) -> float:
+        if self._mu is None:
+            return 0.0
+        return self._random.lognormvariate(self._mu, self._sigma) / 1000.0
+
+    def products_for(self, query: str, page_size: int, store: str | None) -> list[dict[str, Any]]:
+        products = self.fixtures.get(query.strip().lower())
+        if products is None:
+            products = [_synthetic_product(query.strip().title(), i, None) for i in range(page_size)]
+        if store:
+            products = [p for p in products if store.lower() in (p.get("stores") or "").lower()]
+        products = products[:page_size]
+        if self.config.padding_bytes > 0:
+            padding = "x" * self.config.padding_bytes
+            products = [{**p, "ingredients_text": padding} for p in products]
+        return products
+
+    async def search(self, params: dict[str, str]) -> tuple[int, dict[str, Any] | None]:
+        # Returns (status, payload); a None payload means the request hangs past any sane client timeout.
+        roll = self._random.random()
+        await asyncio.sleep(self.latency_s())
+        if roll < self.config.timeout_rate:
+            await asyncio.sleep(self.config.hang_s)
+            return 504, None
+        roll -= self.config.timeout_rate
+        if roll < self.config.error_rate:
+            return self._random.choice([500, 502, 503]), {"status": "error"}
+        roll -= self.config.error_rate
+        page_size = int(params.get("page_size") or 24)
+        if roll < self.config.empty_rate:
+            return 200, {"count": 0, "page_size": page_size, "products": []}
+
+        store = params.get("tag_1") if params.get("tagtype_1") == "stores" else None
+        products = self.products_for(params.get("search_terms", ""), page_size, store)
+        if params.get("fields"):
+            # Like the live API: only the requested top-level fields, so padding is dropped too.
+            fields = params["fields"].split(",")
+            products = [{k: p[k] for k in fields if k in p} for p in products]
+        return 200, {"count": len(products), "page": 1, "page_size": page_size, "products": products}
+
+
+class SimulatorTransport(httpx.AsyncBaseTransport):
+    # In-process replacement for the network: the pooled client talks to the simulator directly.
+    def __init__(self, simulator: OpenFoodFactsSimulator) -> None:
+        self.simulator = simulator
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path != SEARCH_PATH:
+            return httpx.Response(404, json={"status": "not found"}, request=request)
+        read_timeout = (request.extensions.get("timeout") or {}).get("read")
+        search = self.simulator.search(dict(request.url.params))
+        try:
+            status, payload = await asyncio.wait_for(search, timeout=read_timeout)
+        except asyncio.TimeoutError as exc:
+            raise httpx.ReadTimeout("simulated upstream timeout", request=request) from exc
+        if payload is None:
+            raise httpx.ReadTimeout("simulated upstream timeout", request=request)
+        return httpx.Response(status, json=payload, request=request)
+
+
+def build_transport(config: SimulatorConfig | None = None) -> SimulatorTransport:
+    return SimulatorTransport(OpenFoodFactsSimulator(config or SimulatorConfig.from_settings()))
+
+
+def create_app(config: SimulatorConfig | None = None):
+    # Standalone server for out-of-process load tests: point OPENFOODFACTS_BASE_URL at it.
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    simulator = OpenFoodFactsSimulator(config or SimulatorConfig.from_settings())
+    app = FastAPI(title="OpenFoodFacts simulator")
+
+    @app.get(SEARCH_PATH)
+    async def search(request: Request) -> JSONResponse:
+        status, payload = await simulator.search(dict(request.query_params))
+        return JSONResponse(payload or {"status": "timeout"}, status_code=status)
+
+    return app
+
+
+async def record_fixtures(queries: list[str], output: Path, country_code: str, page_size: int) -> int:
+    # Captures real responses once so later load tests replay them without touching the live service.
+    from app.clients.openfoodfacts_client import _fetch_products, close_client
+
+    fixtures: dict[str, list[dict[str, Any]]] = {}
+    try:
+        for query in queries:
+            fixtures[query.lower()] = await _fetch_products(query, country_code, page_size, None)
+    finally:
+        await close_client()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(fixtures, ensure_ascii=False), encoding="utf-8")
+    return sum(len(p) for p in fixtures.values())
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Local OpenFoodFacts simulator for load tests.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Serve a fake /cgi/search.pl")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=9000)
+
+    record = sub.add_parser("record", help="Record live responses for the catalog ingredients as fixtures")
+    record.add_argument("--output", type=Path, required=True)
+    record.add_argument("--country", default="DE")
+    record.add_argument("--page-size", type=int, default=25)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        import uvicorn
+
+        uvicorn.run(create_app(), host=args.host, port=args.port)
+        return
+
+    with CATALOG_PATH.open("r", encoding="utf-8") as f:
+        queries = [food["name"] for food in json.load(f)]
+    count = asyncio.run(record_fixtures(queries, args.output, args.country, args.page_size))
+    print(f"Recorded {count} products for {len(queries)} queries into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import codecs
+import json
+import re
+from typing import Any, Callable
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Parser states over the top-level search response object.
+_OPEN, _KEY, _COLON, _VALUE, _AFTER_VALUE, _FIRST_ITEM, _ITEM, _AFTER_ITEM, _DONE = range(9)
+
+
+class SearchResultStream:
+    # Incremental parser for a /cgi/search.pl body. Every top-level value is decoded whole except the
+    # "products" array, whose elements are decoded and handed out one by one as their bytes arrive, so
+    # only the unparsed tail of the body is held instead of the whole document and its parse tree.
+    # `keep` may trim or drop each product (None) before it is returned.
+    def __init__(self, keep: Callable[[dict[str, Any]], dict[str, Any] | None] | None = None) -> None:
+        self._keep = keep
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = _OPEN
+        self._key: str | None = None
+        self._retry_at = 0
+
+    def feed(self, chunk: bytes) -> list[dict[str, Any]]:
+        return self._parse(self._text.decode(chunk), final=False)
+
+    def close(self) -> list[dict[str, Any]]:
+        products = self._parse(self._text.decode(b"", final=True), final=True)
+        if self._state != _DONE:
+            raise ValueError("Truncated OpenFoodFacts search response")
+        return products
+
+    def _parse(self, text: str, final: bool) -> list[dict[str, Any]]:
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+        products: list[dict[str, Any]] = []
+        if len(self._buffer) < self._retry_at and not final:
+            return products
+        while self._step(products, final):
+            pass
+        return products
+
+    def _decode(self, pos: int, final: bool) -> tuple[Any, int] | None:
+        # None means the value is not complete yet. A value that ends exactly at the end of the buffer
+        # is also held back: a number such as 12 may still be the start of 125.
+        try:
+            value, end = self._json.raw_decode(self._buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            value, end = None, len(self._buffer)
+        if end == len(self._buffer) and not final:
+            # Retry once the unparsed tail has doubled, so a value split over many small chunks is
+            # re-scanned a logarithmic number of times instead of once per chunk.
+            self._retry_at = 2 * (len(self._buffer) - pos)
+            return None
+        self._retry_at = 0
+        return value, end
+
+    def _step(self, products: list[dict[str, Any]], final: bool) -> bool:
+        pos = _WHITESPACE.match(self._buffer, self._pos).end()
+        self._pos = pos
+        if pos == len(self._buffer):
+            return False
+        char = self._buffer[pos]
+        state = self._state
+
+        if state == _OPEN:
+            if char != "{":
+                raise ValueError("OpenFoodFacts search response is not a JSON object")
+            self._advance(pos + 1, _KEY)
+        elif state == _KEY:
+            if char == "}":
+                self._advance(pos + 1, _DONE)
+                return True
+            decoded = self._decode(pos, final)
+            if decoded is None:
+                return False
+            self._key, end = decoded
+            self._advance(end, _COLON)
+        elif state == _COLON:
+            self._expect(char, ":")
+            self._advance(pos + 1, _VALUE)
+        elif state == _VALUE:
+            if self._key == "products" and char == "[":
+                self._advance(pos + 1, _FIRST_ITEM)
+                return True
+            decoded = self._decode(pos, final)
+            if decoded is None:
+                return False
+            self._advance(decoded[1], _AFTER_VALUE)
+        elif state == _AFTER_VALUE:
+            self._expect(char, ",}")
+            self._advance(pos + 1, _KEY if char == "," else _DONE)
+        elif state in (_FIRST_ITEM, _ITEM):
+            if char == "]" and state == _FIRST_ITEM:
+                self._advance(pos + 1, _AFTER_VALUE)
+                return True
+            decoded = self._decode(pos, final)
+            if decoded is None:
+                return False
+            product, end = decoded
+            if isinstance(product, dict):
+                kept = self._keep(product) if self._keep is not None else product
+                if kept is not None:
+                    products.append(kept)
+            self._advance(end, _AFTER_ITEM)
+        elif state == _AFTER_ITEM:
+            self._expect(char, ",]")
+            self._advance(pos + 1, _ITEM if char == "," else _AFTER_VALUE)
+        else:
+            raise ValueError("Unexpected data after the OpenFoodFacts search response")
+        return True
+
+    def _advance(self, pos: int, state: int) -> None:
+        self._pos = pos
+        self._state = state
+
+    @staticmethod
+    def _expect(char: str, allowed: str) -> None:
+        if char not in allowed:
+            raise ValueError(f"Malformed OpenFoodFacts search response near {char!r}")
@@ -1,13 +1,114 @@
-from typing import Any
+import asyncio
+import functools
+import importlib.util
+from typing import Any, Callable, Iterable, TypeVar
+from urllib.parse import urlsplit
 import httpx
+from app.core import metrics
 from app.core.config import settings
+from app.core.executors import run_io
+from app.clients.off_governor import CircuitOpen, get_governor, reset_governors
+from app.clients.off_index import NUTRIMENT_FIELDS, get_product_index
+from app.clients.off_stream import SearchResultStream
+from app.clients.product_cache import CacheEntry, CacheKey, ProductCache, cache_key, get_product_cache
 
+T = TypeVar("T")
 
-async def search_products(
+_refreshing: dict[CacheKey, asyncio.Task] = {}
+_batch_fetches: set[asyncio.Task] = set()
+_inflight: dict[CacheKey, "_Flight"] = {}
+
+# Everything retail matching and product recommendations read. Full search results also carry
+# ingredients, images, packaging and every nutriment, several KB per product that would only be discarded.
+PRODUCT_FIELDS = (
+    "product_name",
+    "brands",
+    "stores",
+    "stores_tags",
+    "nutriments",
+    "nutriscore_grade",
+    "price",
+    "price_currency",
+)
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def build_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    # HTTP/2 needs the optional `h2` package; fall back to pooled HTTP/1.1 keep-alive without it.
+    http2 = settings.openfoodfacts_http2 and importlib.util.find_spec("h2") is not None
+    if transport is None and settings.openfoodfacts_transport == "simulator":
+        from app.clients.off_simulator import build_transport
+
+        transport = build_transport()
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.openfoodfacts_timeout_s, connect=settings.openfoodfacts_connect_timeout_s),
+        limits=httpx.Limits(
+            max_connections=settings.openfoodfacts_max_connections,
+            max_keepalive_connections=settings.openfoodfacts_max_keepalive_connections,
+            keepalive_expiry=settings.openfoodfacts_keepalive_expiry_s,
+        ),
+        http2=http2,
+        headers={"User-Agent": settings.openfoodfacts_user_agent},
+        transport=transport,
+    )
+
+
+async def open_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    global _client, _client_loop
+    await close_client()
+    _client = build_client(transport)
+    _client_loop = asyncio.get_running_loop()
+    return _client
+
+
+async def close_client() -> None:
+    global _client, _client_loop
+    client, _client, _client_loop = _client, None, None
+    reset_governors()
+    if client is not None:
+        await client.aclose()
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    # Pools are bound to the loop that opened them; scripts and tests outside the app lifespan
+    # get a fresh client per loop instead of reusing sockets from a dead one.
+    if _client is None or _client_loop is not loop:
+        _client = build_client()
+        _client_loop = loop
+        reset_governors()
+    return _client
+
+
+def _slim(product: dict[str, Any]) -> dict[str, Any]:
+    # `fields` cannot select inside nutriments, so the per-100 g values we use are picked here, before
+    # the product reaches the cache.
+    slim = {field: product[field] for field in PRODUCT_FIELDS if field in product}
+    nutriments = product.get("nutriments")
+    if isinstance(nutriments, dict):
+        slim["nutriments"] = {k: nutriments[k] for k in NUTRIMENT_FIELDS if k in nutriments}
+    return slim
+
+
+async def _stream_products(client: httpx.AsyncClient, url: str, params: dict[str, Any]) -> list[dict[str, Any]]:
+    parser = SearchResultStream(_slim)
+    products: list[dict[str, Any]] = []
+    async with client.stream("GET", url, params=params) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            products += parser.feed(chunk)
+    products += parser.close()
+    return products
+
+
+async def _fetch_products(
     query: str,
     country_code: str,
-    page_size: int = 10,
-    store: str | None = None,
+    page_size: int,
+    store: str | None,
 ) -> list[dict[str, Any]]:
     url = f"{settings.openfoodfacts_base_url}/cgi/search.pl"
     params = {
@@ -19,13 +120,284 @@ async def search_products(
         "tagtype_0": "countries",
         "tag_contains_0": "contains",
         "tag_0": country_code.lower(),
+        "fields": ",".join(PRODUCT_FIELDS),
     }
     if store:
         params["tagtype_1"] = "stores"
         params["tag_contains_1"] = "contains"
         params["tag_1"] = store.lower()
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        response = await client.get(url, params=params)
-        response.raise_for_status()
-        payload = response.json()
-    return payload.get("products", [])
+    client = get_client()
+    # The governor raises CircuitOpen without a request while the host is failing.
+    return await get_governor(urlsplit(url).netloc).call(functools.partial(_stream_products, client, url, params))
+
+
+async def _fetch_and_store(
+    cache: ProductCache,
+    key: CacheKey,
+    query: str,
+    country_code: str,
+    page_size: int,
+    store: str | None,
+    keep_usable: bool = False,
+) -> list[dict[str, Any]]:
+    # keep_usable: a refresh of an entry that may still be served. Like a background refresh, it only
+    # replaces a usable product list with a non-empty one, never with a failure or an empty result.
+    try:
+        products = await _fetch_products(query, country_code, page_size, store)
+    except CircuitOpen:
+        # Not an answer from upstream: the next lookup after the cooldown should really ask.
+        raise
+    except Exception:
+        if not (keep_usable and await _has_products(cache, key)):
+            await _cache_io(cache.set, key, [], True)
+        raise
+    if products or not (keep_usable and await _has_products(cache, key)):
+        await _cache_io(cache.set, key, products, not products)
+    return products
+
+
+async def _cache_io(fn: Callable[..., T], *args: Any) -> T:
+    # Product cache calls that may touch the SQLite file run in the I/O pool, off the event loop. They
+    # belong to requests already admitted, so they queue for a thread instead of being rejected.
+    return await run_io(fn, *args, bounded=False)
+
+
+async def _has_products(cache: ProductCache, key: CacheKey) -> bool:
+    entry = await _cache_io(cache.get, key)
+    return entry is not None and not entry.negative
+
+
+class _Flight:
+    # One upstream lookup shared by every concurrent caller of the same key. Callers await it through a
+    # shield, so one caller's timeout or disconnect does not fail the others; the lookup itself is only
+    # cancelled once its last caller has gone.
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+def _land(key: CacheKey, task: asyncio.Task) -> None:
+    flight = _inflight.get(key)
+    if flight is not None and flight.task is task:
+        del _inflight[key]
+    if not task.cancelled():
+        # Marks the error as retrieved even when every waiter has already left.
+        task.exception()
+
+
+async def _single_flight(
+    cache: ProductCache | None,
+    key: CacheKey,
+    query: str,
+    country_code: str,
+    page_size: int,
+    store: str | None,
+    keep_usable: bool = False,
+) -> list[dict[str, Any]]:
+    loop = asyncio.get_running_loop()
+    flight = _inflight.get(key)
+    if flight is None or flight.task.done() or flight.task.cancelling() or flight.task.get_loop() is not loop:
+        if cache is None:
+            lookup = _fetch_products(query, country_code, page_size, store)
+        else:
+            lookup = _fetch_and_store(cache, key, query, country_code, page_size, store, keep_usable)
+        flight = _inflight[key] = _Flight(loop.create_task(lookup))
+        flight.task.add_done_callback(functools.partial(_land, key))
+        metrics.inc("off_single_flight_total", role="leader")
+    else:
+        metrics.inc("off_single_flight_total", role="follower")
+
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    finally:
+        flight.waiters -= 1
+        if not flight.waiters and not flight.task.done():
+            flight.task.cancel()
+
+
+async def _refresh_in_background(
+    cache: ProductCache,
+    key: CacheKey,
+    query: str,
+    country_code: str,
+    page_size: int,
+    store: str | None,
+) -> None:
+    try:
+        products = await _fetch_products(query, country_code, page_size, store)
+    except Exception:
+        # Keep serving the stale entry; the next stale hit will try again.
+        return
+    finally:
+        _refreshing.pop(key, None)
+    if products:
+        await _cache_io(cache.set, key, products)
+
+
+def _schedule_refresh(
+    cache: ProductCache,
+    key: CacheKey,
+    query: str,
+    country_code: str,
+    page_size: int,
+    store: str | None,
+) -> None:
+    if key not in _refreshing:
+        _refreshing[key] = asyncio.create_task(
+            _refresh_in_background(cache, key, query, country_code, page_size, store)
+        )
+
+
+def _search_local(query: str, country_code: str, page_size: int, store: str | None) -> list[dict[str, Any]]:
+    # SQLite reads block, so the local index is only queried from the I/O pool, never on the event loop.
+    return get_product_index().search(query, country_code, page_size, store)
+
+
+def _search_local_many(
+    queries: list[str], country_code: str, page_size: int, store: str | None
+) -> dict[str, list[dict[str, Any]]]:
+    return get_product_index().search_many(queries, country_code, page_size, store)
+
+
+async def _pick_local(found: asyncio.Future, query: str) -> list[dict[str, Any]]:
+    # Shielded: a caller giving up on one query at its deadline must not cancel the shared search.
+    try:
+        return (await asyncio.shield(found)).get(query, [])
+    except Exception:
+        return []
+
+
+async def search_products(
+    query: str,
+    country_code: str,
+    page_size: int = 10,
+    store: str | None = None,
+) -> list[dict[str, Any]]:
+    if settings.openfoodfacts_backend == "local":
+        return await run_io(_search_local, query, country_code, page_size, store)
+
+    cache = get_product_cache()
+    key = cache_key(query, country_code, page_size, store)
+    if cache is None:
+        return await _single_flight(None, key, query, country_code, page_size, store)
+
+    entry = cache.peek_many([key]).get(key) or await _cache_io(cache.get, key)
+    if entry is not None:
+        if not cache.is_fresh(entry):
+            metrics.inc("off_cache_lookups_total", result="stale")
+            _schedule_refresh(cache, key, query, country_code, page_size, store)
+        else:
+            metrics.inc("off_cache_lookups_total", result="hit")
+        return entry.products
+
+    metrics.inc("off_cache_lookups_total", result="miss")
+    return await _single_flight(cache, key, query, country_code, page_size, store)
+
+
+async def refresh_products(
+    query: str,
+    country_code: str,
+    page_size: int = 10,
+    store: str | None = None,
+) -> list[dict[str, Any]]:
+    # Fetches a query whatever the cache holds, joining a lookup already in flight for it. A failure or
+    # an empty answer leaves a cached product list in place, so a refresh can never make things worse.
+    if settings.openfoodfacts_backend == "local":
+        return await run_io(_search_local, query, country_code, page_size, store)
+    key = cache_key(query, country_code, page_size, store)
+    return await _single_flight(get_product_cache(), key, query, country_code, page_size, store, keep_usable=True)
+
+
+def start_products_batch(
+    queries: Iterable[str],
+    country_code: str,
+    page_size: int = 25,
+    store: str | None = None,
+    timeout_s: float | None = None,
+) -> dict[str, asyncio.Future]:
+    # search.pl has no OR across search terms, so a batch resolves every cached query with one
+    # bulk cache read and sends the remaining distinct queries in a single concurrent wave
+    # (bounded only by the shared per-host governor). Each query gets a future that resolves to its
+    # products, or [] on failure, so callers can stop waiting at a deadline and keep what resolved.
+    loop = asyncio.get_running_loop()
+
+    def done(products: list[dict[str, Any]]) -> asyncio.Future:
+        future = loop.create_future()
+        future.set_result(products)
+        return future
+
+    if settings.openfoodfacts_backend == "local":
+        queries = list(queries)
+        found = asyncio.ensure_future(run_io(_search_local_many, queries, country_code, page_size, store))
+        return {q: asyncio.ensure_future(_pick_local(found, q)) for q in queries}
+
+    by_key: dict[CacheKey, list[str]] = {}
+    for query in queries:
+        by_key.setdefault(cache_key(query, country_code, page_size, store), []).append(query)
+
+    cache = get_product_cache()
+
+    def served(key: CacheKey, entry: CacheEntry) -> list[dict[str, Any]]:
+        if not cache.is_fresh(entry):
+            metrics.inc("off_cache_lookups_total", result="stale")
+            _schedule_refresh(cache, key, by_key[key][0], country_code, page_size, store)
+        else:
+            metrics.inc("off_cache_lookups_total", result="hit")
+        return entry.products
+
+    # Hot entries come from the cache's memory tier at once; the rest are read from its file in one
+    # bulk query in the I/O pool, and only what is still missing goes upstream.
+    resolved: dict[CacheKey, asyncio.Future] = {}
+    stored: asyncio.Future | None = None
+    if cache is not None:
+        for key, entry in cache.peek_many(list(by_key)).items():
+            resolved[key] = done(served(key, entry))
+        rest = [key for key in by_key if key not in resolved]
+        if rest:
+            stored = asyncio.ensure_future(_cache_io(cache.get_many, rest))
+            # Marks a failed read as retrieved even if every fetch was cancelled before awaiting it.
+            stored.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    async def fetch(key: CacheKey) -> list[dict[str, Any]]:
+        if stored is not None:
+            try:
+                # Shielded: one caller giving up at its deadline must not cancel the shared read.
+                entry = (await asyncio.shield(stored)).get(key)
+            except Exception:
+                entry = None
+            if entry is not None:
+                return served(key, entry)
+        if cache is not None:
+            metrics.inc("off_cache_lookups_total", result="miss")
+        # Concurrent requests for the same ingredients join one upstream lookup per key.
+        lookup = _single_flight(cache, key, by_key[key][0], country_code, page_size, store)
+        try:
+            return await asyncio.wait_for(lookup, timeout=timeout_s)
+        except Exception:
+            return []
+
+    for key in by_key:
+        if key not in resolved:
+            task = resolved[key] = asyncio.ensure_future(fetch(key))
+            # Callers may stop waiting at a deadline; the fetch still finishes and fills the cache.
+            _batch_fetches.add(task)
+            task.add_done_callback(_batch_fetches.discard)
+
+    return {query: resolved[key] for key, names in by_key.items() for query in names}
+
+
+async def search_products_batch(
+    queries: Iterable[str],
+    country_code: str,
+    page_size: int = 25,
+    store: str | None = None,
+    timeout_s: float | None = None,
+) -> dict[str, list[dict[str, Any]]]:
+    # On the HTTP backend this saves upstream calls only through deduplication and cache hits; every
+    # distinct uncached query is still its own search request, just dispatched concurrently.
+    futures = start_products_batch(queries, country_code, page_size, store, timeout_s)
+    await asyncio.gather(*set(futures.values()))
+    return {query: future.result() for query, future in futures.items()}
@@ -0,0 +1,211 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+CacheKey = tuple[str, str, int, str]
+
+
+def cache_key(query: str, country_code: str, page_size: int, store: str | None) -> CacheKey:
+    return (query.strip().lower(), country_code.strip().lower(), int(page_size), (store or "").strip().lower())
+
+
+def _encode_key(key: CacheKey) -> str:
+    return "\x1f".join(str(part) for part in key)
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    products: list[dict[str, Any]]
+    stored_at: float
+    negative: bool = False
+
+
+class ProductCache:
+    # Two tiers: a small in-process LRU for hot keys and an optional SQLite file that survives restarts.
+    def __init__(
+        self,
+        path: str | Path | None,
+        ttl_s: float,
+        negative_ttl_s: float,
+        stale_s: float,
+        max_entries: int,
+    ) -> None:
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self.stale_s = stale_s
+        self.max_entries = max(1, max_entries)
+        self._memory: OrderedDict[CacheKey, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        if path:
+            db_path = Path(path)
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            # Several server workers share the file; wait on their write locks rather than failing.
+            self._db = sqlite3.connect(str(db_path), timeout=5.0, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS products ("
+                "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, negative INTEGER NOT NULL, payload TEXT NOT NULL)"
+            )
+
+    def is_fresh(self, entry: CacheEntry, now: float | None = None) -> bool:
+        age = (now if now is not None else time.time()) - entry.stored_at
+        return age < (self.negative_ttl_s if entry.negative else self.ttl_s)
+
+    def is_usable(self, entry: CacheEntry, now: float | None = None) -> bool:
+        # Negative entries are never served stale: once they lapse the upstream gets another chance.
+        if entry.negative:
+            return self.is_fresh(entry, now)
+        age = (now if now is not None else time.time()) - entry.stored_at
+        return age < self.ttl_s + self.stale_s
+
+    def peek_many(self, keys: list[CacheKey]) -> dict[CacheKey, CacheEntry]:
+        # Memory tier only, with the entries get() would return without reading the file: safe to call on
+        # the event loop. Anything missing here needs get()/get_many() from a thread.
+        now = time.time()
+        found: dict[CacheKey, CacheEntry] = {}
+        with self._lock:
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is None:
+                    continue
+                if self.is_fresh(entry, now) or (self._db is None and self.is_usable(entry, now)):
+                    self._memory.move_to_end(key)
+                    found[key] = entry
+        return found
+
+    def get(self, key: CacheKey) -> CacheEntry | None:
+        now = time.time()
+        with self._lock:
+            memory = self._memory.get(key)
+            if memory is not None:
+                if self.is_fresh(memory, now) or (self._db is None and self.is_usable(memory, now)):
+                    self._memory.move_to_end(key)
+                    return memory
+                if not self.is_usable(memory, now):
+                    del self._memory[key]
+                    memory = None
+
+            if self._db is None:
+                return None
+            # A stale memory entry may already have been refreshed by another worker sharing the file.
+            row = self._db.execute(
+                "SELECT stored_at, negative, payload FROM products WHERE key = ?", (_encode_key(key),)
+            ).fetchone()
+            if row is None or (memory is not None and row[0] <= memory.stored_at):
+                return memory
+            entry = CacheEntry(products=json.loads(row[2]), stored_at=row[0], negative=bool(row[1]))
+            if not self.is_usable(entry, now):
+                self._db.execute("DELETE FROM products WHERE key = ?", (_encode_key(key),))
+                return memory
+            self._remember(key, entry)
+            return entry
+
+    def get_many(self, keys: list[CacheKey]) -> dict[CacheKey, CacheEntry]:
+        now = time.time()
+        found: dict[CacheKey, CacheEntry] = {}
+        with self._lock:
+            missing: dict[str, CacheKey] = {}
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is not None and self.is_usable(entry, now):
+                    self._memory.move_to_end(key)
+                    found[key] = entry
+                if entry is None or not self.is_fresh(entry, now):
+                    missing[_encode_key(key)] = key
+
+            if self._db is None or not missing:
+                return found
+            placeholders = ",".join("?" * len(missing))
+            rows = self._db.execute(
+                f"SELECT key, stored_at, negative, payload FROM products WHERE key IN ({placeholders})",
+                list(missing),
+            ).fetchall()
+            for encoded, stored_at, negative, payload in rows:
+                key = missing[encoded]
+                if key in found and stored_at <= found[key].stored_at:
+                    continue
+                entry = CacheEntry(products=json.loads(payload), stored_at=stored_at, negative=bool(negative))
+                if self.is_usable(entry, now):
+                    self._remember(key, entry)
+                    found[key] = entry
+            return found
+
+    def set(self, key: CacheKey, products: list[dict[str, Any]], negative: bool = False) -> CacheEntry:
+        entry = CacheEntry(products=products, stored_at=time.time(), negative=negative)
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO products (key, stored_at, negative, payload) VALUES (?, ?, ?, ?)",
+                    (_encode_key(key), entry.stored_at, int(negative), json.dumps(products, separators=(",", ":"))),
+                )
+        return entry
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            for key in [k for k, e in self._memory.items() if not self.is_usable(e, now)]:
+                del self._memory[key]
+            if self._db is None:
+                return 0
+            cursor = self._db.execute(
+                "DELETE FROM products WHERE (negative = 1 AND stored_at < ?) OR (negative = 0 AND stored_at < ?)",
+                (now - self.negative_ttl_s, now - self.ttl_s - self.stale_s),
+            )
+            return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM products")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: CacheKey, entry: CacheEntry) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+_cache: ProductCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_product_cache() -> ProductCache | None:
+    global _cache
+    if not settings.openfoodfacts_cache_enabled:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ProductCache(
+                    path=settings.openfoodfacts_cache_path,
+                    ttl_s=settings.openfoodfacts_cache_ttl_s,
+                    negative_ttl_s=settings.openfoodfacts_cache_negative_ttl_s,
+                    stale_s=settings.openfoodfacts_cache_stale_s,
+                    max_entries=settings.openfoodfacts_cache_max_entries,
+                )
+    return _cache
+
+
+def set_product_cache(cache: ProductCache | None) -> None:
+    global _cache
+    with _cache_lock:
+        if _cache is not None and _cache is not cache:
+            _cache.close()
+        _cache = cache
@@ -7,6 +7,111 @@ class Settings(BaseSettings):
     openfoodfacts_base_url: str = "https://world.openfoodfacts.org"
     usda_api_key: str | None = None
 
+    openfoodfacts_user_agent: str = "FitPlanner/2.0 (recomposition planner)"
+    openfoodfacts_timeout_s: float = 15.0
+    openfoodfacts_connect_timeout_s: float = 5.0
+    openfoodfacts_max_connections: int = 20
+    openfoodfacts_max_keepalive_connections: int = 10
+    openfoodfacts_keepalive_expiry_s: float = 30.0
+    openfoodfacts_http2: bool = True
+
+    # Process-wide governor per OpenFoodFacts host (app.clients.off_governor). Concurrency starts at
+    # openfoodfacts_max_concurrency_per_host and adapts between the min and max limits: +1 per window of
+    # fast successes, times the backoff on timeouts, 429/5xx or responses slower than the threshold.
+    openfoodfacts_max_concurrency_per_host: int = 8
+    openfoodfacts_min_concurrency_per_host: int = 1
+    openfoodfacts_max_concurrency_limit: int = 32
+    openfoodfacts_concurrency_backoff: float = 0.5
+    openfoodfacts_latency_threshold_s: float = 3.0
+    # Token bucket in front of the limit; 0 disables it.
+    openfoodfacts_rate_limit_per_s: float = 10.0
+    openfoodfacts_rate_burst: int = 20
+    # Consecutive upstream failures that open the circuit, and how long lookups then fail fast with no
+    # products before one probe request is let through.
+    openfoodfacts_breaker_failure_threshold: int = 5
+    openfoodfacts_breaker_cooldown_s: float = 30.0
+
+    # "http" queries the live search API; "local" reads the offline index built by app.clients.off_index.
+    openfoodfacts_backend: str = "http"
+    openfoodfacts_index_path: str = ".cache/openfoodfacts_index.sqlite3"
+
+    # "network" talks to openfoodfacts_base_url; "simulator" routes the pooled client to the in-process
+    # fake in app.clients.off_simulator, for load tests without the live service.
+    openfoodfacts_transport: str = "network"
+    openfoodfacts_simulator_latency_median_ms: float = 120.0
+    openfoodfacts_simulator_latency_p95_ms: float = 450.0
+    openfoodfacts_simulator_error_rate: float = 0.0
+    openfoodfacts_simulator_timeout_rate: float = 0.0
+    openfoodfacts_simulator_empty_rate: float = 0.0
+    openfoodfacts_simulator_padding_bytes: int = 0
+    openfoodfacts_simulator_fixtures_path: str | None = None
+    openfoodfacts_simulator_seed: int | None = None
+
+    openfoodfacts_cache_enabled: bool = True
+    openfoodfacts_cache_path: str | None = ".cache/openfoodfacts.sqlite3"
+    openfoodfacts_cache_ttl_s: float = 24 * 3600
+    openfoodfacts_cache_negative_ttl_s: float = 300
+    openfoodfacts_cache_stale_s: float = 7 * 24 * 3600
+    openfoodfacts_cache_max_entries: int = 4096
+
+    # Background job that keeps the product cache warm for every catalog food in each country, so no
+    # request pays for a cold lookup. Each pass refreshes entries missing or due to expire before the
+    # next pass, one upstream request at a time at most cache_warmer_rate_per_s. Countries are a JSON
+    # list in the environment, e.g. CACHE_WARMER_COUNTRIES='["DE","GB"]'.
+    cache_warmer_enabled: bool = False
+    cache_warmer_countries: list[str] = ["DE"]
+    cache_warmer_interval_s: float = 6 * 3600
+    cache_warmer_rate_per_s: float = 2.0
+
+    # Directory of nutrient matrices precompiled by app.server; workers memory-map them read-only (the
+    # rest of the catalog is still loaded per worker).
+    catalog_compiled_dir: str | None = None
+
+    # Memoization of deterministic plan computations (physiology, projection, weekly meals).
+    plan_cache_enabled: bool = True
+    plan_cache_max_entries: int = 2048
+    plan_cache_ttl_s: float = 3600
+
+    # Budget for one /generate-meals plan, from its start; retail lookups still running at the deadline
+    # are returned as pending, finish in the background and stay queryable for the registry TTL.
+    generate_meals_deadline_s: float = 2.5
+    enrichment_registry_ttl_s: float = 600
+    enrichment_registry_max_entries: int = 4096
+
+    # Generated plans kept so POST /replan can take just a plan_key; a week plus a margin. The SQLite file
+    # is shared by all server workers; None keeps plans in each worker's memory.
+    plan_store_path: str | None = ".cache/plans.sqlite3"
+    plan_store_ttl_s: float = 8 * 24 * 3600
+    plan_store_max_entries: int = 1024
+
+    # Plans of a /generate-meals/batch request processed concurrently; bounds buffered results too.
+    batch_concurrency: int = 8
+    calculate_batch_chunk_size: int = 512
+
+    # CPU-heavy meal solving runs in a process pool ("process"), a thread pool ("thread") or on the event
+    # loop ("inline"). Calls beyond the queue limit get 503 with Retry-After. By default the limit admits
+    # what the workers clear within executor_cpu_queue_wait_s, given executor_cpu_service_time_s per call
+    # (about 5 ms of solving plus process hand-off): 100 per worker. A non-zero executor_cpu_queue_limit
+    # overrides it. 0 CPU workers means one per core.
+    executor_mode: str = "process"
+    executor_cpu_workers: int = 0
+    executor_cpu_queue_limit: int = 0
+    executor_cpu_queue_wait_s: float = 1.0
+    executor_cpu_service_time_s: float = 0.01
+    executor_io_workers: int = 4
+    executor_retry_after_s: int = 1
+
+    # Counters and stage timers behind /metrics; Server-Timing adds per-stage durations to responses.
+    metrics_enabled: bool = True
+    metrics_server_timing: bool = False
+
+    # gzip/brotli for responses at least this large, negotiated from Accept-Encoding. Brotli needs the
+    # optional brotli package; low levels keep CPU per request small while still shrinking JSON ~5x.
+    response_compression_enabled: bool = True
+    response_compression_min_bytes: int = 1024
+    response_gzip_level: int = 5
+    response_brotli_quality: int = 4
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
 
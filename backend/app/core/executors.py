@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.core import metrics
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class ExecutorSaturated(Exception):
+    def __init__(self, pool: str, retry_after_s: int) -> None:
+        super().__init__(f"{pool} pool is saturated")
+        self.pool = pool
+        self.retry_after_s = retry_after_s
+
+
+class BoundedExecutor:
+    # Admission control in front of a concurrent.futures pool: at most `limit` calls are queued or
+    # running. Rejecting at the door keeps latency bounded instead of letting the backlog grow.
+    def __init__(self, name: str, executor: Executor, limit: int) -> None:
+        self.name = name
+        self.executor = executor
+        self.limit = max(1, limit)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    async def run(self, fn: Callable[..., T], *args: Any, bounded: bool = True) -> T:
+        with self._lock:
+            if bounded and self.in_flight >= self.limit:
+                metrics.inc("executor_rejected_total", pool=self.name)
+                raise ExecutorSaturated(self.name, settings.executor_retry_after_s)
+            self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _init_cpu_worker() -> None:
+    from app.services.catalog import get_catalog
+
+    # Results are memoized in the parent (see plan_cache.offload_memoized), so workers don't keep a
+    # second copy; the catalog is compiled once per worker instead of on its first job.
+    settings.plan_cache_enabled = False
+    get_catalog()
+
+
+def _cpu_workers() -> int:
+    return settings.executor_cpu_workers or os.cpu_count() or 1
+
+
+def _cpu_queue_limit(workers: int) -> int:
+    # Little's law: with `workers` busy and each call taking service_time_s, the last of N admitted calls
+    # waits about N * service_time_s / workers. Admit as many as fit in the acceptable wait.
+    if settings.executor_cpu_queue_limit:
+        return settings.executor_cpu_queue_limit
+    per_worker = settings.executor_cpu_queue_wait_s / max(settings.executor_cpu_service_time_s, 1e-6)
+    return max(workers, int(workers * per_worker))
+
+
+def _build_cpu_pool() -> BoundedExecutor:
+    workers = _cpu_workers()
+    limit = _cpu_queue_limit(workers)
+    if settings.executor_mode == "thread":
+        return BoundedExecutor("cpu", ThreadPoolExecutor(workers, thread_name_prefix="cpu"), limit)
+    # forkserver forks workers from a clean, preloaded process rather than from the running server,
+    # which has live threads and sockets that must not be duplicated.
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["app.services.meal_engine", "app.services.grocery_engine"])
+    return BoundedExecutor(
+        "cpu", ProcessPoolExecutor(workers, mp_context=context, initializer=_init_cpu_worker), limit
+    )
+
+
+_cpu: BoundedExecutor | None = None
+_io: BoundedExecutor | None = None
+
+
+def start_executors() -> None:
+    global _cpu, _io
+    shutdown_executors()
+    if settings.executor_mode != "inline":
+        _cpu = _build_cpu_pool()
+    workers = settings.executor_io_workers
+    _io = BoundedExecutor("io", ThreadPoolExecutor(workers, thread_name_prefix="io"), workers * 4)
+
+
+def _ping() -> None:
+    return None
+
+
+async def warm_executors() -> None:
+    # Process pools start workers lazily, one per submission that finds none idle; spin them all up
+    # (forkserver, imports, catalog) before traffic arrives instead of on the first requests.
+    if _cpu is not None:
+        await asyncio.gather(*(_cpu.run(_ping, bounded=False) for _ in range(_cpu_workers())))
+
+
+def shutdown_executors() -> None:
+    global _cpu, _io
+    pools, _cpu, _io = (_cpu, _io), None, None
+    for pool in pools:
+        if pool is not None:
+            pool.shutdown()
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any, bounded: bool = True) -> T:
+    # Outside the app lifespan (scripts, tests) or in inline mode the call runs on the caller's loop.
+    # fn and its arguments must be picklable in process mode.
+    if _cpu is None:
+        return fn(*args)
+    return await _cpu.run(fn, *args, bounded=bounded)
+
+
+async def run_io(fn: Callable[..., T], *args: Any, bounded: bool = True) -> T:
+    if _io is None:
+        return fn(*args)
+    return await _io.run(fn, *args, bounded=bounded)
@@ -0,0 +1,252 @@
+import bisect
+import contextvars
+import math
+import threading
+import time
+from typing import Any, Callable
+
+from app.core.config import settings
+
+PREFIX = "fitplanner_"
+# Latency buckets in seconds, from sub-millisecond physiology up to upstream timeouts.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+_counters: dict[str, dict[Labels, float]] = {}
+_histograms: dict[str, dict[Labels, _Histogram]] = {}
+_help: dict[str, str] = {}
+
+# Per-request list of (stage, start, duration) for the Server-Timing header; None outside a request.
+_timings: contextvars.ContextVar[list[tuple[str, float, float]] | None] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def describe(name: str, text: str) -> None:
+    _help[name] = text
+
+
+def inc(name: str, amount: float = 1.0, **labels: str) -> None:
+    if not settings.metrics_enabled:
+        return
+    key = tuple(sorted(labels.items()))
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0.0) + amount
+
+
+def observe(name: str, seconds: float, **labels: str) -> None:
+    if not settings.metrics_enabled:
+        return
+    key = tuple(sorted(labels.items()))
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = _Histogram()
+        histogram.observe(seconds)
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> "_Stage":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        elapsed = time.perf_counter() - self.start
+        observe("stage_seconds", elapsed, stage=self.name)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((self.name, self.start, elapsed))
+
+
+class _NoopStage:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopStage":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NOOP_STAGE = _NoopStage()
+
+
+def stage(name: str) -> _Stage | _NoopStage:
+    # Disabled metrics cost one attribute read and a shared no-op context manager.
+    if not settings.metrics_enabled:
+        return _NOOP_STAGE
+    return _Stage(name)
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    # Exact in the exposition format: whole numbers as integers (":g" turns 1234567 into 1.23457e+06),
+    # everything else with repr's shortest round-trip digits.
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+        return str(int(value))
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _collect_plan_caches() -> dict[str, dict[Labels, float]]:
+    from app.services.plan_cache import cache_stats
+
+    counters: dict[str, dict[Labels, float]] = {"plan_cache_hits_total": {}, "plan_cache_misses_total": {}}
+    for name, stats in cache_stats().items():
+        counters["plan_cache_hits_total"][(("cache", name),)] = stats["hits"]
+        counters["plan_cache_misses_total"][(("cache", name),)] = stats["misses"]
+    return counters
+
+
+def _collect_gauges() -> dict[str, dict[Labels, float]]:
+    from app.clients.off_governor import governor_gauges
+
+    return governor_gauges()
+
+
+def render() -> str:
+    with _lock:
+        counters = {name: dict(series) for name, series in _counters.items()}
+        histograms = {
+            name: {labels: (list(h.counts), h.total, h.count) for labels, h in series.items()}
+            for name, series in _histograms.items()
+        }
+    counters.update(_collect_plan_caches())
+    gauges = _collect_gauges()
+
+    lines: list[str] = []
+    for name in sorted(gauges):
+        full = PREFIX + name
+        if name in _help:
+            lines.append(f"# HELP {full} {_help[name]}")
+        lines.append(f"# TYPE {full} gauge")
+        for labels, value in sorted(gauges[name].items()):
+            lines.append(f"{full}{_format_labels(labels)} {_format_value(value)}")
+
+    for name in sorted(counters):
+        full = PREFIX + name
+        if name in _help:
+            lines.append(f"# HELP {full} {_help[name]}")
+        lines.append(f"# TYPE {full} counter")
+        for labels, value in sorted(counters[name].items()):
+            lines.append(f"{full}{_format_labels(labels)} {_format_value(value)}")
+
+    for name in sorted(histograms):
+        full = PREFIX + name
+        if name in _help:
+            lines.append(f"# HELP {full} {_help[name]}")
+        lines.append(f"# TYPE {full} histogram")
+        for labels, (counts, total, count) in sorted(histograms[name].items()):
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, counts):
+                cumulative += bucket
+                lines.append(f"{full}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+            lines.append(f"{full}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{full}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{full}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def _server_timing(timings: list[tuple[str, float, float]], response_start: float) -> str:
+    parts = [f"{name};dur={duration * 1000:.2f}" for name, _, duration in timings]
+    # Response validation and JSON encoding happen after the handler returns, outside any stage.
+    last_end = max(start + duration for _, start, duration in timings)
+    parts.append(f"serialize;dur={max(0.0, response_start - last_end) * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware so streaming responses pass through untouched.
+    def __init__(self, app: Callable) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        timings: list[tuple[str, float, float]] = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.metrics_server_timing and timings:
+                    header = _server_timing(timings, time.perf_counter()).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            observe("http_request_seconds", time.perf_counter() - start, method=scope["method"], path=path)
+            inc("http_requests_total", method=scope["method"], path=path, status=str(status))
+
+
+describe("stage_seconds", "Time spent in each pipeline stage.")
+describe("http_request_seconds", "Request latency by route, until the response body is fully sent.")
+describe("http_requests_total", "Requests by route and status.")
+describe("off_requests_total", "OpenFoodFacts requests by outcome (ok, error, timeout, cancelled, circuit_open).")
+describe("off_request_seconds", "OpenFoodFacts search request latency, excluding governor wait.")
+describe("off_host_limit_wait_seconds", "Time spent waiting for the OpenFoodFacts rate limit and concurrency limit.")
+describe("off_concurrency_limit", "Current adaptive concurrency limit per OpenFoodFacts host.")
+describe("off_in_flight", "OpenFoodFacts requests currently in flight per host.")
+describe("off_rate_tokens", "Tokens left in the per-host rate limit bucket; negative while callers queue.")
+describe("off_circuit_state", "Per-host circuit breaker state: 0 closed, 1 half-open, 2 open.")
+describe("off_circuit_transitions_total", "Circuit breaker transitions by new state.")
+describe("off_concurrency_decreases_total", "Multiplicative decreases of the OpenFoodFacts concurrency limit.")
+describe("off_single_flight_total", "Upstream lookups that started a request (leader) or joined one in flight (follower).")
+describe("off_cache_lookups_total", "Product cache lookups by result (hit, stale, miss).")
+describe("cache_warmer_lookups_total", "Catalog lookups by the product cache warmer (warmed, failed, skipped).")
+describe("enrichment_ingredients_total", "Ingredients looked up during retail enrichment by whether a product matched.")
+describe("plan_cache_hits_total", "Memoized plan computation hits.")
+describe("plan_cache_misses_total", "Memoized plan computation misses.")
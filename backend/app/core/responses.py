@@ -0,0 +1,79 @@
+import json
+from typing import Any, Callable
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from app.core.compression import parse_qvalues
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without the optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover
+    cbor2 = None
+
+# Response formats selectable by ?format= or by the matching Accept media type.
+FORMAT_MEDIA_TYPES = {
+    "json": "application/json",
+    "compact": "application/vnd.fitplanner.compact+json",
+    "msgpack": "application/vnd.fitplanner.compact+msgpack",
+    "cbor": "application/vnd.fitplanner.compact+cbor",
+}
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class ModelResponse(Response):
+    # Returning a Response from a route bypasses FastAPI's response_model handling, which would dump the
+    # model to a dict, validate it again and encode it through jsonable_encoder. Models built by our own
+    # services are already valid, so pydantic-core serializes them straight to bytes.
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode("utf-8")
+        return dumps(content)
+
+
+def _encoder(fmt: str) -> Callable[[Any], bytes] | None:
+    if fmt == "msgpack":
+        return msgpack.packb if msgpack is not None else None
+    if fmt == "cbor":
+        return cbor2.dumps if cbor2 is not None else None
+    return dumps
+
+
+def select_format(requested: str | None, accept: str) -> str:
+    if requested is None:
+        accepted = parse_qvalues(accept)
+        # Plain JSON wins ties and covers */* or a missing Accept header.
+        ranked = [(accepted.get(media, 0.0), fmt == "json", fmt) for fmt, media in FORMAT_MEDIA_TYPES.items()]
+        q, _, best = max(ranked)
+        requested = best if q > 0 else "json"
+    if requested not in FORMAT_MEDIA_TYPES:
+        raise HTTPException(status_code=406, detail=f"Unknown format {requested!r}")
+    if _encoder(requested) is None:
+        raise HTTPException(status_code=406, detail=f"Format {requested!r} is not available on this server")
+    return requested
+
+
+def encoded_response(content: Any, fmt: str) -> Response:
+    return Response(
+        content=_encoder(fmt)(content),
+        media_type=FORMAT_MEDIA_TYPES[fmt],
+        headers={"Vary": "Accept"},
+    )
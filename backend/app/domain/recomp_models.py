@@ -112,6 +112,8 @@ class IngredientAllocation(BaseModel):
     grams: int
     brand_hint: str | None = None
     retail_product: RetailProduct | None = None
+    # True when the retail lookup missed the response deadline; fetch it via the enrichment endpoint.
+    retail_pending: bool = False
 
 
 class Meal(BaseModel):
@@ -143,6 +145,7 @@ class GroceryItem(BaseModel):
     packages_to_buy: int
     leftover_g: int
     retail_product: RetailProduct | None = None
+    retail_pending: bool = False
 
 
 class CalculatePlanResponse(BaseModel):
@@ -152,10 +155,22 @@ class CalculatePlanResponse(BaseModel):
     projection: Projection
 
 
+class CalculatePlanBatchRequest(BaseModel):
+    plans: list[PlanInput] = Field(min_length=1, max_length=10000)
+
+
+class CalculatePlanBatchResponse(BaseModel):
+    results: list[CalculatePlanResponse]
+
+
 class GenerateMealsRequest(BaseModel):
     plan: PlanInput
 
 
+class GenerateMealsBatchRequest(BaseModel):
+    plans: list[PlanInput] = Field(min_length=1, max_length=1000)
+
+
 class GenerateMealsResponse(BaseModel):
     body_composition: BodyComposition
     calories: CaloriesPlan
@@ -163,6 +178,16 @@ class GenerateMealsResponse(BaseModel):
     projection: Projection
     meal_plan: WeeklyMealPlan
     grocery_list: list[GroceryItem]
+    enrichment_id: str | None = None
+    # Handle for POST /replan; kept in the shared plan store (PLAN_STORE_PATH) for PLAN_STORE_TTL_S.
+    plan_key: str | None = None
+
+
+class RetailEnrichmentStatus(BaseModel):
+    enrichment_id: str
+    complete: bool
+    products: dict[str, RetailProduct | None]
+    pending: list[str]
 
 
 class WeeklyCheckinRequest(BaseModel):
@@ -177,3 +202,21 @@ class WeeklyCheckinResponse(BaseModel):
     adjustment_kcal: int
     new_calorie_target: int
     note: str
+
+
+class ReplanRequest(BaseModel):
+    # checkin.previous_calorie_target is ignored: the adjustment applies to the previous plan's own target.
+    checkin: WeeklyCheckinRequest
+    plan_key: str | None = None
+    plan: PlanInput | None = None
+    previous: GenerateMealsResponse | None = None
+
+    @model_validator(mode="after")
+    def validate_source(self) -> "ReplanRequest":
+        if self.plan_key is None and (self.plan is None or self.previous is None):
+            raise ValueError("Provide plan_key, or both plan and previous")
+        return self
+
+
+class ReplanResponse(GenerateMealsResponse):
+    checkin: WeeklyCheckinResponse
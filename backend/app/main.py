@@ -1,8 +1,53 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.api.routes.health import router as health_router
+from app.api.routes.nutrition import router as nutrition_router
 from app.api.routes.recomp import router as recomp_router
+from app.clients.openfoodfacts_client import close_client, open_client
+from app.clients.product_cache import get_product_cache
+from app.core.compression import CompressionMiddleware
+from app.core.executors import ExecutorSaturated, run_io, shutdown_executors, start_executors, warm_executors
+from app.core.metrics import MetricsMiddleware
+from app.services.cache_warmer import start_cache_warmer, stop_cache_warmer
+from app.services.catalog import get_catalog
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    start_executors()
+    await warm_executors()
+    # Parse and index the food catalog once, before the first request pays for it.
+    await run_io(get_catalog)
+    cache = get_product_cache()
+    if cache is not None:
+        await run_io(cache.purge_expired)
+    await open_client()
+    warmer = start_cache_warmer()
+    try:
+        yield
+    finally:
+        await stop_cache_warmer(warmer)
+        await close_client()
+        shutdown_executors()
+
+
+async def executor_saturated(_: Request, exc: ExecutorSaturated) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, retry shortly"},
+        headers={"Retry-After": str(exc.retry_after_s)},
+    )
+
 
-app = FastAPI(title="FitPlanner Recomposition API", version="2.0.0")
+app = FastAPI(title="FitPlanner Recomposition API", version="2.0.0", lifespan=lifespan)
+# Metrics wraps compression so request latency includes encoding the body.
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_exception_handler(ExecutorSaturated, executor_saturated)
 
 app.include_router(health_router)
 app.include_router(recomp_router)
+app.include_router(nutrition_router)
@@ -0,0 +1,52 @@
+import argparse
+import os
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+from app.core.config import settings
+from app.services.catalog import write_compiled_catalog
+
+
+# State that lives in each worker's memory: enrichment jobs behind GET /generate-meals/enrichment/{id} and
+# /metrics counters (plan_key entries for POST /replan are in the shared SQLite plan store). With several
+# workers a poll or a scrape lands on a random worker, so more than one worker needs sticky routing and
+# per-worker scrapes.
+PER_WORKER_STATE = "enrichment polling and /metrics"
+
+
+def _default_workers() -> int:
+    return int(os.environ.get("WEB_CONCURRENCY") or 1)
+
+
+def prepare(workers: int) -> Path:
+    # Runs once in the supervisor before any worker starts. Workers inherit the environment, so settings
+    # set here reach them through pydantic-settings like any other configuration.
+    directory = Path(settings.catalog_compiled_dir or Path(tempfile.gettempdir()) / "fitplanner-catalog")
+    compiled = write_compiled_catalog(directory)
+    os.environ["CATALOG_COMPILED_DIR"] = str(directory)
+
+    # Every worker owns a CPU pool; split the cores between them instead of starting workers x cores processes.
+    if not settings.executor_cpu_workers and "EXECUTOR_CPU_WORKERS" not in os.environ:
+        os.environ["EXECUTOR_CPU_WORKERS"] = str(max(1, (os.cpu_count() or 1) // workers))
+    return compiled
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes.")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=_default_workers())
+    args = parser.parse_args(argv)
+
+    workers = max(1, args.workers)
+    compiled = prepare(workers)
+    print(f"Serving with {workers} workers, nutrient matrix mapped from {compiled}")
+    if workers > 1:
+        print(f"Warning: {PER_WORKER_STATE} are per worker; route clients to the same worker or use one worker.")
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=workers, proxy_headers=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from app.domain.recomp_models import WeeklyCheckinRequest, WeeklyCheckinResponse
+from app.domain.recomp_models import CaloriesPlan, WeeklyCheckinRequest, WeeklyCheckinResponse
 
 
 def apply_weekly_adjustment(checkin: WeeklyCheckinRequest) -> WeeklyCheckinResponse:
@@ -20,3 +20,17 @@ def apply_weekly_adjustment(checkin: WeeklyCheckinRequest) -> WeeklyCheckinRespo
         new_calorie_target=checkin.previous_calorie_target + adjustment,
         note=note,
     )
+
+
+def adjust_calories(calories: CaloriesPlan, adjustment_kcal: int) -> CaloriesPlan:
+    # Shift every day by the check-in adjustment, never below the same BMR floor calories_plan applies.
+    floor_target = int(round(calories.bmr * 1.2))
+    shift = max(adjustment_kcal, floor_target - calories.target)
+    return calories.model_copy(
+        update={
+            "daily_deficit": calories.daily_deficit - shift,
+            "target": calories.target + shift,
+            "training_day": calories.training_day + shift,
+            "rest_day": calories.rest_day + shift,
+        }
+    )
@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+from app.clients.off_governor import CircuitOpen, TokenBucket
+from app.clients.openfoodfacts_client import close_client, refresh_products
+from app.clients.product_cache import cache_key, get_product_cache
+from app.core import metrics
+from app.core.config import settings
+from app.core.executors import run_io
+from app.services.catalog import get_catalog
+from app.services.retail_enricher import CANDIDATE_PAGE_SIZE
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms warm from every worker
+    fcntl = None
+
+# Every ingredient a plan can contain comes from the catalog, and retailer preferences only rank the
+# cached candidates, so one cache entry per (food, country) serves every request for that country.
+
+
+def catalog_queries() -> list[str]:
+    return sorted({food["name"] for food in get_catalog().foods})
+
+
+def due_lookups(countries: list[str], horizon_s: float = 0.0) -> list[tuple[str, str]]:
+    # (country, food) pairs missing from the cache or no longer fresh horizon_s from now.
+    cache = get_product_cache()
+    pairs = {
+        cache_key(name, country, CANDIDATE_PAGE_SIZE, None): (country, name)
+        for country in countries
+        for name in catalog_queries()
+    }
+    if cache is None:
+        return list(pairs.values())
+    found = cache.get_many(list(pairs))
+    later = time.time() + horizon_s
+    return [pair for key, pair in pairs.items() if key not in found or not cache.is_fresh(found[key], later)]
+
+
+async def warm_product_cache(countries: list[str], rate_per_s: float, horizon_s: float = 0.0) -> dict[str, int]:
+    stats = {"due": 0, "warmed": 0, "failed": 0, "skipped": 0}
+    # Without a cache there is nothing to keep warm; the local index needs no warming.
+    if get_product_cache() is None or settings.openfoodfacts_backend == "local":
+        return stats
+    # A bulk read of the cache file; kept off the event loop that is serving requests.
+    due = await run_io(due_lookups, countries, horizon_s, bounded=False)
+    stats["due"] = len(due)
+    # One request at a time, on top of the governor's own limits, so users keep the upstream headroom.
+    bucket = TokenBucket(rate_per_s, burst=1)
+    for i, (country, name) in enumerate(due):
+        await bucket.acquire()
+        try:
+            await refresh_products(name, country, CANDIDATE_PAGE_SIZE)
+        except CircuitOpen:
+            # The host is down; leave the rest to the next pass instead of queueing on a dead upstream.
+            stats["skipped"] = len(due) - i
+            break
+        except Exception:
+            stats["failed"] += 1
+            continue
+        stats["warmed"] += 1
+    for outcome in ("warmed", "failed", "skipped"):
+        metrics.inc("cache_warmer_lookups_total", stats[outcome], outcome=outcome)
+    return stats
+
+
+async def run_warmer(countries: list[str], interval_s: float, rate_per_s: float) -> None:
+    # Each pass refreshes whatever would go stale before the next one, so entries never lapse in between.
+    while True:
+        try:
+            await warm_product_cache(countries, rate_per_s, horizon_s=interval_s)
+        except Exception:
+            # A broken pass (e.g. an unreadable cache file) must not end the schedule.
+            pass
+        await asyncio.sleep(interval_s)
+
+
+def _claim_warmer() -> int | None:
+    # Workers sharing one SQLite cache elect a single warmer through a lock file held for the process
+    # lifetime; a memory-only cache is per worker, so every worker warms its own.
+    if fcntl is None or not settings.openfoodfacts_cache_path:
+        return -1
+    fd = os.open(f"{settings.openfoodfacts_cache_path}.warmer.lock", os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def start_cache_warmer() -> asyncio.Task | None:
+    if not settings.cache_warmer_enabled or settings.openfoodfacts_backend == "local" or get_product_cache() is None:
+        return None
+    fd = _claim_warmer()
+    if fd is None:
+        return None
+    task = asyncio.create_task(
+        run_warmer(settings.cache_warmer_countries, settings.cache_warmer_interval_s, settings.cache_warmer_rate_per_s)
+    )
+    if fd >= 0:
+        task.add_done_callback(lambda _: os.close(fd))
+    return task
+
+
+async def stop_cache_warmer(task: asyncio.Task | None) -> None:
+    if task is None:
+        return
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Warm the OpenFoodFacts product cache for every catalog food.")
+    parser.add_argument("--countries", nargs="+", default=settings.cache_warmer_countries)
+    parser.add_argument("--rate", type=float, default=settings.cache_warmer_rate_per_s, help="Upstream requests/s")
+    parser.add_argument(
+        "--horizon",
+        type=float,
+        default=settings.cache_warmer_interval_s,
+        help="Also refresh entries that go stale within this many seconds",
+    )
+    parser.add_argument("--loop", action="store_true", help="Keep running, one pass every --horizon seconds")
+    args = parser.parse_args(argv)
+
+    async def run() -> dict[str, int]:
+        try:
+            if args.loop:
+                await run_warmer(args.countries, args.horizon, args.rate)
+            return await warm_product_cache(args.countries, args.rate, horizon_s=args.horizon)
+        finally:
+            await close_client()
+
+    stats = asyncio.run(run())
+    print(f"due {stats['due']}  warmed {stats['warmed']}  failed {stats['failed']}  skipped {stats['skipped']}")
+    return 1 if stats["failed"] or stats["skipped"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.plan_cache import clear_caches
+
+CATALOG_PATH = Path(__file__).resolve().parent.parent / "data" / "food_catalog.json"
+
+LEAN_PROTEIN_MAX_FAT_G = 6
+LOWER_PROTEIN_CARB_MAX_PROTEIN_G = 8
+
+# Column order of FoodCatalog.nutrients.
+NUTRIENTS = ("kcal", "protein_g", "carbs_g", "fat_g", "fiber_g")
+
+
+@dataclass(frozen=True)
+class FoodCatalog:
+    foods: list[dict]
+    by_name: dict[str, dict]
+    by_category: dict[str, list[dict]]
+    lean_proteins: list[dict]
+    lower_protein_carbs: list[dict]
+    package_sizes: dict[str, int]
+    # Dense foods x NUTRIENTS matrix per gram, row i belonging to foods[i].
+    nutrients: np.ndarray
+    rows: dict[str, int]
+    mtime_ns: int = 0
+
+    def row(self, food: dict) -> int:
+        return self.rows[food["name"]]
+
+    def find(self, name: str) -> dict | None:
+        return self.by_name.get(name.lower())
+
+    def category(self, name: str) -> list[dict]:
+        return self.by_category.get(name, [])
+
+
+def compile_nutrients(foods: list[dict]) -> np.ndarray:
+    matrix = np.array([[float(f[n]) for n in NUTRIENTS] for f in foods], dtype=np.float64).reshape(-1, len(NUTRIENTS))
+    matrix /= 100.0
+    matrix.setflags(write=False)
+    return matrix
+
+
+def compiled_path(source: Path, mtime_ns: int, directory: Path) -> Path:
+    # Keyed by the source mtime so an edited catalog never picks up a stale matrix.
+    return directory / f"{source.stem}-{mtime_ns}.npy"
+
+
+def write_compiled_catalog(directory: Path, source: Path = CATALOG_PATH) -> Path:
+    # Run once before forking workers: each worker maps the same file read-only instead of computing its
+    # own nutrient matrix. Only the matrix is shared; foods, name and category indexes are still built
+    # in every worker.
+    catalog = load_catalog(source)
+    directory.mkdir(parents=True, exist_ok=True)
+    target = compiled_path(source, catalog.mtime_ns, directory)
+    tmp = target.with_suffix(".tmp.npy")
+    np.save(tmp, np.ascontiguousarray(catalog.nutrients))
+    os.replace(tmp, target)
+    return target
+
+
+def _mapped_nutrients(source: Path, mtime_ns: int, rows: int) -> np.ndarray | None:
+    if not settings.catalog_compiled_dir:
+        return None
+    path = compiled_path(source, mtime_ns, Path(settings.catalog_compiled_dir))
+    try:
+        matrix = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    return matrix if matrix.shape == (rows, len(NUTRIENTS)) else None
+
+
+def build_catalog(foods: list[dict], mtime_ns: int = 0, nutrients: np.ndarray | None = None) -> FoodCatalog:
+    by_category: dict[str, list[dict]] = defaultdict(list)
+    by_name: dict[str, dict] = {}
+    rows: dict[str, int] = {}
+    for i, item in enumerate(foods):
+        rows.setdefault(item["name"], i)
+        by_category[item["category"]].append(item)
+        # First entry wins, matching the previous linear scan semantics.
+        by_name.setdefault(item["name"].lower(), item)
+
+    protein_foods = by_category.get("protein", [])
+    lean_proteins = [p for p in protein_foods if p["fat_g"] <= LEAN_PROTEIN_MAX_FAT_G] or protein_foods
+    carb_foods = by_category.get("carb", [])
+    lower_protein_carbs = [c for c in carb_foods if c["protein_g"] <= LOWER_PROTEIN_CARB_MAX_PROTEIN_G] or carb_foods
+
+    return FoodCatalog(
+        foods=foods,
+        by_name=by_name,
+        by_category=dict(by_category),
+        lean_proteins=lean_proteins,
+        lower_protein_carbs=lower_protein_carbs,
+        package_sizes={f["name"]: int(f.get("package_g", 500)) for f in foods},
+        nutrients=nutrients if nutrients is not None else compile_nutrients(foods),
+        rows=rows,
+        mtime_ns=mtime_ns,
+    )
+
+
+def load_catalog(path: Path = CATALOG_PATH) -> FoodCatalog:
+    mtime_ns = path.stat().st_mtime_ns
+    with path.open("r", encoding="utf-8") as f:
+        foods = json.load(f)
+    return build_catalog(foods, mtime_ns=mtime_ns, nutrients=_mapped_nutrients(path, mtime_ns, len(foods)))
+
+
+_lock = threading.Lock()
+_catalog: FoodCatalog | None = None
+_catalog_path: Path = CATALOG_PATH
+
+
+def get_catalog() -> FoodCatalog:
+    global _catalog
+    current = _catalog
+    try:
+        mtime_ns = _catalog_path.stat().st_mtime_ns
+    except OSError:
+        # Keep serving the last good catalog if the file is briefly missing mid-deploy.
+        if current is not None:
+            return current
+        raise
+
+    if current is not None and current.mtime_ns == mtime_ns:
+        return current
+
+    with _lock:
+        if _catalog is None or _catalog.mtime_ns != mtime_ns:
+            try:
+                loaded = load_catalog(_catalog_path)
+            except (OSError, ValueError):
+                # A half-written file should not take the planner down; retry on the next call.
+                if _catalog is None:
+                    raise
+            else:
+                if _catalog is not None:
+                    # Memoized meal plans were built from the previous foods.
+                    clear_caches()
+                _catalog = loaded
+        return _catalog
+
+
+def set_catalog_path(path: Path) -> None:
+    global _catalog, _catalog_path
+    with _lock:
+        _catalog_path = path
+        _catalog = None
+        clear_caches()
@@ -0,0 +1,167 @@
+from typing import Any
+
+from app.domain.recomp_models import GenerateMealsResponse, MacroTargets
+
+COMPACT_VERSION = 1
+MACRO_FIELDS = ("calories", "protein_g", "carbs_g", "fat_g", "fiber_g")
+
+
+def _macros(targets: MacroTargets) -> list[int]:
+    return [getattr(targets, field) for field in MACRO_FIELDS]
+
+
+def _delta(values: list[int]) -> list[int]:
+    return [value - previous for previous, value in zip([0, *values], values)]
+
+
+def _undelta(deltas: list[int]) -> list[int]:
+    values, total = [], 0
+    for delta in deltas:
+        total += delta
+        values.append(total)
+    return values
+
+
+def _series(points: list[Any], key: str) -> dict[str, list[int]]:
+    # Weights are rounded to 10 g upstream, so integer grams are exact and the deltas stay small.
+    return {
+        key: _delta([getattr(p, key) for p in points]),
+        "weight_g": _delta([round(p.expected_weight_kg * 1000) for p in points]),
+    }
+
+
+def _expand_series(series: dict[str, list[int]], key: str) -> list[dict[str, Any]]:
+    return [
+        {key: k, "expected_weight_kg": grams / 1000}
+        for k, grams in zip(_undelta(series[key]), _undelta(series["weight_g"]))
+    ]
+
+
+def compact_generate_meals(response: GenerateMealsResponse) -> dict[str, Any]:
+    # Each ingredient/product combination is stored once; meals and grocery rows reference it by index
+    # and carry only their grams. Layout is documented in docs/API_CONTRACT.md.
+    products: list[dict[str, Any]] = []
+    product_ids: dict[str, int] = {}
+    foods: list[list[Any]] = []
+    food_ids: dict[tuple, int] = {}
+
+    def product_id(product) -> int | None:
+        if product is None:
+            return None
+        key = product.model_dump_json()
+        if key not in product_ids:
+            product_ids[key] = len(products)
+            products.append(product.model_dump(mode="json"))
+        return product_ids[key]
+
+    def food_id(name: str, brand_hint: str | None, product, pending: bool) -> int:
+        key = (name, brand_hint, product_id(product), pending)
+        if key not in food_ids:
+            food_ids[key] = len(foods)
+            foods.append([name, brand_hint, key[2], int(pending)])
+        return food_ids[key]
+
+    days = []
+    for day in response.meal_plan.days:
+        meals = []
+        for meal in day.meals:
+            items: list[int] = []
+            for ing in meal.ingredients:
+                items += [food_id(ing.ingredient, ing.brand_hint, ing.retail_product, ing.retail_pending), ing.grams]
+            meals.append([meal.name, items, _macros(meal)])
+        days.append([day.day, day.day_type, _macros(day.target_macros), _macros(day.totals), meals])
+
+    # Grocery items have no brand hint: reuse any food with the same name and product.
+    by_name = {(name, pid, pending): i for i, (name, _, pid, pending) in enumerate(foods)}
+    grocery = []
+    for item in response.grocery_list:
+        key = (item.ingredient, product_id(item.retail_product), int(item.retail_pending))
+        fid = by_name.get(key)
+        if fid is None:
+            fid = by_name[key] = food_id(item.ingredient, None, item.retail_product, item.retail_pending)
+        grocery.append([fid, item.total_needed_g, item.package_size_g, item.packages_to_buy, item.leftover_g])
+
+    projection = response.projection
+    return {
+        "v": COMPACT_VERSION,
+        "body_composition": response.body_composition.model_dump(mode="json"),
+        "calories": response.calories.model_dump(mode="json"),
+        "macros": response.macros.model_dump(mode="json"),
+        "projection": {
+            "weeks_to_goal": projection.weeks_to_goal,
+            "weekly_loss_kg": projection.weekly_loss_kg,
+            "weekly_weight_targets": _series(projection.weekly_weight_targets, "week"),
+            "monthly_milestones": _series(projection.monthly_milestones, "month"),
+        },
+        "products": products,
+        "foods": foods,
+        "days": days,
+        "grocery": grocery,
+        "enrichment_id": response.enrichment_id,
+        "plan_key": response.plan_key,
+    }
+
+
+def expand_generate_meals(compact: dict[str, Any]) -> GenerateMealsResponse:
+    # Reference decoder: the inverse of compact_generate_meals, for clients and tests.
+    products = compact["products"]
+
+    def food(fid: int) -> dict[str, Any]:
+        name, brand_hint, pid, pending = compact["foods"][fid]
+        product = products[pid] if pid is not None else None
+        return {"ingredient": name, "brand_hint": brand_hint, "retail_product": product, "retail_pending": bool(pending)}
+
+    def macros(values: list[int]) -> dict[str, int]:
+        return dict(zip(MACRO_FIELDS, values))
+
+    days = []
+    for name, day_type, target, totals, meals in compact["days"]:
+        days.append(
+            {
+                "day": name,
+                "day_type": day_type,
+                "target_macros": macros(target),
+                "totals": macros(totals),
+                "meals": [
+                    {
+                        "name": meal_name,
+                        "ingredients": [{**food(fid), "grams": grams} for fid, grams in zip(items[::2], items[1::2])],
+                        **macros(values),
+                    }
+                    for meal_name, items, values in meals
+                ],
+            }
+        )
+
+    grocery = []
+    for fid, needed, package, packages, leftover in compact["grocery"]:
+        item = food(fid)
+        del item["brand_hint"]
+        grocery.append(
+            {
+                **item,
+                "total_needed_g": needed,
+                "package_size_g": package,
+                "packages_to_buy": packages,
+                "leftover_g": leftover,
+            }
+        )
+
+    projection = compact["projection"]
+    return GenerateMealsResponse.model_validate(
+        {
+            "body_composition": compact["body_composition"],
+            "calories": compact["calories"],
+            "macros": compact["macros"],
+            "projection": {
+                "weeks_to_goal": projection["weeks_to_goal"],
+                "weekly_loss_kg": projection["weekly_loss_kg"],
+                "weekly_weight_targets": _expand_series(projection["weekly_weight_targets"], "week"),
+                "monthly_milestones": _expand_series(projection["monthly_milestones"], "month"),
+            },
+            "meal_plan": {"days": days},
+            "grocery_list": grocery,
+            "enrichment_id": compact.get("enrichment_id"),
+            "plan_key": compact.get("plan_key"),
+        }
+    )
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable
+
+from app.core.config import settings
+from app.domain.recomp_models import RetailProduct
+
+
+class EnrichmentJob:
+    # Retail lookups that missed a response deadline. They keep running (and warming the product
+    # cache) after the response is sent; the follow-up endpoint picks up whatever has resolved.
+    def __init__(
+        self,
+        products: dict[str, RetailProduct | None],
+        pending: dict[str, asyncio.Future],
+        resolve: Callable[[asyncio.Future], RetailProduct | None],
+    ) -> None:
+        self.products = dict(products)
+        self.pending = dict(pending)
+        self._resolve = resolve
+
+    @property
+    def complete(self) -> bool:
+        return not self.pending
+
+    def poll(self) -> None:
+        for name, future in list(self.pending.items()):
+            if future.done():
+                self.products[name] = self._resolve(future)
+                del self.pending[name]
+
+    async def wait(self, timeout_s: float) -> None:
+        if self.pending and timeout_s > 0:
+            await asyncio.wait(set(self.pending.values()), timeout=timeout_s)
+        self.poll()
+
+
+_lock = threading.Lock()
+_jobs: OrderedDict[str, tuple[float, EnrichmentJob]] = OrderedDict()
+
+
+def _evict(now: float) -> None:
+    ttl_s = settings.enrichment_registry_ttl_s
+    while _jobs:
+        oldest = next(iter(_jobs.values()))
+        if now - oldest[0] < ttl_s and len(_jobs) <= settings.enrichment_registry_max_entries:
+            break
+        _jobs.popitem(last=False)
+
+
+def register_job(job: EnrichmentJob) -> str:
+    job_id = uuid.uuid4().hex
+    now = time.monotonic()
+    with _lock:
+        _jobs[job_id] = (now, job)
+        _evict(now)
+    return job_id
+
+
+def get_job(job_id: str) -> EnrichmentJob | None:
+    now = time.monotonic()
+    with _lock:
+        _evict(now)
+        found = _jobs.get(job_id)
+    return found[1] if found is not None else None
+
+
+def clear_jobs() -> None:
+    with _lock:
+        _jobs.clear()
+
@@ -1,20 +1,12 @@
-import json
 import math
 from collections import defaultdict
-from pathlib import Path
 
 from app.domain.recomp_models import GroceryItem, WeeklyMealPlan
-
-
-def _package_sizes() -> dict[str, int]:
-    path = Path(__file__).resolve().parent.parent / "data" / "food_catalog.json"
-    with path.open("r", encoding="utf-8") as f:
-        foods = json.load(f)
-    return {f["name"]: int(f.get("package_g", 500)) for f in foods}
+from app.services.catalog import get_catalog
 
 
 def build_grocery_list(weekly_plan: WeeklyMealPlan) -> list[GroceryItem]:
-    package_sizes = _package_sizes()
+    package_sizes = get_catalog().package_sizes
     totals: dict[str, int] = defaultdict(int)
 
     for day in weekly_plan.days:
@@ -1,6 +1,6 @@
-import json
 from collections import defaultdict
-from pathlib import Path
+
+import numpy as np
 
 from app.domain.recomp_models import (
     DayMealPlan,
@@ -11,43 +11,57 @@ from app.domain.recomp_models import (
     PlanInput,
     WeeklyMealPlan,
 )
+from app.services.catalog import FoodCatalog, get_catalog
+from app.services.plan_cache import memoize_plan
+from app.services.portion_solver import solve_portions
 
 DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
 
 
-def _load_catalog() -> list[dict]:
-    path = Path(__file__).resolve().parent.parent / "data" / "food_catalog.json"
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+# Gram ranges the portion solver may move each ingredient role within; extras keep their serving size.
+PORTION_BOUNDS = {
+    "protein": (90.0, 350.0),
+    "carb": (40.0, 400.0),
+    "micro": (80.0, 250.0),
+    "fat": (0.0, 60.0),
+}
+
+MEAL_NAMES = ["Breakfast", "Lunch", "Dinner", "Snack"]
 
+# How far a re-plan may move each existing portion, as a factor of its previous grams.
+RESCALE_RANGE = (0.5, 2.0)
 
-def _group_by_category(catalog: list[dict]) -> dict[str, list[dict]]:
-    grouped: dict[str, list[dict]] = defaultdict(list)
-    for item in catalog:
-        grouped[item["category"]].append(item)
-    return grouped
 
+class _DayDraft:
+    # Plain lists while the day's template is assembled; everything numeric afterwards runs on arrays
+    # against the catalog's compiled nutrient matrix, and models are only built once the week is done.
+    __slots__ = ("foods", "rows", "meals", "grams", "lower", "upper")
 
-def _find_food(catalog: list[dict], name: str) -> dict | None:
-    for item in catalog:
-        if item["name"].lower() == name.lower():
-            return item
-    return None
+    def __init__(self) -> None:
+        self.foods: list[dict] = []
+        self.rows: list[int] = []
+        self.meals: list[int] = []
+        self.grams: list[float] = []
+        self.lower: list[float] = []
+        self.upper: list[float] = []
 
+    def add(self, food: dict, row: int, meal: int, grams: float, role: str) -> None:
+        lower, upper = (grams, grams) if role == "extra" else PORTION_BOUNDS[role]
+        self.add_bounded(food, row, meal, grams, lower, upper)
 
-def _macros_for_grams(food: dict, grams: float) -> dict[str, float]:
-    factor = grams / 100.0
-    return {
-        "kcal": food["kcal"] * factor,
-        "protein_g": food["protein_g"] * factor,
-        "carbs_g": food["carbs_g"] * factor,
-        "fat_g": food["fat_g"] * factor,
-        "fiber_g": food["fiber_g"] * factor,
-    }
+    def add_bounded(self, food: dict, row: int, meal: int, grams: float, lower: float, upper: float) -> None:
+        self.foods.append(food)
+        self.rows.append(row)
+        self.meals.append(meal)
+        self.grams.append(grams)
+        self.lower.append(lower)
+        self.upper.append(upper)
 
 
-def _build_meal(
-    meal_name: str,
+def _add_meal_template(
+    draft: _DayDraft,
+    catalog: FoodCatalog,
+    meal: int,
     protein_food: dict,
     carb_food: dict,
     micro_food: dict,
@@ -56,115 +70,107 @@ def _build_meal(
     carbs_target: float,
     fat_target: float,
     extras: list[tuple[dict, float]] | None = None,
-) -> Meal:
+) -> None:
+    # Greedy template: protein first, then carbs and fat fill what is left. The solver refines it per day.
     protein_grams = max(90.0, (protein_target / max(protein_food["protein_g"], 1.0)) * 100)
     micro_grams = 120.0
-    protein_macro = _macros_for_grams(protein_food, protein_grams)
-    micro_macro = _macros_for_grams(micro_food, micro_grams)
+    protein_factor = protein_grams / 100.0
+    micro_factor = micro_grams / 100.0
 
-    remaining_carbs = max(0.0, carbs_target - protein_macro["carbs_g"] - micro_macro["carbs_g"])
-    remaining_fat = max(0.0, fat_target - protein_macro["fat_g"] - micro_macro["fat_g"])
+    remaining_carbs = max(
+        0.0, carbs_target - protein_food["carbs_g"] * protein_factor - micro_food["carbs_g"] * micro_factor
+    )
+    remaining_fat = max(0.0, fat_target - protein_food["fat_g"] * protein_factor - micro_food["fat_g"] * micro_factor)
 
     carb_grams = max(40.0, (remaining_carbs / max(carb_food["carbs_g"], 1.0)) * 100)
     fat_grams = max(0.0, (remaining_fat / max(fat_food["fat_g"], 1.0)) * 100)
 
-    allocations = [
-        (protein_food, protein_grams),
-        (carb_food, carb_grams),
-        (micro_food, micro_grams),
-        (fat_food, fat_grams),
-    ]
-    if extras:
-        allocations.extend(extras)
-
-    total = {"kcal": 0.0, "protein_g": 0.0, "carbs_g": 0.0, "fat_g": 0.0, "fiber_g": 0.0}
-    ingredients: list[IngredientAllocation] = []
-
-    for food, grams in allocations:
-        if grams < 1.0:
+    draft.add(protein_food, catalog.row(protein_food), meal, protein_grams, "protein")
+    draft.add(carb_food, catalog.row(carb_food), meal, carb_grams, "carb")
+    draft.add(micro_food, catalog.row(micro_food), meal, micro_grams, "micro")
+    draft.add(fat_food, catalog.row(fat_food), meal, fat_grams, "fat")
+    for food, grams in extras or []:
+        draft.add(food, catalog.row(food), meal, grams, "extra")
+
+
+def _solve_day(draft: _DayDraft, catalog: FoodCatalog, target: MacroTargets) -> tuple[np.ndarray, np.ndarray]:
+    nutrients = catalog.nutrients[draft.rows]
+    solved = solve_portions(
+        nutrients.T,
+        np.array(draft.grams),
+        np.array(draft.lower),
+        np.array(draft.upper),
+        target,
+    )
+    # Totals come from the rounded grams the user will actually weigh out.
+    grams = np.rint(solved)
+    grams[grams < 1] = 0
+    meal_totals = np.zeros((len(MEAL_NAMES), nutrients.shape[1]))
+    np.add.at(meal_totals, np.array(draft.meals), grams[:, None] * nutrients)
+    return grams.astype(np.int64), np.rint(meal_totals).astype(np.int64)
+
+
+def _build_day(
+    day: str,
+    day_type: str,
+    target: MacroTargets,
+    draft: _DayDraft,
+    grams: np.ndarray,
+    meal_totals: np.ndarray,
+) -> DayMealPlan:
+    ingredients: list[list[IngredientAllocation]] = [[] for _ in MEAL_NAMES]
+    for food, meal, g in zip(draft.foods, draft.meals, grams.tolist()):
+        if g < 1:
             continue
-        m = _macros_for_grams(food, grams)
-        for k in total:
-            total[k] += m[k]
-        ingredients.append(
-            IngredientAllocation(
-                ingredient=food["name"],
-                grams=int(round(grams)),
-                brand_hint=(food.get("brands") or [None])[0],
-            )
+        ingredients[meal].append(
+            IngredientAllocation(ingredient=food["name"], grams=g, brand_hint=(food.get("brands") or [None])[0])
         )
 
-    return Meal(
-        name=meal_name,
-        ingredients=ingredients,
-        calories=int(round(total["kcal"])),
-        protein_g=int(round(total["protein_g"])),
-        carbs_g=int(round(total["carbs_g"])),
-        fat_g=int(round(total["fat_g"])),
-        fiber_g=int(round(total["fiber_g"])),
-    )
-
-
-def _sum_meals(calories_target: int, meals: list[Meal], fiber_target: int) -> MacroTargets:
-    return MacroTargets(
-        calories=sum(m.calories for m in meals),
-        protein_g=sum(m.protein_g for m in meals),
-        carbs_g=sum(m.carbs_g for m in meals),
-        fat_g=sum(m.fat_g for m in meals),
-        fiber_g=max(fiber_target, sum(m.fiber_g for m in meals)),
-    )
-
-
-def _rebalance_to_target(meals: list[Meal], target: MacroTargets) -> list[Meal]:
-    # Tune only the snack meal for precise daily matching, keeping structure of core meals stable.
-    snack = next((m for m in meals if m.name == "Snack"), None)
-    if not snack:
-        return meals
-
-    total = _sum_meals(target.calories, meals, target.fiber_g)
-
-    delta_protein = target.protein_g - total.protein_g
-    delta_carbs = target.carbs_g - total.carbs_g
-    delta_fat = target.fat_g - total.fat_g
-
-    snack_protein = max(0, snack.protein_g + delta_protein)
-    snack_carbs = max(0, snack.carbs_g + delta_carbs)
-    snack_fat = max(0, snack.fat_g + delta_fat)
-    snack_calories = max(0, snack.calories + (target.calories - total.calories))
-
-    snack = snack.model_copy(
-        update={
-            "protein_g": int(round(snack_protein)),
-            "carbs_g": int(round(snack_carbs)),
-            "fat_g": int(round(snack_fat)),
-            "calories": int(round(snack_calories)),
-        }
+    totals = meal_totals.tolist()
+    meals = [
+        Meal(
+            name=name,
+            ingredients=ingredients[i],
+            calories=totals[i][0],
+            protein_g=totals[i][1],
+            carbs_g=totals[i][2],
+            fat_g=totals[i][3],
+            fiber_g=totals[i][4],
+        )
+        for i, name in enumerate(MEAL_NAMES)
+    ]
+    day_sum = meal_totals.sum(axis=0).tolist()
+    return DayMealPlan(
+        day=day,
+        day_type=day_type,
+        target_macros=target,
+        meals=meals,
+        totals=MacroTargets(
+            calories=day_sum[0],
+            protein_g=day_sum[1],
+            carbs_g=day_sum[2],
+            fat_g=day_sum[3],
+            fiber_g=max(target.fiber_g, day_sum[4]),
+        ),
     )
 
-    return [snack if m.name == "Snack" else m for m in meals]
-
 
+@memoize_plan
 def generate_weekly_meal_plan(plan: PlanInput, macro_plan: MacroPlan) -> WeeklyMealPlan:
-    catalog = _load_catalog()
-    grouped = _group_by_category(catalog)
-
-    protein_foods = grouped["protein"]
-    lean_protein_foods = [p for p in protein_foods if p["fat_g"] <= 6]
-    if not lean_protein_foods:
-        lean_protein_foods = protein_foods
-    carb_foods = grouped["carb"]
-    lower_protein_carbs = [c for c in carb_foods if c["protein_g"] <= 8]
-    if not lower_protein_carbs:
-        lower_protein_carbs = carb_foods
-    micro_foods = grouped["micronutrient"]
-    beverages = grouped.get("beverage", [])
-    fat_foods = grouped["fat"]
-    oats_food = _find_food(catalog, "Oats")
-    coffee_food = _find_food(catalog, "Black Coffee")
-    eggs_food = _find_food(catalog, "Eggs")
+    catalog = get_catalog()
+
+    protein_foods = catalog.category("protein")
+    lean_protein_foods = catalog.lean_proteins
+    lower_protein_carbs = catalog.lower_protein_carbs
+    micro_foods = catalog.category("micronutrient")
+    beverages = catalog.category("beverage")
+    fat_foods = catalog.category("fat")
+    oats_food = catalog.find("Oats")
+    coffee_food = catalog.find("Black Coffee")
+    eggs_food = catalog.find("Eggs")
 
     training_days = set(DAYS[: plan.training_days_per_week])
-    weekly_days: list[DayMealPlan] = []
+    solved_days: list[tuple[str, str, MacroTargets, _DayDraft, np.ndarray, np.ndarray]] = []
 
     protein_usage: dict[str, int] = defaultdict(int)
 
@@ -177,10 +183,9 @@ def generate_weekly_meal_plan(plan: PlanInput, macro_plan: MacroPlan) -> WeeklyM
         carbs_split = [0.22, 0.24, 0.22]
         fat_split = [0.10, 0.10, 0.08]
 
-        day_meals: list[Meal] = []
-        meal_names = ["Breakfast", "Lunch", "Dinner"]
+        draft = _DayDraft()
 
-        for meal_idx, meal_name in enumerate(meal_names):
+        for meal_idx in range(3):
             extra_allocations: list[tuple[dict, float]] = []
             if meal_idx == 0:
                 # Breakfast preference: eggs + oats + black coffee, avoiding meat proteins in breakfast.
@@ -221,8 +226,10 @@ def generate_weekly_meal_plan(plan: PlanInput, macro_plan: MacroPlan) -> WeeklyM
 
             fat_food = fat_foods[(idx + meal_idx) % len(fat_foods)]
 
-            meal = _build_meal(
-                meal_name=meal_name,
+            _add_meal_template(
+                draft,
+                catalog,
+                meal_idx,
                 protein_food=protein_food,
                 carb_food=carb_food,
                 micro_food=micro_food,
@@ -232,16 +239,17 @@ def generate_weekly_meal_plan(plan: PlanInput, macro_plan: MacroPlan) -> WeeklyM
                 fat_target=float(day_target.fat_g * (0.06 if meal_idx == 0 else fat_split[meal_idx])),
                 extras=extra_allocations,
             )
-            day_meals.append(meal)
 
-        core = _sum_meals(day_target.calories, day_meals, day_target.fiber_g)
-        snack_protein_target = max(25.0, float(day_target.protein_g - core.protein_g))
-        snack_carb_target = max(0.0, float(day_target.carbs_g - core.carbs_g))
-        snack_fat_target = max(0.0, float(day_target.fat_g - core.fat_g))
+        core = (np.array(draft.grams) @ catalog.nutrients[draft.rows]).tolist()
+        snack_protein_target = max(25.0, float(day_target.protein_g - core[1]))
+        snack_carb_target = max(0.0, float(day_target.carbs_g - core[2]))
+        snack_fat_target = max(0.0, float(day_target.fat_g - core[3]))
 
         snack_protein_food = sorted(lean_protein_foods, key=lambda f: f["fat_g"])[0]
-        snack = _build_meal(
-            meal_name="Snack",
+        _add_meal_template(
+            draft,
+            catalog,
+            3,
             protein_food=snack_protein_food,
             carb_food=lower_protein_carbs[(idx + 3) % len(lower_protein_carbs)],
             micro_food=micro_foods[(idx + 3) % len(micro_foods)],
@@ -250,19 +258,32 @@ def generate_weekly_meal_plan(plan: PlanInput, macro_plan: MacroPlan) -> WeeklyM
             carbs_target=snack_carb_target,
             fat_target=snack_fat_target,
         )
-        day_meals.append(snack)
-
-        day_meals = _rebalance_to_target(day_meals, day_target)
-        totals = _sum_meals(day_target.calories, day_meals, day_target.fiber_g)
-
-        weekly_days.append(
-            DayMealPlan(
-                day=day,
-                day_type=day_type,
-                target_macros=day_target,
-                meals=day_meals,
-                totals=totals,
-            )
-        )
 
-    return WeeklyMealPlan(days=weekly_days)
+        # Solve all of the day's grams together against the targets instead of patching the snack.
+        grams, meal_totals = _solve_day(draft, catalog, day_target)
+        solved_days.append((day, day_type, day_target, draft, grams, meal_totals))
+
+    return WeeklyMealPlan(days=[_build_day(*solved) for solved in solved_days])
+
+
+def rescale_weekly_meal_plan(previous: WeeklyMealPlan, macro_plan: MacroPlan) -> WeeklyMealPlan | None:
+    # Check-ins move the targets by about 100 kcal. Keep every food and meal, re-solve only the grams from
+    # the previous portions, so retail matches and grocery items carry over. Returns None when a food has
+    # left the catalog and the week has to be generated from scratch.
+    catalog = get_catalog()
+    low, high = RESCALE_RANGE
+    days: list[DayMealPlan] = []
+    for day in previous.days:
+        target = macro_plan.training_day if day.day_type == "training" else macro_plan.rest_day
+        draft = _DayDraft()
+        for meal_idx, meal in enumerate(day.meals[: len(MEAL_NAMES)]):
+            for ing in meal.ingredients:
+                food = catalog.find(ing.ingredient)
+                if food is None:
+                    return None
+                draft.add_bounded(food, catalog.row(food), meal_idx, float(ing.grams), ing.grams * low, ing.grams * high)
+        if not draft.rows:
+            return None
+        grams, meal_totals = _solve_day(draft, catalog, target)
+        days.append(_build_day(day.day, day.day_type, target, draft, grams, meal_totals))
+    return WeeklyMealPlan(days=days)
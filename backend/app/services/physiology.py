@@ -9,8 +9,10 @@ from app.domain.recomp_models import (
     MacroTargets,
     PlanInput,
 )
+from app.services.plan_cache import memoize_plan
 
 
+@memoize_plan
 def body_composition(plan: PlanInput) -> BodyComposition:
     bf = plan.body_fat_percent / 100
     target_bf = plan.target_body_fat_percent / 100
@@ -68,6 +70,7 @@ def weekly_loss_kg_for_plan(plan: PlanInput, fat_loss_required_kg: float | None
     return plan.weight_kg * (chosen_rate_percent / 100)
 
 
+@memoize_plan
 def calories_plan(plan: PlanInput) -> CaloriesPlan:
     bmr = bmr_mifflin(plan)
     tdee = tdee_from_activity(bmr, plan.activity_level)
@@ -123,6 +126,7 @@ def _macro_targets_for_day(calories: int, weight_kg: float, lbm_kg: float, goal_
     )
 
 
+@memoize_plan
 def macro_plan(plan: PlanInput, body_comp: BodyComposition, calories: CaloriesPlan) -> MacroPlan:
     base = _macro_targets_for_day(calories.target, plan.weight_kg, body_comp.lean_body_mass_kg, plan.goal_mode)
 
@@ -0,0 +1,242 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.domain.recomp_models import (
+    ACTIVITY_MULTIPLIERS,
+    BodyComposition,
+    CalculatePlanResponse,
+    CaloriesPlan,
+    Gender,
+    GoalMode,
+    MacroPlan,
+    MacroTargets,
+    MonthlyMilestone,
+    PlanInput,
+    Projection,
+    WeeklyWeightTarget,
+)
+
+MAX_PROJECTION_WEEKS = 104
+FIBER_G = 30
+
+
+@dataclass(frozen=True)
+class PlanColumns:
+    height_cm: np.ndarray
+    weight_kg: np.ndarray
+    age: np.ndarray
+    is_male: np.ndarray
+    body_fat_percent: np.ndarray
+    target_body_fat_percent: np.ndarray
+    activity_multiplier: np.ndarray
+    training_days_per_week: np.ndarray
+    timeline_weeks: np.ndarray
+    is_fat_loss: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.weight_kg)
+
+
+@dataclass(frozen=True)
+class BatchPlanResult:
+    lean_body_mass_kg: np.ndarray
+    fat_mass_kg: np.ndarray
+    target_weight_kg: np.ndarray
+    fat_loss_required_kg: np.ndarray
+    bmr: np.ndarray
+    tdee: np.ndarray
+    daily_deficit: np.ndarray
+    target: np.ndarray
+    training_day: np.ndarray
+    rest_day: np.ndarray
+    protein_g: np.ndarray
+    fat_g: np.ndarray
+    baseline_carbs_g: np.ndarray
+    training_carbs_g: np.ndarray
+    rest_carbs_g: np.ndarray
+    weeks_to_goal: np.ndarray
+    weekly_loss_kg: np.ndarray
+    projection_weeks: np.ndarray
+    weekly_weight_targets: np.ndarray
+
+
+def columns_from_plans(plans: list[PlanInput]) -> PlanColumns:
+    return PlanColumns(
+        height_cm=np.array([p.height_cm for p in plans], dtype=np.float64),
+        weight_kg=np.array([p.weight_kg for p in plans], dtype=np.float64),
+        age=np.array([p.age for p in plans], dtype=np.int64),
+        is_male=np.array([p.gender == Gender.male for p in plans], dtype=bool),
+        body_fat_percent=np.array([p.body_fat_percent for p in plans], dtype=np.float64),
+        target_body_fat_percent=np.array([p.target_body_fat_percent for p in plans], dtype=np.float64),
+        activity_multiplier=np.array([ACTIVITY_MULTIPLIERS[p.activity_level] for p in plans], dtype=np.float64),
+        training_days_per_week=np.array([p.training_days_per_week for p in plans], dtype=np.int64),
+        timeline_weeks=np.array([p.timeline_weeks for p in plans], dtype=np.int64),
+        is_fat_loss=np.array([p.goal_mode == GoalMode.fat_loss for p in plans], dtype=bool),
+    )
+
+
+def _round(values: np.ndarray, ndigits: int) -> np.ndarray:
+    # np.round scales by 10**ndigits before rint, which can land on the wrong side of a tie that
+    # Python's correctly-rounded round() resolves. Only near-ties are redone in Python, so results
+    # match the scalar engine bit for bit.
+    rounded = np.round(values, ndigits)
+    scaled = values * (10.0**ndigits)
+    near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    if near_tie.any():
+        flat = rounded.reshape(-1)
+        for i in np.flatnonzero(near_tie.reshape(-1)):
+            flat[i] = round(float(values.reshape(-1)[i]), ndigits)
+    return rounded
+
+
+def _rint(values: np.ndarray) -> np.ndarray:
+    # Python's round() on floats is round-half-even, which is exactly np.rint.
+    return np.rint(values).astype(np.int64)
+
+
+def _carbs_for(calories: np.ndarray, protein_g: np.ndarray, fat_g: np.ndarray) -> np.ndarray:
+    return np.maximum(0, _rint((calories - (protein_g * 4) - (fat_g * 9)) / 4))
+
+
+def batch_plan(cols: PlanColumns) -> BatchPlanResult:
+    weight = cols.weight_kg
+
+    # body_composition
+    bf = cols.body_fat_percent / 100
+    target_bf = cols.target_body_fat_percent / 100
+    lbm = weight * (1 - bf)
+    fm = weight - lbm
+    target_weight = lbm / (1 - target_bf)
+    lbm_r = _round(lbm, 2)
+    target_weight_r = _round(target_weight, 2)
+    fat_loss_r = _round(np.maximum(0.0, weight - target_weight), 2)
+
+    # bmr_mifflin / tdee_from_activity
+    base = (10 * weight) + (6.25 * cols.height_cm) - (5 * cols.age)
+    bmr = _rint(np.where(cols.is_male, base + 5, base - 161))
+    tdee = _rint(bmr * cols.activity_multiplier)
+
+    # weekly_loss_kg_for_plan
+    bfp = cols.body_fat_percent
+    base_rate = np.where(bfp > 20, 1.0, np.where(bfp < 15, 0.5, 0.75))
+    min_rate = np.where(cols.is_fat_loss, 0.5, 0.25)
+    max_rate = np.where(bfp > 20, 1.0, base_rate)
+    required_rate = ((fat_loss_r / cols.timeline_weeks) / weight) * 100
+    chosen_rate = np.where(
+        (cols.timeline_weeks > 0) & (fat_loss_r > 0),
+        np.maximum(min_rate, np.minimum(required_rate, max_rate)),
+        base_rate,
+    )
+    weekly_loss = weight * (chosen_rate / 100)
+
+    # calories_plan
+    daily_deficit = _rint((weekly_loss * 7700) / 7)
+    target = np.maximum(tdee - daily_deficit, _rint(bmr * 1.2))
+    td = cols.training_days_per_week
+    split = (td >= 4) & (td < 7)
+    training_day = np.where(split, target + 200, target)
+    rest_days = np.where(split, 7 - td, 1)
+    rest_day = np.where(split, _rint((target * 7 - (training_day * td)) / rest_days), target)
+
+    # macro_plan
+    protein_g = _rint(lbm_r * np.where(cols.is_fat_loss, 2.2, 2.0))
+    fat_g = np.maximum(
+        np.ceil(weight * 0.6).astype(np.int64),
+        np.minimum(_rint(weight * 0.7), np.floor(weight * 0.8).astype(np.int64)),
+    )
+
+    # projection
+    has_goal = (fat_loss_r > 0) & (weekly_loss > 0)
+    safe_loss = np.where(has_goal, weekly_loss, 1.0)
+    weeks = fat_loss_r / safe_loss
+    projection_weeks = np.where(has_goal, np.minimum(np.ceil(weeks), MAX_PROJECTION_WEEKS), 0).astype(np.int64)
+    week_idx = np.arange(1, MAX_PROJECTION_WEEKS + 1)
+    expected = np.maximum(target_weight_r[:, None], weight[:, None] - (weekly_loss[:, None] * week_idx[None, :]))
+    expected = _round(expected, 2)
+    expected[week_idx[None, :] > projection_weeks[:, None]] = np.nan
+
+    return BatchPlanResult(
+        lean_body_mass_kg=lbm_r,
+        fat_mass_kg=_round(fm, 2),
+        target_weight_kg=target_weight_r,
+        fat_loss_required_kg=fat_loss_r,
+        bmr=bmr,
+        tdee=tdee,
+        daily_deficit=daily_deficit,
+        target=target,
+        training_day=training_day,
+        rest_day=rest_day,
+        protein_g=protein_g,
+        fat_g=fat_g,
+        baseline_carbs_g=_carbs_for(target, protein_g, fat_g),
+        training_carbs_g=_carbs_for(training_day, protein_g, fat_g),
+        rest_carbs_g=_carbs_for(rest_day, protein_g, fat_g),
+        weeks_to_goal=np.where(has_goal, _round(weeks, 1), 0.0),
+        weekly_loss_kg=np.where(has_goal, _round(weekly_loss, 3), 0.0),
+        projection_weeks=projection_weeks,
+        weekly_weight_targets=expected,
+    )
+
+
+def _projection_at(result: BatchPlanResult, weight_kg: float, i: int) -> Projection:
+    weeks = int(result.projection_weeks[i])
+    if weeks == 0:
+        return Projection(
+            weeks_to_goal=0,
+            weekly_loss_kg=0,
+            weekly_weight_targets=[WeeklyWeightTarget(week=0, expected_weight_kg=round(weight_kg, 2))],
+            monthly_milestones=[],
+        )
+    expected = result.weekly_weight_targets[i, :weeks].tolist()
+    return Projection(
+        weeks_to_goal=float(result.weeks_to_goal[i]),
+        weekly_loss_kg=float(result.weekly_loss_kg[i]),
+        weekly_weight_targets=[WeeklyWeightTarget(week=w + 1, expected_weight_kg=v) for w, v in enumerate(expected)],
+        monthly_milestones=[
+            MonthlyMilestone(month=m + 1, expected_weight_kg=expected[week - 1])
+            for m, week in enumerate(range(4, weeks + 1, 4))
+        ],
+    )
+
+
+def batch_responses(plans: list[PlanInput]) -> list[CalculatePlanResponse]:
+    if not plans:
+        return []
+    cols = columns_from_plans(plans)
+    r = batch_plan(cols)
+
+    out: list[CalculatePlanResponse] = []
+    for i, plan in enumerate(plans):
+        protein, fat = int(r.protein_g[i]), int(r.fat_g[i])
+
+        def day(calories: np.ndarray, carbs: np.ndarray) -> MacroTargets:
+            return MacroTargets(
+                calories=int(calories[i]), protein_g=protein, carbs_g=int(carbs[i]), fat_g=fat, fiber_g=FIBER_G
+            )
+
+        out.append(
+            CalculatePlanResponse(
+                body_composition=BodyComposition(
+                    lean_body_mass_kg=float(r.lean_body_mass_kg[i]),
+                    fat_mass_kg=float(r.fat_mass_kg[i]),
+                    target_weight_kg=float(r.target_weight_kg[i]),
+                    fat_loss_required_kg=float(r.fat_loss_required_kg[i]),
+                ),
+                calories=CaloriesPlan(
+                    bmr=int(r.bmr[i]),
+                    tdee=int(r.tdee[i]),
+                    daily_deficit=int(r.daily_deficit[i]),
+                    target=int(r.target[i]),
+                    training_day=int(r.training_day[i]),
+                    rest_day=int(r.rest_day[i]),
+                ),
+                macros=MacroPlan(
+                    baseline=day(r.target, r.baseline_carbs_g),
+                    training_day=day(r.training_day, r.training_carbs_g),
+                    rest_day=day(r.rest_day, r.rest_carbs_g),
+                ),
+                projection=_projection_at(r, plan.weight_kg, i),
+            )
+        )
+    return out
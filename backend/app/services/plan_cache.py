@@ -0,0 +1,136 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, TypeVar
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.domain.recomp_models import PlanInput
+
+T = TypeVar("T")
+
+# Retail preferences only affect enrichment, so plans that differ only there share physiology and meals.
+NON_PLAN_FIELDS = {"country_code", "preferred_retailers"}
+PLAN_FIELDS = set(PlanInput.model_fields) - NON_PLAN_FIELDS
+
+
+def plan_fingerprint(plan: PlanInput) -> str:
+    canonical = plan.model_dump_json(include=PLAN_FIELDS)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, PlanInput):
+        return plan_fingerprint(value)
+    if isinstance(value, BaseModel):
+        return hashlib.blake2b(value.model_dump_json().encode("utf-8"), digest_size=16).hexdigest()
+    return value
+
+
+class MemoCache:
+    def __init__(self, name: str, max_entries: int, ttl_s: float) -> None:
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: tuple) -> tuple[bool, Any]:
+        now = time.monotonic()
+        with self._lock:
+            found = self._entries.get(key)
+            if found is not None and now - found[0] < self.ttl_s:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, found[1]
+            self.misses += 1
+        return False, None
+
+    def put(self, key: tuple, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: tuple, compute: Callable[[], T]) -> T:
+        found, value = self.lookup(key)
+        if found:
+            return value
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+_caches: dict[str, MemoCache] = {}
+
+
+def memoize_plan(fn: Callable[..., T]) -> Callable[..., T]:
+    # Cached results are shared between callers, so they must be treated as read-only; the retail
+    # enricher copies models before attaching products instead of mutating them.
+    cache = _caches.setdefault(
+        fn.__name__,
+        MemoCache(fn.__name__, settings.plan_cache_max_entries, settings.plan_cache_ttl_s),
+    )
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        if not settings.plan_cache_enabled:
+            return fn(*args, **kwargs)
+        _check_catalog()
+        return cache.get_or_compute(_cache_key(args, kwargs), lambda: fn(*args, **kwargs))
+
+    wrapper.cache = cache  # type: ignore[attr-defined]
+    return wrapper
+
+
+def _check_catalog() -> None:
+    # get_catalog() clears every memo when the catalog file changed. Checking before a lookup means a
+    # hot reload is noticed here even when the computation itself runs in a process pool.
+    from app.services.catalog import get_catalog
+
+    get_catalog()
+
+
+def _cache_key(args: tuple, kwargs: dict[str, Any]) -> tuple:
+    return tuple(_canonical(a) for a in args) + tuple((k, _canonical(v)) for k, v in sorted(kwargs.items()))
+
+
+async def offload_memoized(fn: Callable[..., T], submit: Callable[..., Awaitable[T]], *args: Any) -> T:
+    # For memoized functions run elsewhere (e.g. executors.run_cpu): hits are served from this
+    # process's cache without a round trip, and results computed by the pool are stored here.
+    if not settings.plan_cache_enabled:
+        return await submit(fn, *args)
+    _check_catalog()
+    cache: MemoCache = fn.cache  # type: ignore[attr-defined]
+    key = _cache_key(args, {})
+    found, value = cache.lookup(key)
+    if found:
+        return value
+    value = await submit(fn, *args)
+    cache.put(key, value)
+    return value
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+def clear_caches() -> None:
+    for cache in _caches.values():
+        cache.clear()
@@ -0,0 +1,117 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from app.core.config import settings
+from app.domain.recomp_models import CaloriesPlan, GenerateMealsResponse, PlanInput
+
+# Plans live in a SQLite file shared by every server worker, so a plan_key works whichever worker answers
+# the /replan; without a path they are kept in this process's memory only.
+
+_lock = threading.Lock()
+_plans: OrderedDict[str, tuple[float, PlanInput, GenerateMealsResponse]] = OrderedDict()
+_db: sqlite3.Connection | None = None
+_db_path: str | None = None
+
+
+def plan_key(plan: PlanInput, calories: CaloriesPlan) -> str:
+    # Deterministic, so regenerating the same plan refreshes its entry instead of adding one. Calories are
+    # part of the key because check-ins move them away from what the plan alone would give.
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(plan.model_dump_json().encode("utf-8"))
+    digest.update(calories.model_dump_json().encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _connection() -> sqlite3.Connection | None:
+    # Called with _lock held. Reopened when the configured path changes (tests point it at tmp dirs).
+    global _db, _db_path
+    path = settings.plan_store_path
+    if not path:
+        return None
+    if _db is None or _db_path != path:
+        if _db is not None:
+            _db.close()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        _db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("PRAGMA synchronous=NORMAL")
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, plan TEXT NOT NULL, response TEXT NOT NULL)"
+        )
+        _db.execute("CREATE INDEX IF NOT EXISTS plans_stored_at ON plans (stored_at)")
+        _db_path = path
+    return _db
+
+
+def _evict(now: float) -> None:
+    ttl_s = settings.plan_store_ttl_s
+    while _plans:
+        oldest = next(iter(_plans.values()))
+        if now - oldest[0] < ttl_s and len(_plans) <= settings.plan_store_max_entries:
+            break
+        _plans.popitem(last=False)
+
+
+def _evict_stored(db: sqlite3.Connection, now: float) -> None:
+    # Expired rows are a range at the start of the stored_at index. The count reads that small index, not
+    # the plan payloads, and only rows above the cap are then deleted, oldest first along the same index.
+    db.execute("DELETE FROM plans WHERE stored_at < ?", (now - settings.plan_store_ttl_s,))
+    over = db.execute("SELECT COUNT(*) FROM plans").fetchone()[0] - max(1, settings.plan_store_max_entries)
+    if over > 0:
+        db.execute("DELETE FROM plans WHERE key IN (SELECT key FROM plans ORDER BY stored_at LIMIT ?)", (over,))
+
+
+def remember_plan(key: str, plan: PlanInput, response: GenerateMealsResponse) -> None:
+    # Wall-clock time: entries written by one worker are aged by the others.
+    now = time.time()
+    with _lock:
+        db = _connection()
+        if db is None:
+            _plans[key] = (now, plan, response)
+            _plans.move_to_end(key)
+            _evict(now)
+            return
+        db.execute(
+            "INSERT OR REPLACE INTO plans (key, stored_at, plan, response) VALUES (?, ?, ?, ?)",
+            (key, now, plan.model_dump_json(), response.model_dump_json()),
+        )
+        _evict_stored(db, now)
+
+
+def recall_plan(key: str) -> tuple[PlanInput, GenerateMealsResponse] | None:
+    now = time.time()
+    with _lock:
+        db = _connection()
+        if db is None:
+            _evict(now)
+            found = _plans.get(key)
+            return (found[1], found[2]) if found is not None else None
+        row = db.execute(
+            "SELECT plan, response FROM plans WHERE key = ? AND stored_at >= ?",
+            (key, now - settings.plan_store_ttl_s),
+        ).fetchone()
+    if row is None:
+        return None
+    return PlanInput.model_validate_json(row[0]), GenerateMealsResponse.model_validate_json(row[1])
+
+
+def clear_plans() -> None:
+    with _lock:
+        _plans.clear()
+        db = _connection()
+        if db is not None:
+            db.execute("DELETE FROM plans")
+
+
+def close_plan_store() -> None:
+    global _db, _db_path
+    with _lock:
+        if _db is not None:
+            _db.close()
+        _db = None
+        _db_path = None
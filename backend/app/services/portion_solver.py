@@ -0,0 +1,99 @@
+import numpy as np
+
+from app.domain.recomp_models import MacroTargets
+from app.services.catalog import NUTRIENTS
+
+FIBER_ROW = NUTRIENTS.index("fiber_g")
+
+# Relative importance of hitting each daily target; protein matters most for recomposition.
+TARGET_WEIGHTS = np.array([1.0, 2.0, 1.0, 1.0, 0.5])
+# Pull towards the template grams so the solver fixes the macros without reshaping every meal.
+STAY_CLOSE_WEIGHT = 1e-3
+
+
+def target_vector(target: MacroTargets) -> np.ndarray:
+    return np.array(
+        [target.calories, target.protein_g, target.carbs_g, target.fat_g, target.fiber_g], dtype=np.float64
+    )
+
+
+def solve_box_qp(
+    hessian: np.ndarray,
+    linear: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    start: np.ndarray,
+    max_iter: int = 100,
+) -> np.ndarray:
+    # Primal active-set method for min 1/2 x'Hx - g'x subject to lower <= x <= upper.
+    # H is positive definite here (regularised), so every free subproblem has a unique solution.
+    # Variables that start on a bound start in the active set, which is where the template usually
+    # leaves them, so most days converge in one or two linear solves.
+    x = np.clip(start, lower, upper)
+    fixed = lower >= upper
+    at_lower = fixed | (x <= lower)
+    at_upper = ~at_lower & (x >= upper)
+    tol = 1e-9 * max(1.0, float(np.abs(linear).max()))
+
+    for _ in range(max_iter):
+        free_idx = np.flatnonzero(~(at_lower | at_upper))
+        if free_idx.size:
+            bound_idx = np.flatnonzero(at_lower | at_upper)
+            rhs = linear.take(free_idx) - hessian.take(free_idx, 0).take(bound_idx, 1) @ x.take(bound_idx)
+            candidate = np.linalg.solve(hessian.take(free_idx, 0).take(free_idx, 1), rhs)
+            x_free = x.take(free_idx)
+            step = candidate - x_free
+            # Largest feasible fraction of the step before a free variable hits a bound.
+            room = np.where(step < 0, lower.take(free_idx) - x_free, upper.take(free_idx) - x_free)
+            moving = step != 0
+            ratios = np.full(free_idx.size, np.inf)
+            ratios[moving] = room[moving] / step[moving]
+            alpha = min(1.0, float(ratios.min()))
+            x[free_idx] = x_free + alpha * step
+            if alpha < 1.0:
+                for j in np.flatnonzero(ratios <= alpha + 1e-12):
+                    i = free_idx[j]
+                    if step[j] < 0:
+                        x[i], at_lower[i] = lower[i], True
+                    else:
+                        x[i], at_upper[i] = upper[i], True
+                continue
+
+        gradient = hessian @ x - linear
+        # A variable held at a bound is optimal there only if the gradient pushes it outwards.
+        release = np.where(at_lower & ~fixed, -gradient, 0.0) + np.where(at_upper, gradient, 0.0)
+        worst = int(np.argmax(release))
+        if release[worst] <= tol:
+            return x
+        at_lower[worst] = at_upper[worst] = False
+    return x
+
+
+def solve_portions(
+    nutrients: np.ndarray,
+    start_grams: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    target: MacroTargets,
+) -> np.ndarray:
+    # nutrients is NUTRIENTS x ingredients, per gram (rows of FoodCatalog.nutrients, transposed).
+    a = nutrients
+    t = target_vector(target)
+    weights = TARGET_WEIGHTS / np.maximum(t, 1.0)
+
+    scale = 1.0 / np.maximum(start_grams, 10.0)
+    reg = STAY_CLOSE_WEIGHT * scale * scale
+
+    def solve(rows: np.ndarray) -> np.ndarray:
+        wa = a[rows] * weights[rows, None]
+        wt = t[rows] * weights[rows]
+        hessian = wa.T @ wa + np.diag(reg)
+        linear = wa.T @ wt + reg * start_grams
+        return solve_box_qp(hessian, linear, lower, upper, start_grams)
+
+    # Fiber is a floor, not a target: only fit it when the macro-only solution falls short.
+    macro_rows = np.array([i for i in range(len(NUTRIENTS)) if i != FIBER_ROW])
+    grams = solve(macro_rows)
+    if float(a[FIBER_ROW] @ grams) < t[FIBER_ROW]:
+        grams = solve(np.arange(len(NUTRIENTS)))
+    return grams
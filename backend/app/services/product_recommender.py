@@ -1,4 +1,6 @@
-from app.clients.openfoodfacts_client import search_products
+import asyncio
+
+from app.clients.openfoodfacts_client import start_products_batch
 from app.domain.models import BrandSuggestion
 
 
@@ -22,52 +24,70 @@ def _health_rating(product: dict) -> str:
     return "Unknown"
 
 
-async def recommend_brands(country_code: str, keywords: list[str]) -> list[BrandSuggestion]:
-    suggestions: list[BrandSuggestion] = []
+def _suggestion(product: dict, fallback_name: str) -> BrandSuggestion:
+    nutriments = product.get("nutriments", {})
+    return BrandSuggestion(
+        brand=product.get("brands", "Unknown Brand"),
+        product_name=product.get("product_name", fallback_name.title()),
+        macros_per_100g={
+            "protein_g": float(nutriments.get("proteins_100g", 0.0) or 0.0),
+            "carbs_g": float(nutriments.get("carbohydrates_100g", 0.0) or 0.0),
+            "fat_g": float(nutriments.get("fat_100g", 0.0) or 0.0),
+            "kcal": float(nutriments.get("energy-kcal_100g", 0.0) or 0.0),
+        },
+        health_rating=_health_rating(product),
+        estimated_price=product.get("price") or product.get("stores"),
+    )
 
-    for keyword in keywords:
-        products = await search_products(keyword, country_code)
-        for p in products:
+
+def _unique(terms: list[str]) -> list[str]:
+    seen: set[str] = set()
+    unique = []
+    for term in terms:
+        key = term.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(term)
+    return unique
+
+
+async def _lookup_all(
+    country_code: str, terms: list[str], page_size: int, timeout_s: float | None
+) -> dict[str, list[dict]]:
+    # One concurrent wave over the shared pooled client (bounded by its per-host limit and served from
+    # the product cache where possible). Terms still in flight at timeout_s are left out of the result;
+    # their lookups finish in the background and warm the cache for the next request.
+    futures = start_products_batch(_unique(terms), country_code=country_code, page_size=page_size)
+    waiting = {f for f in futures.values() if not f.done()}
+    if waiting:
+        await asyncio.wait(waiting, timeout=timeout_s)
+    found = {term.strip().lower(): f.result() for term, f in futures.items() if f.done() and not f.cancelled()}
+    return {term: found[term.strip().lower()] for term in terms if term.strip().lower() in found}
+
+
+async def recommend_brands(
+    country_code: str, keywords: list[str], timeout_s: float | None = None
+) -> list[BrandSuggestion]:
+    products_by_keyword = await _lookup_all(country_code, keywords, page_size=10, timeout_s=timeout_s)
+    suggestions: list[BrandSuggestion] = []
+    for keyword in _unique(keywords):
+        for p in products_by_keyword.get(keyword, []):
             if not _is_whole_food_friendly(p):
                 continue
-            nutriments = p.get("nutriments", {})
-            suggestion = BrandSuggestion(
-                brand=p.get("brands", "Unknown Brand"),
-                product_name=p.get("product_name", keyword.title()),
-                macros_per_100g={
-                    "protein_g": float(nutriments.get("proteins_100g", 0.0) or 0.0),
-                    "carbs_g": float(nutriments.get("carbohydrates_100g", 0.0) or 0.0),
-                    "fat_g": float(nutriments.get("fat_100g", 0.0) or 0.0),
-                    "kcal": float(nutriments.get("energy-kcal_100g", 0.0) or 0.0),
-                },
-                health_rating=_health_rating(p),
-                estimated_price=p.get("price") or p.get("stores"),
-            )
-            suggestions.append(suggestion)
+            suggestions.append(_suggestion(p, keyword))
             if len(suggestions) >= 8:
                 return suggestions
     return suggestions
 
 
-async def recommend_brands_by_ingredient(country_code: str, ingredients: list[str]) -> dict[str, BrandSuggestion]:
+async def recommend_brands_by_ingredient(
+    country_code: str, ingredients: list[str], timeout_s: float | None = None
+) -> dict[str, BrandSuggestion]:
+    products_by_ingredient = await _lookup_all(country_code, ingredients, page_size=12, timeout_s=timeout_s)
     mapped: dict[str, BrandSuggestion] = {}
-    for ingredient in ingredients:
-        products = await search_products(ingredient, country_code, page_size=12)
+    for ingredient, products in products_by_ingredient.items():
         for p in products:
-            if not _is_whole_food_friendly(p):
-                continue
-            nutriments = p.get("nutriments", {})
-            mapped[ingredient] = BrandSuggestion(
-                brand=p.get("brands", "Unknown Brand"),
-                product_name=p.get("product_name", ingredient.title()),
-                macros_per_100g={
-                    "protein_g": float(nutriments.get("proteins_100g", 0.0) or 0.0),
-                    "carbs_g": float(nutriments.get("carbohydrates_100g", 0.0) or 0.0),
-                    "fat_g": float(nutriments.get("fat_100g", 0.0) or 0.0),
-                    "kcal": float(nutriments.get("energy-kcal_100g", 0.0) or 0.0),
-                },
-                health_rating=_health_rating(p),
-                estimated_price=p.get("price") or p.get("stores"),
-            )
-            break
+            if _is_whole_food_friendly(p):
+                mapped[ingredient] = _suggestion(p, ingredient)
+                break
     return mapped
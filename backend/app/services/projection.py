@@ -1,8 +1,10 @@
 import math
 from app.domain.recomp_models import BodyComposition, MonthlyMilestone, PlanInput, Projection, WeeklyWeightTarget
 from app.services.physiology import weekly_loss_kg_for_plan
+from app.services.plan_cache import memoize_plan
 
 
+@memoize_plan
 def projection(plan: PlanInput, body_comp: BodyComposition) -> Projection:
     weekly_loss_kg = weekly_loss_kg_for_plan(plan, body_comp.fat_loss_required_kg)
 
@@ -0,0 +1,43 @@
+import argparse
+import statistics
+import time
+
+from app.core.config import settings
+from app.services.meal_engine import generate_weekly_meal_plan
+from app.services.physiology import body_composition, calories_plan, macro_plan
+from benchmarks.scenarios import population
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Single-core throughput of generate_weekly_meal_plan.")
+    parser.add_argument("--plans", type=int, default=64, help="Distinct plans in the population")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Measurement window")
+    args = parser.parse_args(argv)
+
+    # Measure the engine itself, not memoized lookups.
+    settings.plan_cache_enabled = False
+    work = []
+    for plan in population(args.plans):
+        comp = body_composition(plan)
+        work.append((plan, macro_plan(plan, comp, calories_plan(plan))))
+
+    for plan, macros in work[:8]:
+        generate_weekly_meal_plan(plan, macros)
+
+    samples: list[float] = []
+    deadline = time.perf_counter() + args.seconds
+    while time.perf_counter() < deadline:
+        for plan, macros in work:
+            start = time.perf_counter()
+            generate_weekly_meal_plan(plan, macros)
+            samples.append(time.perf_counter() - start)
+
+    total = sum(samples)
+    print(f"plans: {len(samples)}")
+    print(f"plans/s per core: {len(samples) / total:.1f}")
+    print(f"p50 ms: {statistics.median(samples) * 1000:.3f}")
+    print(f"p95 ms: {statistics.quantiles(samples, n=20)[18] * 1000:.3f}")
+
+
+if __name__ == "__main__":
+    main()
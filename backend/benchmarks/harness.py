@@ -0,0 +1,158 @@
+import asyncio
+import contextlib
+import gc
+import inspect
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+# Metrics where a larger value is a regression; throughput is checked the other way round.
+# p99 is reported but not gated: on microsecond scenarios it is mostly scheduler noise.
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "peak_kib")
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    # Called with the iteration index so scenarios can cycle through a plan population.
+    run: Callable[[int], Any] | Callable[[int], Awaitable[Any]]
+    iterations: int = 200
+    # Async scenarios may need per-loop setup (HTTP clients, stubs); it wraps the whole measurement.
+    lifespan: Callable[[], contextlib.AbstractAsyncContextManager] | None = None
+
+
+@dataclass(frozen=True)
+class Result:
+    name: str
+    iterations: int
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    ops_per_s: float
+    peak_kib: float
+
+
+def percentile(sorted_samples: list[float], pct: float) -> float:
+    if len(sorted_samples) == 1:
+        return sorted_samples[0]
+    rank = (len(sorted_samples) - 1) * pct
+    low = int(rank)
+    high = min(low + 1, len(sorted_samples) - 1)
+    return sorted_samples[low] + (sorted_samples[high] - sorted_samples[low]) * (rank - low)
+
+
+def _result(name: str, samples: list[float], peaks: list[int]) -> Result:
+    ordered = sorted(samples)
+    return Result(
+        name=name,
+        iterations=len(samples),
+        mean_ms=statistics.fmean(samples) * 1000,
+        p50_ms=percentile(ordered, 0.50) * 1000,
+        p95_ms=percentile(ordered, 0.95) * 1000,
+        p99_ms=percentile(ordered, 0.99) * 1000,
+        ops_per_s=len(samples) / sum(samples),
+        peak_kib=statistics.median(peaks) / 1024 if peaks else 0.0,
+    )
+
+
+def _measure_sync(scenario: Scenario, warmup: int, alloc_iterations: int) -> Result:
+    run = scenario.run
+    for i in range(warmup):
+        run(i)
+    gc.collect()
+
+    samples = []
+    for i in range(warmup, warmup + scenario.iterations):
+        start = time.perf_counter()
+        run(i)
+        samples.append(time.perf_counter() - start)
+
+    # Separate pass: tracemalloc slows everything down, so it must not pollute the latency samples.
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(alloc_iterations):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            run(i)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return _result(scenario.name, samples, peaks)
+
+
+async def _measure_async(scenario: Scenario, warmup: int, alloc_iterations: int) -> Result:
+    async with scenario.lifespan() if scenario.lifespan else contextlib.nullcontext():
+        run = scenario.run
+        for i in range(warmup):
+            await run(i)
+        gc.collect()
+
+        samples = []
+        for i in range(warmup, warmup + scenario.iterations):
+            start = time.perf_counter()
+            await run(i)
+            samples.append(time.perf_counter() - start)
+
+        peaks = []
+        tracemalloc.start()
+        try:
+            for i in range(alloc_iterations):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                await run(i)
+                peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        finally:
+            tracemalloc.stop()
+    return _result(scenario.name, samples, peaks)
+
+
+def measure(scenario: Scenario, warmup: int = 10, alloc_iterations: int = 10) -> Result:
+    if inspect.iscoroutinefunction(scenario.run):
+        return asyncio.run(_measure_async(scenario, warmup, alloc_iterations))
+    return _measure_sync(scenario, warmup, alloc_iterations)
+
+
+def save_baseline(results: list[Result], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {r.name: asdict(r) for r in results},
+    }
+    path.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def load_baseline(path: Path) -> dict[str, dict[str, float]]:
+    return json.loads(path.read_text(encoding="utf-8"))["results"]
+
+
+def regressions(results: list[Result], baseline: dict[str, dict[str, float]], threshold: float) -> list[str]:
+    problems = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            continue
+        current = asdict(result)
+        for metric in LOWER_IS_BETTER:
+            if base[metric] > 0 and current[metric] > base[metric] * (1 + threshold):
+                problems.append(f"{result.name}.{metric}: {base[metric]:.3f} -> {current[metric]:.3f}")
+        if current["ops_per_s"] < base["ops_per_s"] * (1 - threshold):
+            problems.append(f"{result.name}.ops_per_s: {base['ops_per_s']:.1f} -> {current['ops_per_s']:.1f}")
+    return problems
+
+
+def format_table(results: list[Result]) -> str:
+    header = f"{'scenario':<40}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}{'peak KiB':>11}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r.name:<40}{r.p50_ms:>10.3f}{r.p95_ms:>10.3f}{r.p99_ms:>10.3f}{r.ops_per_s:>12.1f}{r.peak_kib:>11.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import collections
+import contextlib
+import statistics
+import sys
+import time
+
+import httpx
+
+from app.core.config import settings
+from benchmarks.harness import percentile
+from benchmarks.scenarios import population
+
+ENDPOINTS = {
+    "generate-meals": "/generate-meals",
+    "plan": "/api/v1/plan",
+}
+BACKOFF_MIN_S = 0.05
+BACKOFF_MAX_S = 2.0
+
+
+def _legacy_profile(i: int) -> dict:
+    return {
+        "height_cm": 160 + (i * 7) % 35,
+        "weight_kg": 60 + (i * 13) % 50,
+        "age": 22 + (i * 3) % 40,
+        "gender": "male" if i % 2 else "female",
+        "body_fat_percent": 18 + (i * 5) % 15,
+        "activity_level": ["sedentary", "moderate", "active"][i % 3],
+        "goal": ["muscle_gain", "fat_loss", "recomposition"][i % 3],
+        "timeline_weeks": [8, 16, 32][i % 3],
+        "country_code": ["DE", "FR", "GB"][i % 3],
+    }
+
+
+def _bodies(endpoint: str, size: int) -> list[dict]:
+    if endpoint == "plan":
+        return [_legacy_profile(i) for i in range(size)]
+    return [{"plan": p.model_dump(mode="json")} for p in population(size)]
+
+
+def _retry_after(response: httpx.Response, fallback: float) -> float:
+    try:
+        return max(0.0, float(response.headers["retry-after"]))
+    except (KeyError, ValueError):
+        return fallback
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    path: str,
+    bodies: list[dict],
+    offset: int,
+    deadline: float,
+    latencies: list[float],
+    statuses: collections.Counter,
+) -> None:
+    # Only 2xx latencies are kept: a fast 503 would otherwise pull the percentiles down. A 503 or a
+    # transport error makes this client wait (Retry-After, else exponential backoff) like a real one would,
+    # instead of hammering a saturated server in a tight loop.
+    i = offset
+    backoff = BACKOFF_MIN_S
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        wait = 0.0
+        try:
+            response = await client.post(path, json=bodies[i % len(bodies)])
+            statuses[response.status_code] += 1
+            if response.is_success:
+                latencies.append(time.perf_counter() - start)
+                backoff = BACKOFF_MIN_S
+            elif response.status_code in (429, 503):
+                wait = _retry_after(response, backoff)
+        except httpx.HTTPError as exc:
+            statuses[type(exc).__name__] += 1
+            wait = backoff
+        if wait:
+            backoff = min(backoff * 2, BACKOFF_MAX_S)
+            await asyncio.sleep(min(wait, max(0.0, deadline - time.perf_counter())))
+        i += 1
+
+
+async def _run(args: argparse.Namespace) -> tuple[list[float], collections.Counter, float]:
+    latencies: list[float] = []
+    statuses: collections.Counter = collections.Counter()
+    bodies = _bodies(args.endpoint, args.plans)
+    timeout = httpx.Timeout(60.0)
+
+    async with contextlib.AsyncExitStack() as stack:
+        if args.url:
+            limits = httpx.Limits(max_connections=args.concurrency)
+            client = httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits)
+        else:
+            from app.main import app
+
+            # ASGITransport does not run the lifespan, so start the app's pooled client and caches here.
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=timeout)
+        await stack.enter_async_context(client)
+
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        await asyncio.gather(
+            *(
+                _worker(client, ENDPOINTS[args.endpoint], bodies, w, deadline, latencies, statuses)
+                for w in range(args.concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - started
+    return latencies, statuses, elapsed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Closed-loop load test against a simulated OpenFoodFacts upstream.")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="generate-meals")
+    parser.add_argument("--url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--plans", type=int, default=64, help="Distinct request bodies to cycle through")
+    parser.add_argument("--latency-ms", type=float, help="Simulated upstream median latency")
+    parser.add_argument("--latency-p95-ms", type=float, help="Simulated upstream p95 latency")
+    parser.add_argument("--error-rate", type=float, help="Fraction of upstream calls answered with 5xx")
+    parser.add_argument("--timeout-rate", type=float, help="Fraction of upstream calls that hang until timeout")
+    parser.add_argument("--empty-rate", type=float, help="Fraction of upstream calls with no products")
+    parser.add_argument("--padding-bytes", type=int, help="Extra bytes per simulated product")
+    parser.add_argument(
+        "--off-rate-limit", type=float, default=0.0, help="Upstream requests per second (0: no token bucket)"
+    )
+    parser.add_argument("--cold", action="store_true", help="Disable the product and plan caches")
+    args = parser.parse_args(argv)
+
+    # In-process runs always use the simulator; remote servers are configured through their own env.
+    if not args.url:
+        settings.openfoodfacts_transport = "simulator"
+        settings.openfoodfacts_backend = "http"
+        # Simulated products must never land in the real on-disk product cache.
+        settings.openfoodfacts_cache_path = None
+        # The simulator has no quota; the live API's rate limit would otherwise cap throughput.
+        settings.openfoodfacts_rate_limit_per_s = args.off_rate_limit
+        for flag, field in [
+            ("latency_ms", "latency_median_ms"),
+            ("latency_p95_ms", "latency_p95_ms"),
+            ("error_rate", "error_rate"),
+            ("timeout_rate", "timeout_rate"),
+            ("empty_rate", "empty_rate"),
+            ("padding_bytes", "padding_bytes"),
+        ]:
+            value = getattr(args, flag)
+            if value is not None:
+                setattr(settings, f"openfoodfacts_simulator_{field}", value)
+        if args.cold:
+            settings.openfoodfacts_cache_enabled = False
+            settings.plan_cache_enabled = False
+
+    latencies, statuses, elapsed = asyncio.run(_run(args))
+    total = sum(statuses.values())
+    print(f"endpoint: {ENDPOINTS[args.endpoint]}  concurrency: {args.concurrency}  window: {elapsed:.1f}s")
+    print(
+        f"requests: {total}  succeeded: {len(latencies)}"
+        f"  throughput: {len(latencies) / elapsed:.1f} successful req/s"
+    )
+    print("statuses: " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))))
+    if not latencies:
+        print("no requests succeeded")
+        return 1
+
+    ordered = sorted(latencies)
+    print(
+        f"latency ms (successful)  mean {statistics.fmean(latencies) * 1000:.1f}"
+        f"  p50 {percentile(ordered, 0.50) * 1000:.1f}"
+        f"  p95 {percentile(ordered, 0.95) * 1000:.1f}"
+        f"  p99 {percentile(ordered, 0.99) * 1000:.1f}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
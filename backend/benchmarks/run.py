@@ -0,0 +1,49 @@
+import argparse
+import sys
+from pathlib import Path
+
+from app.core.config import settings
+from benchmarks.harness import format_table, load_baseline, measure, regressions, save_baseline
+from benchmarks.scenarios import PROFILES, build_scenarios, population
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Latency, allocation and throughput benchmarks for the recomposition pipeline.")
+    parser.add_argument("--population", choices=sorted(PROFILES), default="mixed", help="Plan population profile")
+    parser.add_argument("--plans", type=int, default=64, help="Distinct plans in the population")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed iterations for the meal-level scenarios")
+    parser.add_argument("--only", action="append", default=[], help="Run scenarios whose name contains this text")
+    parser.add_argument("--save", type=Path, help="Write the results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="Compare against a JSON baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative slowdown before failing")
+    args = parser.parse_args(argv)
+
+    # Measure the engines themselves, not memoized lookups.
+    settings.plan_cache_enabled = False
+
+    scenarios = build_scenarios(population(args.plans, args.population), args.iterations)
+    if args.only:
+        scenarios = [s for s in scenarios if any(text in s.name for text in args.only)]
+
+    results = [measure(s) for s in scenarios]
+    print(format_table(results))
+
+    if args.save:
+        save_baseline(results, args.save)
+        print(f"baseline written to {args.save}")
+
+    if args.compare:
+        problems = regressions(results, load_baseline(args.compare), args.threshold)
+        if problems:
+            print(f"regressions beyond {args.threshold:.0%}:")
+            for problem in problems:
+                print(f"  {problem}")
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
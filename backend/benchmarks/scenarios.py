@@ -0,0 +1,224 @@
+import contextlib
+import json
+from typing import AsyncIterator
+
+import httpx
+
+from app.clients import openfoodfacts_client
+from app.clients.off_stream import SearchResultStream
+from app.core import compression
+from app.core.config import settings
+from app.core.responses import ModelResponse, dumps
+from app.domain.recomp_models import ActivityLevel, GenerateMealsResponse, Gender, GoalMode, PlanInput
+from app.services.compact_plan import compact_generate_meals
+from app.services.grocery_engine import build_grocery_list
+from app.services.meal_engine import generate_weekly_meal_plan
+from app.services.physiology import body_composition, calories_plan, macro_plan
+from app.services.projection import projection
+from app.services.retail_enricher import RetailerMatcher, _attach_products, _best_product
+from benchmarks.harness import Scenario
+
+# (body fat range start, span, target body fat) per population profile.
+PROFILES = {
+    "mixed": (16, 20, 12),
+    "lean": (12, 6, 9),
+    "high_bf": (28, 14, 20),
+}
+
+STUB_RETAILERS = ["aldi", "lidl", "tesco", "rewe", "edeka"]
+
+
+def population(size: int, profile: str = "mixed") -> list[PlanInput]:
+    bf_start, bf_span, target_bf = PROFILES[profile]
+    plans = []
+    for i in range(size):
+        plans.append(
+            PlanInput(
+                height_cm=155 + (i * 7) % 45,
+                weight_kg=55 + (i * 13) % 60,
+                age=20 + (i * 3) % 45,
+                gender=Gender.male if i % 2 else Gender.female,
+                body_fat_percent=bf_start + (i * 5) % bf_span,
+                target_body_fat_percent=target_bf,
+                activity_level=list(ActivityLevel)[i % 5],
+                training_days_per_week=i % 8,
+                timeline_weeks=8 + (i * 11) % 40,
+                goal_mode=list(GoalMode)[i % 2],
+            )
+        )
+    return plans
+
+
+def stub_products(query: str, page_size: int) -> list[dict]:
+    # Deterministic OpenFoodFacts-shaped products so enrichment does the same work on every run.
+    products = []
+    for i in range(page_size):
+        products.append(
+            {
+                "product_name": f"{query} {i}",
+                "brands": f"Brand {i % 7}",
+                "stores": STUB_RETAILERS[i % len(STUB_RETAILERS)],
+                "stores_tags": [STUB_RETAILERS[(i + 1) % len(STUB_RETAILERS)]],
+                "nutriscore_grade": "abcde"[i % 5],
+                "price": f"{1 + i % 9}.{i % 100:02d}" if i % 3 else None,
+                "nutriments": {
+                    "proteins_100g": 5 + i % 20,
+                    "carbohydrates_100g": 10 + i % 50,
+                    "fat_100g": 1 + i % 15,
+                    "energy-kcal_100g": 80 + i * 7 % 300,
+                },
+            }
+        )
+    return products
+
+
+def _stub_openfoodfacts(request: httpx.Request) -> httpx.Response:
+    query = request.url.params.get("search_terms", "")
+    page_size = int(request.url.params.get("page_size", "25"))
+    return httpx.Response(200, json={"count": page_size, "products": stub_products(query, page_size)})
+
+
+@contextlib.asynccontextmanager
+async def stubbed_openfoodfacts() -> AsyncIterator[None]:
+    # Every lookup goes through the pooled client to the stub; the product cache would otherwise
+    # turn all but the first iteration into SQLite reads. The stub has no quota, and the live API's
+    # token bucket would make the scenario measure the rate limiter instead of the request path.
+    cache_enabled = settings.openfoodfacts_cache_enabled
+    backend = settings.openfoodfacts_backend
+    rate_limit = settings.openfoodfacts_rate_limit_per_s
+    settings.openfoodfacts_cache_enabled = False
+    settings.openfoodfacts_backend = "http"
+    settings.openfoodfacts_rate_limit_per_s = 0
+    await openfoodfacts_client.open_client(httpx.MockTransport(_stub_openfoodfacts))
+    try:
+        yield
+    finally:
+        await openfoodfacts_client.close_client()
+        settings.openfoodfacts_cache_enabled = cache_enabled
+        settings.openfoodfacts_backend = backend
+        settings.openfoodfacts_rate_limit_per_s = rate_limit
+
+
+def full_search_body(query: str, page_size: int = 25) -> bytes:
+    # Roughly what search.pl returns without `fields`: ingredients, images, tags and every nutriment.
+    products = [
+        {
+            **product,
+            "code": f"{4_000_000_000_000 + i}",
+            "ingredients_text": f"{query}, " * 60,
+            "ingredients": [{"id": f"en:{query}-{j}", "text": query, "percent_estimate": 12.5} for j in range(20)],
+            "images": {
+                str(k): {"sizes": {"100": {"h": 100, "w": 75}, "full": {"h": 1200, "w": 900}}} for k in range(10)
+            },
+            "categories_tags": [f"en:category-{k}" for k in range(20)],
+            "packaging_tags": ["en:bag", "en:plastic", "en:recyclable"],
+            "nutriments": {
+                **product["nutriments"],
+                **{f"nutrient-{k}_{unit}": 1.5 for k in range(40) for unit in ("100g", "serving", "value", "unit")},
+            },
+        }
+        for i, product in enumerate(stub_products(query, page_size))
+    ]
+    return json.dumps({"count": page_size, "page": 1, "page_size": page_size, "products": products}).encode("utf-8")
+
+
+def _parse_scenarios(iterations: int) -> list[Scenario]:
+    full = full_search_body("Rolled Oats")
+    document = json.loads(full)
+    fields = openfoodfacts_client.PRODUCT_FIELDS
+    document["products"] = [{k: p[k] for k in fields if k in p} for p in document["products"]]
+    projected = json.dumps(document).encode("utf-8")
+
+    def stream(_: int) -> list[dict]:
+        parser = SearchResultStream(openfoodfacts_client._slim)
+        products = []
+        for start in range(0, len(projected), 16384):
+            products += parser.feed(projected[start : start + 16384])
+        return products + parser.close()
+
+    return [
+        Scenario("parse.off_search.full_json", lambda i: json.loads(full)["products"], iterations),
+        Scenario("parse.off_search.fields_stream", stream, iterations),
+    ]
+
+
+def _validated_json(response: GenerateMealsResponse) -> bytes:
+    # What FastAPI does with a returned model and a response_model: dump, validate again, encode.
+    content = GenerateMealsResponse.model_validate(response.model_dump()).model_dump(mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _serialization_scenarios(responses: list[GenerateMealsResponse], iterations: int) -> list[Scenario]:
+    n = len(responses)
+    bodies = [ModelResponse(r).body for r in responses]
+    scenarios = [
+        Scenario("serialize.generate_meals.validated", lambda i: _validated_json(responses[i % n]), iterations),
+        Scenario("serialize.generate_meals.model_response", lambda i: ModelResponse(responses[i % n]).body, iterations),
+        Scenario(
+            "serialize.generate_meals.compact", lambda i: dumps(compact_generate_meals(responses[i % n])), iterations
+        ),
+        Scenario("compress.generate_meals.gzip", lambda i: compression.compress(bodies[i % n], "gzip"), iterations),
+    ]
+    if compression.brotli is not None:
+        scenarios.append(
+            Scenario("compress.generate_meals.br", lambda i: compression.compress(bodies[i % n], "br"), iterations)
+        )
+    return scenarios
+
+
+def build_scenarios(plans: list[PlanInput], iterations: int) -> list[Scenario]:
+    from app.main import app
+
+    n = len(plans)
+    comps = [body_composition(p) for p in plans]
+    calories = [calories_plan(p) for p in plans]
+    macros = [macro_plan(p, c, k) for p, c, k in zip(plans, comps, calories)]
+    weekly = [generate_weekly_meal_plan(p, m) for p, m in zip(plans, macros)]
+    bodies = [{"plan": p.model_dump(mode="json")} for p in plans]
+    responses = []
+    no_retailers = RetailerMatcher(())
+    for i in range(n):
+        grocery = build_grocery_list(weekly[i])
+        products = {item.ingredient: _best_product(stub_products(item.ingredient, 25), no_retailers) for item in grocery}
+        meal_plan, grocery = _attach_products(weekly[i], grocery, products)
+        responses.append(
+            GenerateMealsResponse(
+                body_composition=comps[i],
+                calories=calories[i],
+                macros=macros[i],
+                projection=projection(plans[i], comps[i]),
+                meal_plan=meal_plan,
+                grocery_list=grocery,
+            )
+        )
+
+    # A local-index-sized candidate page, scored against a typical set of preferred retailers.
+    many = stub_products("Rolled Oats", 2000)
+    preferred = RetailerMatcher(["edeka", "rewe", "aldi"])
+
+    asgi = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    async def generate_meals(i: int) -> None:
+        response = await asgi.post("/generate-meals", json=bodies[i % n])
+        response.raise_for_status()
+
+    return [
+        Scenario("physiology.body_composition", lambda i: body_composition(plans[i % n]), iterations * 10),
+        Scenario("physiology.calories_plan", lambda i: calories_plan(plans[i % n]), iterations * 10),
+        Scenario(
+            "physiology.macro_plan",
+            lambda i: macro_plan(plans[i % n], comps[i % n], calories[i % n]),
+            iterations * 10,
+        ),
+        Scenario("projection.projection", lambda i: projection(plans[i % n], comps[i % n]), iterations * 10),
+        Scenario(
+            "meal_engine.generate_weekly_meal_plan",
+            lambda i: generate_weekly_meal_plan(plans[i % n], macros[i % n]),
+            iterations,
+        ),
+        Scenario("grocery_engine.build_grocery_list", lambda i: build_grocery_list(weekly[i % n]), iterations),
+        *_serialization_scenarios(responses, iterations),
+        Scenario("retail_enricher.best_product.2000", lambda i: _best_product(many, preferred), iterations),
+        *_parse_scenarios(iterations),
+        Scenario("api.generate_meals", generate_meals, max(1, iterations // 2), lifespan=stubbed_openfoodfacts),
+    ]
@@ -4,6 +4,7 @@ set -euo pipefail
 # dev.sh - Convenience launcher for FitPlanner MVP
 # Usage:
 #   ./dev.sh backend   # Run FastAPI locally with venv
+#   ./dev.sh prod      # Run the production server locally
 #   ./dev.sh docker    # Run backend via docker compose
 #   ./dev.sh ios       # Generate and open Xcode project
 #   ./dev.sh help      # Show help
@@ -18,6 +19,7 @@ FitPlanner dev helper
 
 Commands:
   backend   Create venv, install deps, run uvicorn on :8000
+  prod      Same, through the production server (WEB_CONCURRENCY workers, default one)
   docker    docker compose up --build -d (backend)
   ios       Install xcodegen (if missing), generate Xcode project, open it
   help      Show this help
@@ -29,6 +31,9 @@ case "$cmd" in
   backend)
     bash "$BACKEND_DIR/run.sh"
     ;;
+  prod)
+    bash "$BACKEND_DIR/run.sh" prod
+    ;;
   docker)
     pushd "$BACKEND_DIR" >/dev/null
     cp -n .env.example .env 2>/dev/null || true
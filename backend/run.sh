@@ -0,0 +1,20 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# run.sh - Run the backend from a local venv
+# Usage:
+#   ./run.sh          # single uvicorn process with --reload on :8000
+#   ./run.sh prod     # production server (WEB_CONCURRENCY workers, default one)
+
+cd "$(dirname "$0")"
+
+if [ ! -d .venv ]; then
+  python3 -m venv .venv
+fi
+source .venv/bin/activate
+pip install -q -r requirements.txt
+
+if [ "${1:-dev}" = "prod" ]; then
+  exec python -m app.server --port "${PORT:-8000}"
+fi
+exec uvicorn app.main:app --reload --port "${PORT:-8000}"
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.clients import openfoodfacts_client
+from app.core.config import settings
+from app.main import app
+
+PLAN = {
+    "height_cm": 171,
+    "weight_kg": 71,
+    "age": 31,
+    "gender": "male",
+    "body_fat_percent": 18,
+    "target_body_fat_percent": 12,
+    "activity_level": "moderate",
+    "training_days_per_week": 4,
+    "country_code": "DE",
+    "goal_mode": "recomposition",
+}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    calls: list[tuple[str, str]] = []
+
+    async def fake_fetch(query, country_code, page_size, store):
+        calls.append((country_code, query))
+        return [{"product_name": f"{query} ({country_code})", "brands": "Brand", "stores": "Lidl"}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    monkeypatch.setattr(settings, "openfoodfacts_cache_enabled", False)
+    return calls
+
+
+def _lines(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_generate_meals_batch_streams_ndjson_and_dedupes_lookups(upstream) -> None:
+    plans = [PLAN, {**PLAN, "weight_kg": 80}, {**PLAN, "training_days_per_week": 2}, {**PLAN, "country_code": "FR"}]
+    with TestClient(app) as client:
+        response = client.post("/generate-meals/batch", json={"plans": plans})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = _lines(response)
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3]
+    assert all("result" in line for line in lines)
+    assert len(upstream) == len(set(upstream))
+
+    fr = next(line["result"] for line in lines if line["index"] == 3)
+    assert fr["grocery_list"][0]["retail_product"]["product_name"].endswith("(FR)")
+
+
+def test_calculate_plan_batch_negotiates_ndjson(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "calculate_batch_chunk_size", 2)
+    plans = [PLAN, {**PLAN, "age": 40}, {**PLAN, "age": 50}]
+    with TestClient(app) as client:
+        streamed = client.post("/calculate-plan/batch", json={"plans": plans}, headers={"Accept": "application/x-ndjson"})
+        plain = client.post("/calculate-plan/batch", json={"plans": plans})
+
+    assert [line["index"] for line in _lines(streamed)] == [0, 1, 2]
+    assert [line["result"] for line in _lines(streamed)] == plain.json()["results"]
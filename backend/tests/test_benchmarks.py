@@ -0,0 +1,31 @@
+from dataclasses import asdict
+
+from benchmarks.harness import Result, Scenario, measure, regressions
+
+
+def _result(**overrides) -> Result:
+    values = dict(
+        name="engine", iterations=100, mean_ms=1.0, p50_ms=1.0, p95_ms=2.0, p99_ms=3.0, ops_per_s=1000.0, peak_kib=10.0
+    )
+    values.update(overrides)
+    return Result(**values)
+
+
+def test_measure_reports_percentiles_and_throughput() -> None:
+    calls = []
+    result = measure(Scenario("noop", calls.append, iterations=20), warmup=2, alloc_iterations=3)
+
+    assert result.iterations == 20
+    assert len(calls) == 2 + 20 + 3
+    assert result.p50_ms <= result.p95_ms <= result.p99_ms
+    assert result.ops_per_s > 0
+
+
+def test_regressions_flag_slowdowns_past_threshold() -> None:
+    baseline = {"engine": asdict(_result())}
+
+    assert regressions([_result(p50_ms=1.1, ops_per_s=950.0)], baseline, threshold=0.15) == []
+    problems = regressions([_result(p95_ms=2.5, ops_per_s=800.0)], baseline, threshold=0.15)
+    assert [p.split(":")[0] for p in problems] == ["engine.p95_ms", "engine.ops_per_s"]
+    # Scenarios missing from the baseline are new, not regressions.
+    assert regressions([_result(name="new", p50_ms=50.0)], baseline, threshold=0.15) == []
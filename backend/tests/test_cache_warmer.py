@@ -0,0 +1,102 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from app.clients import openfoodfacts_client
+from app.clients.off_governor import CircuitOpen
+from app.clients.product_cache import ProductCache, cache_key
+from app.core.config import settings
+from app.services import cache_warmer
+from app.services.cache_warmer import catalog_queries, warm_product_cache
+from app.services.retail_enricher import CANDIDATE_PAGE_SIZE
+
+
+@pytest.fixture()
+def cache(monkeypatch):
+    cache = ProductCache(None, ttl_s=3600, negative_ttl_s=60, stale_s=3600, max_entries=512)
+    monkeypatch.setattr(openfoodfacts_client, "get_product_cache", lambda: cache)
+    monkeypatch.setattr(cache_warmer, "get_product_cache", lambda: cache)
+    return cache
+
+
+def test_pass_fetches_each_catalog_food_per_country_once(cache, monkeypatch) -> None:
+    calls: list[tuple[str, str]] = []
+
+    async def fake_fetch(query, country_code, page_size, store):
+        calls.append((country_code, query))
+        return [{"product_name": query}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    foods = catalog_queries()
+
+    first = asyncio.run(warm_product_cache(["DE", "GB"], rate_per_s=0))
+    again = asyncio.run(warm_product_cache(["DE", "GB"], rate_per_s=0))
+    # Entries that would lapse before the next pass count as due.
+    ahead = asyncio.run(warm_product_cache(["DE"], rate_per_s=0, horizon_s=7200))
+
+    assert first == {"due": 2 * len(foods), "warmed": 2 * len(foods), "failed": 0, "skipped": 0}
+    assert again["due"] == 0
+    assert ahead["warmed"] == len(foods)
+    assert cache.get(cache_key(foods[0], "GB", CANDIDATE_PAGE_SIZE, None)).products == [{"product_name": foods[0]}]
+    assert len(calls) == 3 * len(foods)
+
+
+def test_open_circuit_ends_the_pass(cache, monkeypatch) -> None:
+    calls: list[str] = []
+
+    async def fake_fetch(query, country_code, page_size, store):
+        calls.append(query)
+        if len(calls) > 2:
+            raise CircuitOpen("world.openfoodfacts.org")
+        return [{"product_name": query}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+
+    stats = asyncio.run(warm_product_cache(["DE"], rate_per_s=0))
+
+    assert stats["warmed"] == 2
+    assert stats["skipped"] == len(catalog_queries()) - 2
+    assert len(calls) == 3
+
+
+def test_failed_or_empty_refresh_keeps_cached_products(cache, monkeypatch) -> None:
+    foods = catalog_queries()
+    good = [{"product_name": "Cached"}]
+    for name in foods[:2]:
+        cache.set(cache_key(name, "DE", CANDIDATE_PAGE_SIZE, None), good)
+
+    async def fake_fetch(query, country_code, page_size, store):
+        if query == foods[0]:
+            raise httpx.ReadTimeout("slow upstream")
+        if query == foods[1]:
+            return []
+        return [{"product_name": query}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+
+    # Both cached entries would go stale within the horizon, so the pass refreshes them.
+    stats = asyncio.run(warm_product_cache(["DE"], rate_per_s=0, horizon_s=7200))
+
+    assert stats["failed"] == 1
+    for name in foods[:2]:
+        products = asyncio.run(openfoodfacts_client.search_products(name, "DE", CANDIDATE_PAGE_SIZE))
+        assert products == good
+    # Entries with nothing cached are filled as usual.
+    assert cache.get(cache_key(foods[2], "DE", CANDIDATE_PAGE_SIZE, None)).products == [{"product_name": foods[2]}]
+
+
+def test_only_one_process_claims_a_shared_cache(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "openfoodfacts_cache_path", str(tmp_path / "off.sqlite3"))
+
+    first = cache_warmer._claim_warmer()
+    try:
+        assert first is not None and first >= 0
+        # flock locks belong to the open file description, so a second open conflicts like another worker.
+        assert cache_warmer._claim_warmer() is None
+    finally:
+        os.close(first)
+    second = cache_warmer._claim_warmer()
+    assert second is not None
+    os.close(second)
@@ -0,0 +1,75 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import catalog as catalog_module
+from app.services.catalog import build_catalog, get_catalog, set_catalog_path
+
+
+def test_catalog_indexes_and_derived_subsets() -> None:
+    catalog = get_catalog()
+
+    assert catalog.find("chicken breast") is catalog.find("Chicken Breast")
+    assert catalog.find("does not exist") is None
+    assert all(p["fat_g"] <= 6 for p in catalog.lean_proteins)
+    assert all(c["protein_g"] <= 8 for c in catalog.lower_protein_carbs)
+    assert catalog.package_sizes["Chicken Breast"] == 1000
+    chicken = catalog.find("Chicken Breast")
+    assert catalog.nutrients[catalog.row(chicken)].tolist() == pytest.approx([1.65, 0.31, 0.0, 0.036, 0.0])
+    assert not catalog.nutrients.flags.writeable
+    assert get_catalog() is catalog
+
+
+def test_derived_subsets_fall_back_to_full_category() -> None:
+    catalog = build_catalog(
+        [
+            {"name": "Salmon", "category": "protein", "kcal": 208, "protein_g": 20, "carbs_g": 0, "fat_g": 13, "fiber_g": 0},
+            {"name": "Oats", "category": "carb", "kcal": 389, "protein_g": 17, "carbs_g": 66, "fat_g": 7, "fiber_g": 10},
+        ]
+    )
+    assert [f["name"] for f in catalog.lean_proteins] == ["Salmon"]
+    assert [f["name"] for f in catalog.lower_protein_carbs] == ["Oats"]
+    assert catalog.category("beverage") == []
+
+
+def test_catalog_hot_reloads_on_mtime_change(tmp_path) -> None:
+    path = tmp_path / "catalog.json"
+    food = {"name": "Rice", "category": "carb", "kcal": 130, "protein_g": 2.7, "carbs_g": 28, "fat_g": 0.3, "fiber_g": 0.4}
+    path.write_text(json.dumps([food]), encoding="utf-8")
+    try:
+        set_catalog_path(path)
+        first = get_catalog()
+        assert first.find("rice") is not None
+
+        path.write_text(json.dumps([food, {**food, "name": "Quinoa"}]), encoding="utf-8")
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, first.mtime_ns + 1_000_000))
+
+        second = get_catalog()
+        assert second is not first
+        assert second.find("quinoa") is not None
+    finally:
+        set_catalog_path(catalog_module.CATALOG_PATH)
+
+
+def test_compiled_catalog_is_memory_mapped(tmp_path, monkeypatch) -> None:
+    compiled = catalog_module.write_compiled_catalog(tmp_path)
+    monkeypatch.setattr(settings, "catalog_compiled_dir", str(tmp_path))
+
+    mapped = catalog_module.load_catalog()
+    assert compiled.exists()
+    assert isinstance(mapped.nutrients, np.memmap)
+    assert not mapped.nutrients.flags.writeable
+    assert mapped.nutrients.tolist() == get_catalog().nutrients.tolist()
+
+
+def test_compiled_catalog_is_ignored_when_source_changes(tmp_path, monkeypatch) -> None:
+    catalog_module.write_compiled_catalog(tmp_path / "compiled")
+    monkeypatch.setattr(settings, "catalog_compiled_dir", str(tmp_path / "compiled"))
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps([{"name": "Rice", "category": "carb", "kcal": 130, "protein_g": 2.7, "carbs_g": 28, "fat_g": 0.3, "fiber_g": 0.4}]), encoding="utf-8")
+
+    assert not isinstance(catalog_module.load_catalog(path).nutrients, np.memmap)
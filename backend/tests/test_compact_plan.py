@@ -0,0 +1,74 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.clients import openfoodfacts_client
+from app.core import responses
+from app.core.config import settings
+from app.domain.recomp_models import GenerateMealsResponse
+from app.main import app
+from app.services.compact_plan import expand_generate_meals
+
+PLAN = {
+    "height_cm": 172,
+    "weight_kg": 74,
+    "age": 29,
+    "gender": "female",
+    "body_fat_percent": 27,
+    "target_body_fat_percent": 21,
+    "activity_level": "light",
+    "training_days_per_week": 3,
+    "timeline_weeks": 20,
+    "goal_mode": "recomposition",
+}
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    async def fake_fetch(query, country_code, page_size, store):
+        return [{"product_name": f"{query} Classic", "brands": "Brand", "stores": "Aldi", "nutriments": {"proteins_100g": 9}}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    monkeypatch.setattr(settings, "openfoodfacts_cache_enabled", False)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_compact_format_round_trips_and_is_smaller(client) -> None:
+    full = client.post("/generate-meals", json={"plan": PLAN})
+    compact = client.post("/generate-meals?format=compact", json={"plan": PLAN})
+
+    assert compact.status_code == 200
+    assert compact.headers["content-type"] == "application/vnd.fitplanner.compact+json"
+    body = compact.json()
+    assert body["v"] == 1
+    # One dictionary entry per ingredient, however many meals use it.
+    assert len({food[0] for food in body["foods"]}) == len(body["foods"])
+    assert len(compact.content) * 3 < len(full.content)
+    assert expand_generate_meals(body) == GenerateMealsResponse.model_validate(full.json())
+
+
+def test_format_is_negotiated_from_accept(client) -> None:
+    response = client.post(
+        "/generate-meals",
+        json={"plan": PLAN},
+        headers={"Accept": "application/vnd.fitplanner.compact+json, application/json;q=0.5"},
+    )
+    assert response.headers["content-type"] == "application/vnd.fitplanner.compact+json"
+    assert response.headers["vary"].startswith("Accept")
+
+
+def test_unavailable_or_unknown_formats_are_not_acceptable(client, monkeypatch) -> None:
+    monkeypatch.setattr(responses, "msgpack", None)
+
+    assert client.post("/generate-meals?format=msgpack", json={"plan": PLAN}).status_code == 406
+    assert client.post("/generate-meals?format=yaml", json={"plan": PLAN}).status_code == 406
+
+
+def test_msgpack_matches_compact_json(client) -> None:
+    msgpack = pytest.importorskip("msgpack")
+
+    packed = client.post("/generate-meals?format=msgpack", json={"plan": PLAN})
+    compact = client.post("/generate-meals?format=compact", json={"plan": PLAN})
+
+    assert packed.headers["content-type"] == "application/vnd.fitplanner.compact+msgpack"
+    assert msgpack.unpackb(packed.content) == compact.json()
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from app.clients import openfoodfacts_client
+from app.core.config import settings
+from app.main import app
+
+PLAN = {
+    "height_cm": 171,
+    "weight_kg": 71,
+    "age": 31,
+    "gender": "male",
+    "body_fat_percent": 18,
+    "target_body_fat_percent": 12,
+    "activity_level": "moderate",
+    "training_days_per_week": 4,
+}
+
+
+def test_slow_lookups_are_pending_and_complete_in_background(monkeypatch) -> None:
+    async def fake_fetch(query, country_code, page_size, store):
+        if query == "Oats":
+            await asyncio.sleep(0.5)
+        return [{"product_name": f"{query} product", "brands": "Brand", "stores": "Lidl"}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    monkeypatch.setattr(settings, "openfoodfacts_cache_enabled", False)
+    monkeypatch.setattr(settings, "generate_meals_deadline_s", 0.1)
+
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        body = client.post("/generate-meals", json={"plan": PLAN}).json()
+        elapsed = time.perf_counter() - started
+
+        ingredients = [ing for day in body["meal_plan"]["days"] for meal in day["meals"] for ing in meal["ingredients"]]
+        oats = [ing for ing in ingredients if ing["ingredient"] == "Oats"]
+        others = [ing for ing in ingredients if ing["ingredient"] != "Oats"]
+        assert elapsed < 0.45
+        assert body["enrichment_id"]
+        assert oats and all(ing["retail_pending"] and ing["retail_product"] is None for ing in oats)
+        assert all(not ing["retail_pending"] and ing["retail_product"] for ing in others)
+        assert [g["ingredient"] for g in body["grocery_list"] if g["retail_pending"]] == ["Oats"]
+
+        status = client.get(f"/generate-meals/enrichment/{body['enrichment_id']}", params={"wait_s": 2}).json()
+
+    assert status["complete"] is True
+    assert status["pending"] == []
+    assert status["products"]["Oats"]["product_name"] == "Oats product"
+
+
+def test_fast_upstream_needs_no_follow_up(monkeypatch) -> None:
+    async def fake_fetch(query, country_code, page_size, store):
+        return []
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    monkeypatch.setattr(settings, "openfoodfacts_cache_enabled", False)
+
+    with TestClient(app) as client:
+        body = client.post("/generate-meals", json={"plan": PLAN}).json()
+        missing = client.get("/generate-meals/enrichment/does-not-exist")
+
+    assert body["enrichment_id"] is None
+    assert missing.status_code == 404
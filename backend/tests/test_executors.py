@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import executors
+from app.core.config import settings
+from app.core.executors import BoundedExecutor, ExecutorSaturated
+from app.main import app
+
+PLAN = {
+    "height_cm": 171,
+    "weight_kg": 71,
+    "age": 31,
+    "gender": "male",
+    "body_fat_percent": 18,
+    "target_body_fat_percent": 12,
+    "activity_level": "moderate",
+    "training_days_per_week": 4,
+}
+
+
+def test_bounded_executor_rejects_when_full() -> None:
+    release = threading.Event()
+    pool = BoundedExecutor("cpu", ThreadPoolExecutor(1), limit=1)
+
+    async def run() -> None:
+        blocked = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturated):
+            await pool.run(sum, [1, 2])
+        # Unbounded callers (batch plans) queue behind the limit instead of failing.
+        overflow = asyncio.ensure_future(pool.run(sum, [1, 2], bounded=False))
+        release.set()
+        assert await overflow == 3
+        await blocked
+
+    asyncio.run(run())
+    assert pool.in_flight == 0
+    pool.shutdown()
+
+
+def test_saturated_pool_returns_503_with_retry_after(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "executor_mode", "thread")
+    monkeypatch.setattr(settings, "executor_cpu_workers", 1)
+    monkeypatch.setattr(settings, "executor_cpu_queue_limit", 1)
+    monkeypatch.setattr(settings, "executor_retry_after_s", 2)
+    monkeypatch.setattr(settings, "plan_cache_enabled", False)
+
+    with TestClient(app) as client:
+        monkeypatch.setattr(executors._cpu, "in_flight", 1)
+        response = client.post("/generate-meals", json={"plan": PLAN})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "2"
+
+
+def test_default_queue_limit_follows_service_time(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "executor_cpu_queue_limit", 0)
+    monkeypatch.setattr(settings, "executor_cpu_queue_wait_s", 1.0)
+    monkeypatch.setattr(settings, "executor_cpu_service_time_s", 0.01)
+
+    assert executors._cpu_queue_limit(1) == 100
+    assert executors._cpu_queue_limit(4) == 400
+    # Slow calls never shrink the queue below one per worker.
+    monkeypatch.setattr(settings, "executor_cpu_service_time_s", 5.0)
+    assert executors._cpu_queue_limit(2) == 2
+    monkeypatch.setattr(settings, "executor_cpu_queue_limit", 7)
+    assert executors._cpu_queue_limit(2) == 7
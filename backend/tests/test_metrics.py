@@ -0,0 +1,73 @@
+from fastapi.testclient import TestClient
+
+from app.clients import openfoodfacts_client
+from app.core import metrics
+from app.core.config import settings
+from app.main import app
+
+
+def test_render_exposes_counters_and_histograms() -> None:
+    metrics.reset()
+    metrics.inc("off_requests_total", outcome="ok")
+    metrics.inc("off_requests_total", 2, outcome="timeout")
+    metrics.observe("off_request_seconds", 0.003)
+
+    text = metrics.render()
+
+    assert 'fitplanner_off_requests_total{outcome="ok"} 1' in text
+    assert 'fitplanner_off_requests_total{outcome="timeout"} 2' in text
+    assert 'fitplanner_off_request_seconds_bucket{le="0.0025"} 0' in text
+    assert 'fitplanner_off_request_seconds_bucket{le="0.005"} 1' in text
+    assert 'fitplanner_off_request_seconds_bucket{le="+Inf"} 1' in text
+    assert "# TYPE fitplanner_plan_cache_hits_total counter" in text
+
+
+def test_large_and_fractional_values_render_exactly() -> None:
+    metrics.reset()
+    metrics.inc("off_requests_total", 1_234_567, outcome="ok")
+    metrics.inc("off_requests_total", 0.1, outcome="timeout")
+    metrics.inc("off_requests_total", 0.2, outcome="timeout")
+
+    text = metrics.render()
+
+    assert 'fitplanner_off_requests_total{outcome="ok"} 1234567\n' in text
+    assert 'fitplanner_off_requests_total{outcome="timeout"} 0.30000000000000004\n' in text
+    assert metrics._format_value(float("inf")) == "+Inf"
+
+
+def test_stages_feed_server_timing_and_metrics_endpoint(monkeypatch) -> None:
+    async def fake_fetch(query, country_code, page_size, store):
+        return [{"product_name": query, "brands": "Brand", "stores": "Lidl"}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    monkeypatch.setattr(settings, "openfoodfacts_cache_enabled", False)
+    monkeypatch.setattr(settings, "metrics_server_timing", True)
+    metrics.reset()
+    plan = {
+        "height_cm": 180,
+        "weight_kg": 82,
+        "age": 30,
+        "gender": "male",
+        "body_fat_percent": 20,
+        "target_body_fat_percent": 14,
+        "activity_level": "moderate",
+        "training_days_per_week": 4,
+    }
+    with TestClient(app) as client:
+        timing = client.post("/generate-meals", json={"plan": plan}).headers["server-timing"]
+        body = client.get("/metrics").text
+
+    stages = [part.split(";")[0] for part in timing.split(", ")]
+    assert stages == ["physiology", "projection", "meal_generation", "grocery", "retail_enrichment", "serialize"]
+    assert 'fitplanner_http_requests_total{method="POST",path="/generate-meals",status="200"} 1' in body
+    assert 'fitplanner_stage_seconds_count{stage="retail_enrichment"} 1' in body
+    assert 'fitplanner_enrichment_ingredients_total{matched="yes"}' in body
+
+
+def test_disabled_metrics_record_nothing(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "metrics_enabled", False)
+    metrics.reset()
+    with metrics.stage("physiology"):
+        metrics.inc("off_requests_total", outcome="ok")
+
+    assert "off_requests_total{" not in metrics.render()
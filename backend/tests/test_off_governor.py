@@ -0,0 +1,182 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.clients import openfoodfacts_client
+from app.clients.off_governor import AIMDLimit, CircuitBreaker, CircuitOpen, Governor, TokenBucket, get_governor
+from app.core import metrics
+from app.core.config import settings
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_aimd_limit_backs_off_once_per_burst_and_recovers_additively() -> None:
+    clock = Clock()
+    limit = AIMDLimit(8, 1, 16, 0.5, latency_threshold_s=2.0, clock=clock)
+
+    async def run() -> None:
+        burst = [await limit.acquire() for _ in range(4)]
+        clock.now += 1
+        for started in burst:
+            limit.release(started, 0.1, congested=True)
+        assert limit.limit == 4
+
+        started = await limit.acquire()
+        limit.release(started, 2.5, congested=False)
+        assert limit.limit == 2
+
+        for _ in range(4):
+            started = await limit.acquire()
+            limit.release(started, 0.1, congested=False)
+        assert 3 < limit.limit < 4
+
+    asyncio.run(run())
+
+
+def test_aimd_limit_queues_callers_beyond_the_limit() -> None:
+    limit = AIMDLimit(1, 1, 1, 0.5, latency_threshold_s=2.0)
+
+    async def run() -> list[str]:
+        order: list[str] = []
+        started = await limit.acquire()
+
+        async def second() -> None:
+            await limit.acquire()
+            order.append("second")
+
+        task = asyncio.create_task(second())
+        await asyncio.sleep(0)
+        order.append("first done")
+        limit.release(started, 0.1, congested=False)
+        await task
+        assert limit.in_flight == 1
+        return order
+
+    assert asyncio.run(run()) == ["first done", "second"]
+
+
+def test_token_bucket_spaces_requests_beyond_the_burst() -> None:
+    bucket = TokenBucket(rate_per_s=50, burst=2)
+
+    async def run() -> float:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(4):
+            await bucket.acquire()
+        return loop.time() - started
+
+    assert asyncio.run(run()) >= 0.035
+
+
+def test_circuit_opens_probes_and_closes() -> None:
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_s=30, clock=clock)
+
+    breaker.record(False)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 31
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+
+    clock.now += 31
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+@pytest.fixture()
+def upstream(monkeypatch):
+    monkeypatch.setattr(settings, "openfoodfacts_breaker_failure_threshold", 2)
+    monkeypatch.setattr(settings, "openfoodfacts_rate_limit_per_s", 0)
+    requests: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.params["search_terms"])
+        return httpx.Response(503)
+
+    return requests, handler
+
+
+def test_open_circuit_fails_lookups_fast_without_negative_caching(upstream, tmp_path, monkeypatch) -> None:
+    requests, handler = upstream
+    cache = openfoodfacts_client.ProductCache(str(tmp_path / "off.sqlite3"), 60, 60, 60, 64)
+    monkeypatch.setattr(openfoodfacts_client, "get_product_cache", lambda: cache)
+    metrics.reset()
+
+    async def run() -> dict[str, list]:
+        await openfoodfacts_client.open_client(httpx.MockTransport(handler))
+        try:
+            first = await openfoodfacts_client.search_products_batch(["Oats", "Eggs"], "DE")
+            with pytest.raises(CircuitOpen):
+                await openfoodfacts_client.search_products("Tofu", "DE")
+            rendered = metrics.render()
+            assert 'fitplanner_off_circuit_state{host="world.openfoodfacts.org"} 2' in rendered
+            assert 'fitplanner_off_requests_total{outcome="circuit_open"} 1' in rendered
+            return first
+        finally:
+            await openfoodfacts_client.close_client()
+
+    assert asyncio.run(run()) == {"Oats": [], "Eggs": []}
+    assert sorted(requests) == ["Eggs", "Oats"]
+    assert cache.get(openfoodfacts_client.cache_key("Tofu", "DE", 10, None)) is None
+
+
+def test_hung_lookups_cancelled_at_their_timeout_open_the_circuit(upstream, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "openfoodfacts_latency_threshold_s", 0.05)
+    monkeypatch.setattr(openfoodfacts_client, "get_product_cache", lambda: None)
+    metrics.reset()
+    requests: list[str] = []
+
+    async def hang(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.params["search_terms"])
+        await asyncio.sleep(60)
+        return httpx.Response(200, json={"products": []})
+
+    async def run() -> tuple[dict[str, list], Governor]:
+        await openfoodfacts_client.open_client(httpx.MockTransport(hang))
+        try:
+            # The lookup timeout cancels the requests long before the 15 s httpx timeout.
+            found = await openfoodfacts_client.search_products_batch(["Oats", "Eggs"], "DE", timeout_s=0.1)
+            return found, get_governor("world.openfoodfacts.org")
+        finally:
+            await openfoodfacts_client.close_client()
+
+    found, governor = asyncio.run(run())
+
+    assert found == {"Oats": [], "Eggs": []}
+    assert sorted(requests) == ["Eggs", "Oats"]
+    assert governor.breaker.state == "open"
+    assert governor.limit.limit < settings.openfoodfacts_max_concurrency_per_host
+    assert governor.limit.in_flight == 0
+    assert 'fitplanner_off_requests_total{outcome="timeout"} 2' in metrics.render()
+
+
+def test_requests_abandoned_early_are_counted_as_cancelled(upstream, monkeypatch) -> None:
+    metrics.reset()
+    governor = Governor("example.org")
+    limit = governor.limit.limit
+
+    async def run() -> None:
+        task = asyncio.ensure_future(governor.call(lambda: asyncio.sleep(60)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    assert 'fitplanner_off_requests_total{outcome="cancelled"} 1' in metrics.render()
+    assert governor.breaker.failures == 0
+    assert governor.limit.limit == limit
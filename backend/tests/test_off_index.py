@@ -0,0 +1,101 @@
+import asyncio
+import gzip
+import json
+
+from app.clients.off_index import ProductIndex, build_index, set_product_index
+from app.clients import openfoodfacts_client
+from app.clients.openfoodfacts_client import search_products, search_products_batch
+from app.core.config import settings
+
+DUMP = [
+    {
+        "product_name": "Hähnchenbrustfilet",
+        "brands": "Gut Bio",
+        "stores": "Aldi Süd",
+        "stores_tags": ["aldi-sud"],
+        "countries_tags": ["en:germany"],
+        "nutriscore_grade": "a",
+        "nutriments": {"proteins_100g": 23, "fat_100g": 1.5, "energy-kcal_100g": 105, "salt_100g": 0.1},
+        "ingredients_text": "Hähnchenbrust 100%",
+        "images": {"front": {"sizes": {}}},
+    },
+    {
+        "product_name": "Chicken Breast Fillets",
+        "brands": "Tesco",
+        "stores_tags": ["tesco"],
+        "countries_tags": ["en:united-kingdom"],
+        "nutriments": {"proteins_100g": 24},
+    },
+    {
+        "product_name": "Chicken Breast Slices",
+        "brands": "Lidl",
+        "stores_tags": ["lidl"],
+        "countries_tags": ["en:germany", "en:france"],
+        "nutriments": {"proteins_100g": 21},
+    },
+    {"brands": "Nameless"},
+]
+
+
+def _build(tmp_path) -> ProductIndex:
+    dump = tmp_path / "products.jsonl.gz"
+    with gzip.open(dump, "wt", encoding="utf-8") as f:
+        for product in DUMP:
+            f.write(json.dumps(product) + "\n")
+        f.write("{not json\n")
+    assert build_index(dump, tmp_path / "index.sqlite3", batch_size=2) == 3
+    return ProductIndex(tmp_path / "index.sqlite3")
+
+
+def test_index_keeps_only_enrichment_fields_and_filters(tmp_path) -> None:
+    index = _build(tmp_path)
+    try:
+        de = index.search("Chicken Breast", "DE", page_size=25)
+        assert [p["product_name"] for p in de] == ["Chicken Breast Slices"]
+        assert set(de[0]) == {
+            "product_name", "brands", "stores", "stores_tags", "nutriscore_grade", "countries_tags", "nutriments",
+        }
+
+        gb = index.search("chicken breast", "GB", page_size=25, store="tesco")
+        assert [p["brands"] for p in gb] == ["Tesco"]
+
+        bio = index.search("hahnchenbrustfilet", "DE")
+        assert bio[0]["nutriments"] == {"proteins_100g": 23, "fat_100g": 1.5, "energy-kcal_100g": 105}
+        assert index.search("!!", "DE") == []
+        # Products are only indexed under mapped countries, so an unmapped one matches nothing.
+        assert index.search("chicken breast", "GR", page_size=25) == []
+    finally:
+        index.close()
+
+
+def test_local_backend_serves_batches_without_network(tmp_path, monkeypatch) -> None:
+    set_product_index(_build(tmp_path))
+    monkeypatch.setattr(settings, "openfoodfacts_backend", "local")
+    try:
+        results = asyncio.run(search_products_batch(["Chicken Breast", "Quinoa"], "FR"))
+    finally:
+        set_product_index(None)
+
+    assert [p["brands"] for p in results["Chicken Breast"]] == ["Lidl"]
+    assert results["Quinoa"] == []
+
+
+def test_local_searches_run_in_the_io_pool(tmp_path, monkeypatch) -> None:
+    offloaded: list[str] = []
+
+    async def fake_run_io(fn, *args, bounded=True):
+        offloaded.append(fn.__name__)
+        return fn(*args)
+
+    set_product_index(_build(tmp_path))
+    monkeypatch.setattr(settings, "openfoodfacts_backend", "local")
+    monkeypatch.setattr(openfoodfacts_client, "run_io", fake_run_io)
+    try:
+        single = asyncio.run(search_products("Chicken Breast", "GB"))
+        batch = asyncio.run(search_products_batch(["Chicken Breast"], "DE"))
+    finally:
+        set_product_index(None)
+
+    assert [p["brands"] for p in single] == ["Tesco"]
+    assert [p["brands"] for p in batch["Chicken Breast"]] == ["Lidl"]
+    assert offloaded == ["_search_local", "_search_local_many"]
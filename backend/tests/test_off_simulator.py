@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.clients import openfoodfacts_client
+from app.clients.off_simulator import OpenFoodFactsSimulator, SimulatorConfig, SimulatorTransport
+from app.core.config import settings
+
+
+def _search(config: SimulatorConfig, query: str = "Oats", timeout: float = 5.0) -> httpx.Response:
+    async def run() -> httpx.Response:
+        transport = SimulatorTransport(OpenFoodFactsSimulator(config))
+        async with httpx.AsyncClient(transport=transport, timeout=timeout) as client:
+            return await client.get(
+                "https://world.openfoodfacts.org/cgi/search.pl", params={"search_terms": query, "page_size": 5}
+            )
+
+    return asyncio.run(run())
+
+
+def test_simulator_serves_fixture_products() -> None:
+    response = _search(SimulatorConfig(latency_median_ms=0, seed=1, padding_bytes=64))
+
+    products = response.json()["products"]
+    assert response.status_code == 200
+    assert len(products) == 5
+    assert products[0]["product_name"] == "Oats"
+    assert products[0]["nutriments"]["proteins_100g"] == 17
+    assert len(products[0]["ingredients_text"]) == 64
+
+
+def test_simulator_injects_errors_empty_pages_and_timeouts() -> None:
+    assert _search(SimulatorConfig(latency_median_ms=0, error_rate=1.0)).status_code in {500, 502, 503}
+    assert _search(SimulatorConfig(latency_median_ms=0, empty_rate=1.0)).json()["products"] == []
+    with pytest.raises(httpx.ReadTimeout):
+        _search(SimulatorConfig(latency_median_ms=0, timeout_rate=1.0, hang_s=5.0), timeout=0.05)
+
+
+def test_transport_setting_routes_pooled_client_to_simulator(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "openfoodfacts_transport", "simulator")
+    monkeypatch.setattr(settings, "openfoodfacts_simulator_latency_median_ms", 0.0)
+
+    async def run() -> list[dict]:
+        try:
+            return await openfoodfacts_client._fetch_products("Lentils", "DE", 3, None)
+        finally:
+            await openfoodfacts_client.close_client()
+
+    products = asyncio.run(run())
+    assert [p["product_name"] for p in products] == ["Lentils", "Lentils 2", "Lentils 3"]
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.clients import openfoodfacts_client
+from app.clients.off_stream import SearchResultStream
+
+BODY = {
+    "count": 12345,
+    "page": 1,
+    "products": [
+        {"product_name": "Haferflocken zart", "brands": "Kölln", "nutriments": {"proteins_100g": 13.5, "x": [1, {"y": None}]}},
+        {"product_name": "Skyr — natur", "stores": "Lidl, Rewe", "price": 1.29},
+        "not a product",
+        {"product_name": "Tofu \"bio\"", "nutriscore_grade": "a"},
+    ],
+    "skip": 0,
+    "page_size": 25,
+}
+
+
+def _feed(body: bytes, size: int, keep=None) -> list[dict]:
+    parser = SearchResultStream(keep)
+    products = []
+    for start in range(0, len(body), size):
+        products += parser.feed(body[start : start + size])
+    return products + parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 1 << 20])
+def test_products_survive_any_chunking(size) -> None:
+    body = json.dumps(BODY, ensure_ascii=False, indent=1).encode("utf-8")
+    expected = [p for p in BODY["products"] if isinstance(p, dict)]
+
+    assert _feed(body, size) == expected
+
+
+def test_products_are_yielded_before_the_body_ends() -> None:
+    body = json.dumps(BODY).encode("utf-8")
+    parser = SearchResultStream(lambda p: p["product_name"])
+    cut = body.index(b"Tofu")
+
+    assert parser.feed(body[:cut]) == ["Haferflocken zart", "Skyr — natur"]
+    assert parser.feed(body[cut:]) + parser.close() == ['Tofu "bio"']
+
+
+@pytest.mark.parametrize(
+    "body",
+    [b'{"count": 0, "products": []}', b'{"status": "error"}', b'{"products": null}', b" {} "],
+)
+def test_responses_without_products(body) -> None:
+    assert _feed(body, 3) == []
+
+
+@pytest.mark.parametrize("body", [b'{"products": [{"product_name": "Oats"}', b'[{"product_name": "Oats"}]', b'{"a": 1} x'])
+def test_truncated_or_malformed_bodies_raise(body) -> None:
+    with pytest.raises(ValueError):
+        _feed(body, 4)
+
+
+def test_client_requests_only_needed_fields() -> None:
+    seen: list[httpx.Request] = []
+    product = {
+        "product_name": "Oats",
+        "brands": "Brand",
+        "ingredients_text": "x" * 5000,
+        "nutriments": {"proteins_100g": 13, "energy-kcal_100g": 370, "salt_100g": 0.01, "iron_serving": 2},
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"count": 1, "products": [product]})
+
+    async def run() -> list[dict]:
+        await openfoodfacts_client.open_client(httpx.MockTransport(handler))
+        try:
+            return await openfoodfacts_client._fetch_products("Oats", "DE", 25, None)
+        finally:
+            await openfoodfacts_client.close_client()
+
+    products = asyncio.run(run())
+
+    assert seen[0].url.params["fields"].split(",") == list(openfoodfacts_client.PRODUCT_FIELDS)
+    assert products == [
+        {"product_name": "Oats", "brands": "Brand", "nutriments": {"proteins_100g": 13, "energy-kcal_100g": 370}}
+    ]
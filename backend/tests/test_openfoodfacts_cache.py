@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import pytest
+
+from app.clients import openfoodfacts_client
+from app.clients.openfoodfacts_client import search_products
+from app.clients.product_cache import CacheEntry, ProductCache, cache_key, set_product_cache
+
+CHICKEN = [{"product_name": "Chicken Breast Fillet", "brands": "Gut Bio"}]
+
+
+@pytest.fixture
+def fetch_calls(monkeypatch):
+    calls: list[str] = []
+    responses: dict[str, object] = {}
+
+    async def fake_fetch(query, country_code, page_size, store):
+        calls.append(query)
+        result = responses.get(query, CHICKEN)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    yield calls, responses
+    set_product_cache(None)
+
+
+def _install_cache(tmp_path, **overrides) -> ProductCache:
+    options = {"ttl_s": 3600, "negative_ttl_s": 60, "stale_s": 3600, "max_entries": 16}
+    options.update(overrides)
+    cache = ProductCache(path=tmp_path / "off.sqlite3", **options)
+    set_product_cache(cache)
+    return cache
+
+
+def test_warm_lookup_skips_upstream(tmp_path, fetch_calls) -> None:
+    calls, _ = fetch_calls
+    _install_cache(tmp_path)
+
+    async def run() -> None:
+        assert await search_products("Chicken Breast", "DE", 25) == CHICKEN
+        assert await search_products(" chicken breast", "de", 25) == CHICKEN
+
+    asyncio.run(run())
+    assert calls == ["Chicken Breast"]
+
+
+def test_empty_results_and_failures_are_negatively_cached(tmp_path, fetch_calls) -> None:
+    calls, responses = fetch_calls
+    responses["Quinoa"] = []
+    responses["Tofu"] = RuntimeError("upstream 503")
+    _install_cache(tmp_path)
+
+    async def run() -> None:
+        assert await search_products("Quinoa", "DE") == []
+        assert await search_products("Quinoa", "DE") == []
+        with pytest.raises(RuntimeError):
+            await search_products("Tofu", "DE")
+        assert await search_products("Tofu", "DE") == []
+
+    asyncio.run(run())
+    assert calls == ["Quinoa", "Tofu"]
+
+
+def test_stale_entry_is_served_while_refreshing(tmp_path, fetch_calls) -> None:
+    calls, responses = fetch_calls
+    cache = _install_cache(tmp_path, ttl_s=0)
+    cache.set(cache_key("Oats", "DE", 10, None), [{"product_name": "Old Oats"}])
+    responses["Oats"] = [{"product_name": "New Oats"}]
+
+    async def run() -> None:
+        assert await search_products("Oats", "DE") == [{"product_name": "Old Oats"}]
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert calls == ["Oats"]
+    assert cache.get(cache_key("Oats", "DE", 10, None)).products == [{"product_name": "New Oats"}]
+
+
+def test_entries_survive_restart_via_sqlite(tmp_path) -> None:
+    key = cache_key("Eggs", "FR", 25, "carrefour")
+    first = ProductCache(path=tmp_path / "off.sqlite3", ttl_s=3600, negative_ttl_s=60, stale_s=0, max_entries=1)
+    first.set(key, [{"product_name": "Oeufs"}])
+    first.close()
+
+    second = ProductCache(path=tmp_path / "off.sqlite3", ttl_s=3600, negative_ttl_s=60, stale_s=0, max_entries=1)
+    entry = second.get(key)
+    second.close()
+    assert entry is not None and entry.products == [{"product_name": "Oeufs"}]
+
+
+def test_stale_memory_entry_picks_up_refresh_from_another_worker(tmp_path) -> None:
+    key = cache_key("Milk", "DE", 25, None)
+    path = tmp_path / "off.sqlite3"
+    worker_a = ProductCache(path=path, ttl_s=60, negative_ttl_s=60, stale_s=3600, max_entries=8)
+    worker_b = ProductCache(path=path, ttl_s=60, negative_ttl_s=60, stale_s=3600, max_entries=8)
+    worker_a._memory[key] = CacheEntry(products=[{"product_name": "Old Milk"}], stored_at=time.time() - 120)
+    worker_b.set(key, [{"product_name": "New Milk"}])
+
+    assert worker_a.get(key).products == [{"product_name": "New Milk"}]
+    assert worker_a.get_many([key])[key].products == [{"product_name": "New Milk"}]
+    worker_a.close()
+    worker_b.close()
+
+
+def test_cache_file_is_only_read_and_written_in_the_io_pool(tmp_path, fetch_calls, monkeypatch) -> None:
+    calls, _ = fetch_calls
+    offloaded: list[str] = []
+
+    async def fake_run_io(fn, *args, bounded=True):
+        offloaded.append(fn.__name__)
+        return fn(*args)
+
+    monkeypatch.setattr(openfoodfacts_client, "run_io", fake_run_io)
+    other_worker = ProductCache(path=tmp_path / "off.sqlite3", ttl_s=3600, negative_ttl_s=60, stale_s=0, max_entries=8)
+    other_worker.set(cache_key("Oats", "DE", 25, None), [{"product_name": "Oats"}])
+    other_worker.close()
+    _install_cache(tmp_path)
+
+    first = asyncio.run(openfoodfacts_client.search_products_batch(["Oats", "Eggs"], "DE", page_size=25))
+    offloaded_first = list(offloaded)
+    # Both entries are now in this worker's memory tier, which is read on the loop.
+    again = asyncio.run(openfoodfacts_client.search_products_batch(["Oats", "Eggs"], "DE", page_size=25))
+
+    assert first == again == {"Oats": [{"product_name": "Oats"}], "Eggs": CHICKEN}
+    assert calls == ["Eggs"]
+    assert offloaded_first == ["get_many", "set"]
+    assert offloaded == offloaded_first
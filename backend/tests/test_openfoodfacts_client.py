@@ -0,0 +1,144 @@
+import asyncio
+
+import httpx
+
+from app.clients import openfoodfacts_client
+from app.clients.openfoodfacts_client import close_client, get_client, open_client
+
+
+def test_lookups_share_one_pooled_client() -> None:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"products": [{"product_name": request.url.params["search_terms"]}]})
+
+    async def run() -> list[list[dict]]:
+        client = await open_client(httpx.MockTransport(handler))
+        try:
+            assert get_client() is client
+            return await asyncio.gather(
+                *(openfoodfacts_client._fetch_products(q, "DE", 25, None) for q in ["Oats", "Eggs", "Tofu"])
+            )
+        finally:
+            await close_client()
+
+    results = asyncio.run(run())
+
+    assert [r[0]["product_name"] for r in results] == ["Oats", "Eggs", "Tofu"]
+    assert {r.url.params["tag_0"] for r in requests} == {"de"}
+    assert all(r.headers["user-agent"].startswith("FitPlanner/") for r in requests)
+    assert openfoodfacts_client._client is None
+
+
+def test_client_is_rebuilt_for_a_new_event_loop() -> None:
+    async def current() -> httpx.AsyncClient:
+        return get_client()
+
+    first = asyncio.run(current())
+    second = asyncio.run(current())
+    assert first is not second
+    asyncio.run(close_client())
+
+
+def test_batch_lookup_dedupes_and_fans_out_per_ingredient(monkeypatch) -> None:
+    calls: list[str] = []
+
+    async def fake_fetch(query, country_code, page_size, store):
+        calls.append(query)
+        if query == "Tofu":
+            raise httpx.ConnectTimeout("slow upstream")
+        return [{"product_name": f"{query} product"}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    monkeypatch.setattr(openfoodfacts_client, "get_product_cache", lambda: None)
+
+    results = asyncio.run(
+        openfoodfacts_client.search_products_batch(["Oats", "oats ", "Eggs", "Tofu"], "DE", page_size=25)
+    )
+
+    assert sorted(calls) == ["Eggs", "Oats", "Tofu"]
+    assert results["Oats"] == results["oats "] == [{"product_name": "Oats product"}]
+    assert results["Tofu"] == []
+
+
+def _gated_fetch(monkeypatch, outcome=None):
+    calls: list[str] = []
+    cancelled: list[str] = []
+    release = asyncio.Event()
+
+    async def fake_fetch(query, country_code, page_size, store):
+        calls.append(query)
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            cancelled.append(query)
+            raise
+        if outcome is not None:
+            raise outcome
+        return [{"product_name": query}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    monkeypatch.setattr(openfoodfacts_client, "get_product_cache", lambda: None)
+    return calls, cancelled, release
+
+
+def test_concurrent_identical_lookups_share_one_upstream_call(monkeypatch) -> None:
+    calls, _, release = _gated_fetch(monkeypatch)
+
+    async def run() -> list:
+        waiters = [asyncio.create_task(openfoodfacts_client.search_products("Oats", "DE", 25)) for _ in range(20)]
+        batch = openfoodfacts_client.start_products_batch(["oats", "Eggs"], "DE", page_size=25)
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*waiters, *batch.values())
+
+    results = asyncio.run(run())
+
+    assert sorted(calls) == ["Eggs", "Oats"]
+    assert results[:21] == [[{"product_name": "Oats"}]] * 21
+    assert openfoodfacts_client._inflight == {}
+
+
+def test_single_flight_propagates_errors_to_every_caller(monkeypatch) -> None:
+    calls, _, release = _gated_fetch(monkeypatch, outcome=httpx.ConnectError("down"))
+
+    async def run() -> list:
+        waiters = [asyncio.create_task(openfoodfacts_client.search_products("Tofu", "DE", 25)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert calls == ["Tofu"]
+    assert all(isinstance(r, httpx.ConnectError) for r in results)
+
+
+def test_upstream_is_cancelled_only_when_every_caller_leaves(monkeypatch) -> None:
+    calls, cancelled, release = _gated_fetch(monkeypatch)
+
+    async def run() -> tuple:
+        first = asyncio.create_task(openfoodfacts_client.search_products("Rice", "DE", 25))
+        second = asyncio.create_task(openfoodfacts_client.search_products("Rice", "DE", 25))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        kept = list(cancelled)
+        release.set()
+        result = await second
+
+        release.clear()
+        lone = asyncio.create_task(openfoodfacts_client.search_products("Beans", "DE", 25))
+        await asyncio.sleep(0)
+        lone.cancel()
+        await asyncio.gather(lone, return_exceptions=True)
+        await asyncio.sleep(0)
+        return kept, result
+
+    kept, result = asyncio.run(run())
+
+    assert kept == []
+    assert result == [{"product_name": "Rice"}]
+    assert calls == ["Rice", "Beans"]
+    assert cancelled == ["Beans"]
@@ -0,0 +1,54 @@
+import itertools
+
+from fastapi.testclient import TestClient
+
+from app.api.routes.recomp import calculate_plan
+from app.domain.recomp_models import ActivityLevel, Gender, GoalMode, PlanInput
+from app.main import app
+from app.services.physiology_batch import batch_responses
+
+
+def _population() -> list[PlanInput]:
+    plans = []
+    grid = itertools.product(
+        [52.3, 71, 88.85, 140.2],
+        [(9, 5), (14.5, 10), (18, 12), (22.35, 12), (35, 20)],
+        [0, 3, 4, 6, 7],
+        [8, 16, 52],
+        list(GoalMode),
+    )
+    for i, (weight, (bf, target_bf), training_days, weeks, goal) in enumerate(grid):
+        plans.append(
+            PlanInput(
+                height_cm=150 + (i % 60),
+                weight_kg=weight,
+                age=18 + (i % 60),
+                gender=Gender.male if i % 2 else Gender.female,
+                body_fat_percent=bf,
+                target_body_fat_percent=target_bf,
+                activity_level=list(ActivityLevel)[i % 5],
+                training_days_per_week=training_days,
+                timeline_weeks=weeks,
+                goal_mode=goal,
+            )
+        )
+    return plans
+
+
+def test_batch_matches_scalar_path_exactly() -> None:
+    plans = _population()
+    batch = batch_responses(plans)
+
+    assert len(batch) == len(plans)
+    for plan, result in zip(plans, batch):
+        assert result.model_dump() == calculate_plan(plan).model_dump()
+
+
+def test_batch_endpoint() -> None:
+    plans = _population()[:3]
+    with TestClient(app) as client:
+        response = client.post("/calculate-plan/batch", json={"plans": [p.model_dump(mode="json") for p in plans]})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["calories"]["bmr"] for r in results] == [calculate_plan(p).calories.bmr for p in plans]
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+
+from app.clients import openfoodfacts_client
+from app.core.config import settings
+from app.domain.recomp_models import ActivityLevel, Gender, PlanInput
+from app.services import catalog as catalog_module
+from app.services.catalog import get_catalog, set_catalog_path
+from app.services.grocery_engine import build_grocery_list
+from app.services.meal_engine import generate_weekly_meal_plan
+from app.services.physiology import body_composition, calories_plan, macro_plan
+from app.services.plan_cache import cache_stats, clear_caches, plan_fingerprint
+from app.services.retail_enricher import enrich_with_retail_products
+
+
+def _plan(**overrides) -> PlanInput:
+    values = dict(
+        height_cm=171,
+        weight_kg=71,
+        age=31,
+        gender=Gender.male,
+        body_fat_percent=18,
+        target_body_fat_percent=12,
+        activity_level=ActivityLevel.moderate,
+        training_days_per_week=4,
+    )
+    values.update(overrides)
+    return PlanInput(**values)
+
+
+def test_fingerprint_ignores_retail_preferences() -> None:
+    assert plan_fingerprint(_plan()) == plan_fingerprint(_plan(country_code="FR", preferred_retailers=["rewe"]))
+    assert plan_fingerprint(_plan()) != plan_fingerprint(_plan(weight_kg=71.5))
+
+
+def test_repeated_inputs_hit_the_cache() -> None:
+    clear_caches()
+    first = calories_plan(_plan())
+    second = calories_plan(_plan(country_code="GB"))
+
+    assert second is first
+    assert cache_stats()["calories_plan"] == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_enrichment_does_not_mutate_cached_meal_plan(monkeypatch) -> None:
+    async def fake_fetch(query, country_code, page_size, store):
+        return [{"product_name": f"{query} product", "brands": "Brand"}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    monkeypatch.setattr(settings, "openfoodfacts_cache_enabled", False)
+    clear_caches()
+
+    plan = _plan()
+    comp = body_composition(plan)
+    macros = macro_plan(plan, comp, calories_plan(plan))
+    cached = generate_weekly_meal_plan(plan, macros)
+    enriched, grocery = asyncio.run(enrich_with_retail_products(cached, build_grocery_list(cached), "DE", ["lidl"]))
+
+    assert generate_weekly_meal_plan(plan, macros) is cached
+    assert cached.days[0].meals[0].ingredients[0].retail_product is None
+    assert enriched.days[0].meals[0].ingredients[0].retail_product is not None
+    assert all(g.retail_product is not None for g in grocery)
+
+
+def test_catalog_reload_drops_memoized_meal_plans(tmp_path) -> None:
+    path = tmp_path / "catalog.json"
+    foods = json.loads(catalog_module.CATALOG_PATH.read_text(encoding="utf-8"))
+    path.write_text(json.dumps(foods), encoding="utf-8")
+    plan = _plan()
+    comp = body_composition(plan)
+    macros = macro_plan(plan, comp, calories_plan(plan))
+    try:
+        set_catalog_path(path)
+        before = generate_weekly_meal_plan(plan, macros)
+        assert generate_weekly_meal_plan(plan, macros) is before
+
+        # Denser chicken needs fewer grams for the same protein.
+        for food in foods:
+            if food["name"] == "Chicken Breast":
+                food.update(kcal=food["kcal"] * 1.5, protein_g=food["protein_g"] * 1.5)
+        path.write_text(json.dumps(foods), encoding="utf-8")
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, get_catalog().mtime_ns + 1_000_000))
+
+        after = generate_weekly_meal_plan(plan, macros)
+    finally:
+        set_catalog_path(catalog_module.CATALOG_PATH)
+
+    assert after is not before
+    assert after != before
+
+
+def test_cache_can_be_disabled(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "plan_cache_enabled", False)
+    assert body_composition(_plan()) is not body_composition(_plan())
@@ -0,0 +1,51 @@
+import numpy as np
+
+from app.domain.recomp_models import ActivityLevel, Gender, GoalMode, PlanInput
+from app.services.catalog import get_catalog
+from app.services.meal_engine import generate_weekly_meal_plan
+from app.services.physiology import body_composition, calories_plan, macro_plan
+from app.services.portion_solver import solve_box_qp
+
+
+def test_box_qp_matches_unconstrained_solution_when_interior() -> None:
+    rng = np.random.default_rng(7)
+    m = rng.normal(size=(6, 6))
+    hessian = m.T @ m + np.eye(6)
+    linear = rng.normal(size=6)
+
+    x = solve_box_qp(hessian, linear, np.full(6, -1e6), np.full(6, 1e6), np.zeros(6))
+    assert np.allclose(x, np.linalg.solve(hessian, linear))
+
+
+def test_box_qp_respects_bounds_and_fixed_variables() -> None:
+    hessian = np.eye(3)
+    linear = np.array([10.0, -10.0, 5.0])
+    lower = np.array([0.0, 0.0, 2.0])
+    upper = np.array([4.0, 4.0, 2.0])
+
+    x = solve_box_qp(hessian, linear, lower, upper, np.array([1.0, 1.0, 2.0]))
+    assert np.allclose(x, [4.0, 0.0, 2.0])
+
+
+def test_day_totals_match_the_food_and_hit_protein() -> None:
+    plan = PlanInput(
+        height_cm=171,
+        weight_kg=71,
+        age=31,
+        gender=Gender.male,
+        body_fat_percent=18,
+        target_body_fat_percent=12,
+        activity_level=ActivityLevel.moderate,
+        training_days_per_week=4,
+        goal_mode=GoalMode.recomposition,
+    )
+    comp = body_composition(plan)
+    weekly = generate_weekly_meal_plan(plan, macro_plan(plan, comp, calories_plan(plan)))
+    catalog = get_catalog()
+
+    for day in weekly.days:
+        for meal in day.meals:
+            food_kcal = sum(catalog.find(i.ingredient)["kcal"] * i.grams / 100 for i in meal.ingredients)
+            assert abs(meal.calories - food_kcal) <= 0.5
+        assert abs(day.totals.protein_g - day.target_macros.protein_g) <= 5
+        assert abs(day.totals.calories - day.target_macros.calories) <= 0.1 * day.target_macros.calories
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from app.clients import openfoodfacts_client
+from app.core.config import settings
+from app.main import app
+from app.services.product_recommender import recommend_brands, recommend_brands_by_ingredient
+
+
+def _fake_upstream(monkeypatch, slow: set[str] = frozenset()) -> list[str]:
+    calls: list[str] = []
+
+    async def fake_fetch(query, country_code, page_size, store):
+        calls.append(query)
+        if query in slow:
+            await asyncio.sleep(1.0)
+        return [{"product_name": f"{query} product", "brands": "Brand", "nutriscore_grade": "a"}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    monkeypatch.setattr(settings, "openfoodfacts_cache_enabled", False)
+    return calls
+
+
+def test_ingredient_lookups_are_deduplicated_and_concurrent(monkeypatch) -> None:
+    calls = _fake_upstream(monkeypatch)
+
+    mapped = asyncio.run(recommend_brands_by_ingredient("DE", ["Oats", "oats ", "Eggs", "Oats"]))
+
+    assert sorted(calls) == ["Eggs", "Oats"]
+    assert set(mapped) == {"Oats", "oats ", "Eggs"}
+    assert mapped["oats "].product_name == "Oats product"
+
+
+def test_timeout_keeps_partial_results(monkeypatch) -> None:
+    _fake_upstream(monkeypatch, slow={"Salmon"})
+
+    started = time.perf_counter()
+    mapped = asyncio.run(recommend_brands_by_ingredient("DE", ["Salmon", "Oats", "Eggs"], timeout_s=0.1))
+    brands = asyncio.run(recommend_brands("DE", ["Salmon", "Oats"], timeout_s=0.1))
+
+    assert time.perf_counter() - started < 0.9
+    assert set(mapped) == {"Oats", "Eggs"}
+    assert [b.product_name for b in brands] == ["Oats product"]
+
+
+def test_legacy_plan_route_is_served_with_brand_data(monkeypatch) -> None:
+    _fake_upstream(monkeypatch)
+    profile = {
+        "height_cm": 178,
+        "weight_kg": 80,
+        "age": 30,
+        "gender": "male",
+        "body_fat_percent": 20,
+        "activity_level": "moderate",
+        "goal": "recomposition",
+        "timeline_weeks": 16,
+        "country_code": "DE",
+    }
+    with TestClient(app) as client:
+        response = client.post("/api/v1/plan", json=profile)
+
+    assert response.status_code == 200
+    grocery = response.json()["grocery_list"]
+    assert grocery and all(g["branded_product"] for g in grocery)
@@ -0,0 +1,137 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.clients import openfoodfacts_client
+from app.core.config import settings
+from app.domain.recomp_models import CaloriesPlan, WeeklyMealPlan
+from app.main import app
+from app.services.adaptive import adjust_calories
+from app.services import plan_store
+from app.services.plan_store import clear_plans
+
+PLAN = {
+    "height_cm": 183,
+    "weight_kg": 88,
+    "age": 35,
+    "gender": "male",
+    "body_fat_percent": 24,
+    "target_body_fat_percent": 15,
+    "activity_level": "moderate",
+    "training_days_per_week": 4,
+    "timeline_weeks": 24,
+    "goal_mode": "fat_loss",
+}
+
+
+@pytest.fixture()
+def lookups(monkeypatch, tmp_path):
+    calls: list[str] = []
+
+    async def fake_fetch(query, country_code, page_size, store):
+        calls.append(query)
+        return [{"product_name": f"{query} Value", "brands": "Brand", "stores": "Lidl"}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    monkeypatch.setattr(settings, "openfoodfacts_cache_enabled", False)
+    monkeypatch.setattr(settings, "plan_store_path", str(tmp_path / "plans.sqlite3"))
+    yield calls
+    plan_store.close_plan_store()
+
+
+def _checkin(previous: dict, current_weight_kg: float) -> dict:
+    return {
+        "previous_weight_kg": PLAN["weight_kg"],
+        "current_weight_kg": current_weight_kg,
+        "previous_calorie_target": previous["calories"]["target"],
+    }
+
+
+def _foods(meal_plan: dict) -> list[list[str]]:
+    return [[ing["ingredient"] for meal in day["meals"] for ing in meal["ingredients"]] for day in meal_plan["days"]]
+
+
+def test_replan_by_key_rescales_grams_and_reuses_products(lookups) -> None:
+    with TestClient(app) as client:
+        previous = client.post("/generate-meals", json={"plan": PLAN}).json()
+        fetched = len(lookups)
+        # 0.1% loss is below the target band, so calories drop by 100 kcal.
+        response = client.post(
+            "/replan", json={"plan_key": previous["plan_key"], "checkin": _checkin(previous, 87.9)}
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert len(lookups) == fetched
+    assert body["checkin"]["adjustment_kcal"] == -100
+    assert body["calories"]["target"] == previous["calories"]["target"] - 100
+    assert body["plan_key"] != previous["plan_key"]
+    assert _foods(body["meal_plan"]) == _foods(previous["meal_plan"])
+    assert body["meal_plan"] != previous["meal_plan"]
+    assert all(item["retail_product"] is not None for item in body["grocery_list"])
+
+    plan = WeeklyMealPlan.model_validate(body["meal_plan"])
+    for day in plan.days:
+        assert day.target_macros.calories == body["macros"][f"{day.day_type}_day"]["calories"]
+        assert abs(day.totals.calories - day.target_macros.calories) <= 0.05 * day.target_macros.calories
+
+
+def test_replan_accepts_the_previous_response_and_rejects_unknown_keys(lookups) -> None:
+    with TestClient(app) as client:
+        previous = client.post("/generate-meals", json={"plan": PLAN}).json()
+        clear_plans()
+        checkin = _checkin(previous, 86.5)
+
+        missing = client.post("/replan", json={"plan_key": previous["plan_key"], "checkin": checkin})
+        invalid = client.post("/replan", json={"checkin": checkin})
+        response = client.post("/replan", json={"plan": PLAN, "previous": previous, "checkin": checkin})
+
+    assert missing.status_code == 404
+    assert invalid.status_code == 422
+    assert response.status_code == 200
+    # 1.7% in a week is too fast, so calories go up.
+    assert response.json()["calories"]["target"] == previous["calories"]["target"] + 100
+
+
+def test_plan_keys_survive_a_fresh_connection_and_ignore_the_echoed_target(lookups) -> None:
+    with TestClient(app) as client:
+        previous = client.post("/generate-meals", json={"plan": PLAN}).json()
+        # Another worker opens its own connection to the same file.
+        plan_store.close_plan_store()
+        checkin = {**_checkin(previous, 87.9), "previous_calorie_target": 3000}
+        response = client.post("/replan", json={"plan_key": previous["plan_key"], "checkin": checkin})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["calories"]["target"] == previous["calories"]["target"] - 100
+    assert body["checkin"]["new_calorie_target"] == body["calories"]["target"]
+
+
+def test_expired_plans_are_not_recalled(lookups, monkeypatch) -> None:
+    with TestClient(app) as client:
+        previous = client.post("/generate-meals", json={"plan": PLAN}).json()
+        monkeypatch.setattr(settings, "plan_store_ttl_s", 0)
+        response = client.post("/replan", json={"plan_key": previous["plan_key"], "checkin": _checkin(previous, 88)})
+
+    assert response.status_code == 404
+
+
+def test_oldest_plans_are_evicted_beyond_the_cap(lookups, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "plan_store_max_entries", 2)
+    with TestClient(app) as client:
+        keys = [
+            client.post("/generate-meals", json={"plan": {**PLAN, "weight_kg": weight}}).json()["plan_key"]
+            for weight in (86, 87, 88)
+        ]
+        checkin = {"previous_weight_kg": 88, "current_weight_kg": 88, "previous_calorie_target": 2000}
+        found = [client.post("/replan", json={"plan_key": key, "checkin": checkin}) for key in keys]
+
+    assert [r.status_code for r in found] == [404, 200, 200]
+
+
+def test_adjust_calories_respects_bmr_floor() -> None:
+    calories = CaloriesPlan(bmr=1500, tdee=2300, daily_deficit=450, target=1850, training_day=2050, rest_day=1583)
+
+    assert adjust_calories(calories, 100).target == 1950
+    lowered = adjust_calories(calories.model_copy(update={"target": 1850 - 20}), -100)
+    assert lowered.target == 1800
+    assert lowered.rest_day == 1583 - 30
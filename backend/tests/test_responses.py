@@ -0,0 +1,67 @@
+import gzip
+import json
+
+from fastapi.testclient import TestClient
+
+from app.clients import openfoodfacts_client
+from app.core.compression import negotiate, parse_qvalues
+from app.core.config import settings
+from app.main import app
+
+PLAN = {
+    "height_cm": 178,
+    "weight_kg": 80,
+    "age": 33,
+    "gender": "male",
+    "body_fat_percent": 21,
+    "target_body_fat_percent": 14,
+    "activity_level": "moderate",
+    "training_days_per_week": 4,
+    "timeline_weeks": 16,
+    "goal_mode": "fat_loss",
+}
+
+
+def test_accept_encoding_negotiation() -> None:
+    assert parse_qvalues("gzip;q=0.5, identity, br;q=0") == {"gzip": 0.5, "identity": 1.0, "br": 0.0}
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("identity") is None
+    assert negotiate("*;q=0") is None
+    assert negotiate("*") in {"br", "gzip"}
+
+
+def test_generate_meals_is_compressed_and_matches_the_model(monkeypatch) -> None:
+    async def fake_fetch(query, country_code, page_size, store):
+        return [{"product_name": query, "brands": "Brand", "stores": "Lidl"}]
+
+    monkeypatch.setattr(openfoodfacts_client, "_fetch_products", fake_fetch)
+    monkeypatch.setattr(settings, "openfoodfacts_cache_enabled", False)
+
+    with TestClient(app) as client:
+        response = client.post("/generate-meals", json={"plan": PLAN}, headers={"Accept-Encoding": "gzip"})
+        raw = client.stream("POST", "/generate-meals", json={"plan": PLAN}, headers={"Accept-Encoding": "gzip"})
+        with raw as streamed:
+            compressed = b"".join(streamed.iter_raw())
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) == len(compressed)
+    body = response.json()
+    assert len(body["meal_plan"]["days"]) == 7
+    assert body["meal_plan"]["days"][0]["meals"][0]["ingredients"][0]["retail_product"] is not None
+    assert json.loads(gzip.decompress(compressed)) == body
+
+
+def test_small_and_streamed_responses_are_not_compressed() -> None:
+    with TestClient(app) as client:
+        health = client.get("/health", headers={"Accept-Encoding": "gzip"})
+        streamed = client.post(
+            "/calculate-plan/batch",
+            json={"plans": [PLAN] * 50},
+            headers={"Accept-Encoding": "gzip", "Accept": "application/x-ndjson"},
+        )
+
+    assert "content-encoding" not in health.headers
+    assert "content-encoding" not in streamed.headers
+    assert len(streamed.text.splitlines()) == 50
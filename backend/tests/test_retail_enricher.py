@@ -0,0 +1,49 @@
+import random
+
+from app.services.retail_enricher import RetailerMatcher, _best_product, top_products
+
+GRADES = ["a", "b", "c", "d", "e", None, "unknown"]
+STORES = ["Rewe", "Lidl, Aldi Süd", "Tesco Extra", "Carrefour", "", None]
+
+
+def _candidates(n: int) -> list[dict]:
+    rng = random.Random(n)
+    return [
+        {
+            "product_name": f"Oats {i}",
+            "brands": "Brand",
+            "stores": rng.choice(STORES),
+            "stores_tags": rng.choice([[], ["en:edeka"], ["aldi"]]),
+            "nutriscore_grade": rng.choice(GRADES),
+            "price": rng.choice([None, "1.49"]),
+        }
+        for i in range(n)
+    ]
+
+
+def test_matcher_normalizes_once_and_keeps_preference_order() -> None:
+    matcher = RetailerMatcher([" Lidl", "ALDI", "", "lidl", "aldi süd"])
+
+    assert matcher.retailers == ("lidl", "aldi", "aldi süd")
+    assert matcher.match("aldi süd, lidl") == "lidl"
+    assert matcher.match("aldi süd") == "aldi"
+    assert matcher.match("carrefour") is None
+    assert RetailerMatcher([]).match("lidl") is None
+
+
+def test_top_products_match_a_stable_sort_of_the_scores() -> None:
+    candidates = _candidates(2000)
+    matcher = RetailerMatcher(["edeka", "aldi"])
+
+    def score(product: dict) -> tuple[int, int, int]:
+        text = f"{product['stores'] or ''} {' '.join(product['stores_tags'])}".lower()
+        grade = {"a": 5, "b": 4, "c": 3, "d": 2, "e": 1}.get((product["nutriscore_grade"] or "z").lower(), 0)
+        return (int("edeka" in text or "aldi" in text), grade, int(bool(product["price"])))
+
+    expected = sorted(candidates, key=score, reverse=True)[:5]
+    top = top_products(candidates, matcher, 5)
+
+    assert [p.product_name for p in top] == [p["product_name"] for p in expected]
+    assert top[0].retailer in {"edeka", "aldi"}
+    assert _best_product(candidates, matcher) == top[0]
+    assert _best_product([], matcher) is None